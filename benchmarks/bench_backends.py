@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import tracemalloc
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from build_svg import SEM_END, SEM_START, TableFormer, prepare_data
+from draw_backends import CairoPdfBackend, SvgBackend
+from synthetic import synthetic_semester
+
+REPEATS = 5
+
+
+# Прежний путь: SVG DOM, сериализация в XML и повторный разбор в cairosvg
+def render_through_svg(data, weekday_time_spans):
+    import cairosvg
+    table_former = TableFormer("Иванов Иван Иванович", SEM_START, SEM_END, data, weekday_time_spans, backend=SvgBackend)
+    table_former.draw_timetable()
+    return cairosvg.svg2pdf(bytestring=table_former.to_bytes())
+
+
+# Новый путь: отрисовка сразу на PDF поверхность cairo
+def render_direct(data, weekday_time_spans):
+    table_former = TableFormer("Иванов Иван Иванович", SEM_START, SEM_END, data, weekday_time_spans, backend=CairoPdfBackend)
+    table_former.draw_timetable()
+    return table_former.to_bytes()
+
+
+# Функция для замера медианного времени и пикового объёма памяти Python.
+# Память, выделенная внутри cairo, в tracemalloc не попадает
+def measure(render, data, weekday_time_spans):
+    render(data, weekday_time_spans)  # Прогрев: шрифты и кеш раскладки текста
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        pdf = render(data, weekday_time_spans)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    render(data, weekday_time_spans)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sorted(timings)[len(timings) // 2], peak, len(pdf)
+
+
+def main():
+    for lessons_per_day in (2, 4, 6):
+        exercises = synthetic_semester(lessons_per_day=lessons_per_day)
+        data, weekday_time_spans = prepare_data(exercises, SEM_START, SEM_END)
+        print(f"Семестр, занятий в день: {lessons_per_day} (всего {len(exercises)}):")
+        for title, render in (("SVG + cairosvg", render_through_svg), ("cairo напрямую", render_direct)):
+            elapsed, peak, pdf_size = measure(render, data, weekday_time_spans)
+            print(f"  {title:<15} {elapsed * 1000:8.1f} мс, пик памяти {peak / 1024 / 1024:6.1f} МБ, PDF {pdf_size / 1024:6.1f} КБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib.parse import parse_qs
+from urllib.request import urlopen
+
+# Подключаем локально написанные модули из папок scripts и src
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+sys.path.append(os.path.join(dir_path, '..', 'src'))
+
+TOKEN = "123456:bench"
+ADMIN_ID = 1
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Метрики, которые должны быть в ответе /metrics после обработки запросов
+EXPECTED_METRICS = [
+    'timetable_bot_stage_seconds_bucket{stage="render"',
+    'timetable_bot_stage_seconds_count{stage="upload"}',
+    "timetable_bot_render_queue_depth",
+    "timetable_bot_render_worker_utilization",
+    "timetable_bot_downloaded_bytes_total",
+    "timetable_bot_uploaded_bytes_total",
+    "process_resident_memory_bytes",
+]
+
+
+# Результат прогона бота под нагрузкой
+class LoadResult(NamedTuple):
+    users: int
+    workers: int  # Количество рабочих процессов бота
+    elapsed: float  # Время до отправки последнего PDF, с
+    done_at: dict  # Пользователь -> время получения PDF от начала нагрузки, с
+    ping_latency: list  # Время ответа на /start во время отрисовок, с
+    ping_done_at: list  # Время получения ответов на /start от начала нагрузки, с
+    scrapes: list  # Запросы /metrics во время нагрузки: (код ответа, Content-Type, время ответа в с)
+    metrics_text: str  # Ответ /metrics после нагрузки
+    pool_stats: dict
+    stats_text: str  # Ответ бота администратору на /stats после нагрузки
+
+
+class FakeBotApi:
+    """
+    Локальный сервер, изображающий Bot API: раздаёт обновления через getUpdates,
+    отдаёт присланный файл и запоминает, когда бот ответил каждому пользователю.
+    """
+
+    def __init__(self, workbook, user_ranges, pings):
+        self.workbook = workbook
+        self.user_ranges = user_ranges  # Диапазон дат, который запросит каждый пользователь
+        self.pings = pings  # Пользователи, отправляющие /start во время отрисовки
+        self.updates = []
+        self.update_id = 0
+        self.message_id = 0
+        self.condition = threading.Condition()
+        self.sent_at = {}  # Время отправки последнего сообщения пользователю
+        self.done_at = {}  # Время получения пользователем PDF
+        self.ping_latency = []  # Время ответа на /start во время нагрузки
+        self.ping_done_at = []  # Время получения ответов на /start от начала нагрузки
+        self.admin_replies = []  # Сообщения бота администратору
+        self.started = time.perf_counter()
+
+    # Метод для добавления обновления в очередь getUpdates
+    def push(self, chat_id, **message):
+        with self.condition:
+            self.update_id += 1
+            self.message_id += 1
+            message.update({
+                "message_id": self.message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"},
+            })
+            self.updates.append({"update_id": self.update_id, "message": message})
+            self.sent_at[chat_id] = time.perf_counter()
+            self.condition.notify_all()
+
+    def push_document(self, chat_id, file_id="timetable"):
+        self.push(chat_id, document={"file_id": file_id, "file_unique_id": file_id,
+                                     "file_name": "timetable.xlsx", "mime_type": XLSX_MIME_TYPE})
+
+    def push_command(self, chat_id, command):
+        self.push(chat_id, text=command, entities=[{"type": "bot_command", "offset": 0, "length": len(command)}])
+
+    def push_start(self, chat_id):
+        self.push_command(chat_id, "/start")
+
+    # Метод для получения содержимого файла по file_path (все пользователи присылают одну книгу)
+    def file_data(self, file_path):
+        return self.workbook
+
+    # Метод для выдачи обновлений боту (длинный опрос с коротким ожиданием)
+    def get_updates(self, offset):
+        with self.condition:
+            self.updates = [update for update in self.updates if update["update_id"] >= offset]
+            if not self.updates:
+                self.condition.wait(timeout=0.5)
+            return list(self.updates)
+
+    # Метод для обработки ответа бота пользователю
+    def on_reply(self, method, chat_id, text):
+        now = time.perf_counter()
+        if chat_id == ADMIN_ID and text:
+            self.admin_replies.append(text)
+        elif chat_id in self.pings and text and text.startswith("Отправьте мне файл"):
+            self.ping_latency.append(now - self.sent_at[chat_id])
+            self.ping_done_at.append(now - self.started)
+        elif chat_id in self.user_ranges:
+            if text and text.startswith("Файл получен"):
+                self.push(chat_id, text=self.user_ranges[chat_id])
+            elif method == "sendDocument":
+                self.done_at[chat_id] = now - self.started
+        self.message_id += 1
+        return {"message_id": self.message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}}
+
+    def handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def respond(self, body, content_type="application/json"):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Бот закрыл соединение длинного опроса при остановке
+
+            def do_GET(self):
+                # Скачивание файла по file_path
+                self.respond(api.file_data(self.path.rsplit("/", 1)[-1]), XLSX_MIME_TYPE)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                method = self.path.rsplit("/", 1)[-1]
+                if self.headers.get("Content-Type", "").startswith("multipart/form-data"):
+                    fields = dict(re.findall(rb'name="(\w+)"\r\n\r\n([^\r]*)', body))
+                    fields = {key.decode(): value.decode() for key, value in fields.items()}
+                else:
+                    fields = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+                if method == "getMe":
+                    result = {"id": 42, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+                elif method == "getUpdates":
+                    result = api.get_updates(int(fields.get("offset", 0)))
+                elif method == "getFile":
+                    file_id = fields.get("file_id", "timetable")
+                    result = {"file_id": file_id, "file_unique_id": file_id,
+                              "file_size": len(api.file_data(f"{file_id}.xlsx")), "file_path": f"documents/{file_id}.xlsx"}
+                elif method in ("sendMessage", "sendDocument"):
+                    result = api.on_reply(method, int(fields["chat_id"]), fields.get("text"))
+                else:
+                    result = True  # deleteWebhook, answerCallbackQuery и прочие служебные методы
+                self.respond(json.dumps({"ok": True, "result": result}).encode())
+
+        return Handler
+
+
+# Функция для получения метрик обычным HTTP клиентом (в отдельном потоке, как это делает Prometheus).
+# Возвращает текст ответа, время ответа в секундах, код ответа и Content-Type
+def scrape_metrics(port):
+    started = time.perf_counter()
+    with urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        text = response.read().decode('utf-8')
+        status, content_type = response.status, response.headers.get("Content-Type")
+    return text, time.perf_counter() - started, status, content_type
+
+
+# Функция для прогона бота под нагрузкой. target и initializer - задание и подготовка рабочих процессов
+# пула бота (по умолчанию настоящие; тесты подставляют задание без cairo)
+async def run(workbook, users, pings, target=None, initializer=None):
+    from build_svg import SEM_END, SEM_START
+    from render_pool import RenderPool
+
+    # Каждый пользователь запрашивает свой диапазон, чтобы не попадать в кеш готовых PDF
+    user_ranges = {}
+    for index in range(users):
+        start_date = SEM_START + timedelta(days=7 * (index % 15))
+        end_date = min(start_date + timedelta(days=7 * (2 + index // 15)), SEM_END)
+        user_ranges[1000 + index] = f"{start_date:%d.%m}-{end_date:%d.%m}"
+    ping_users = {5000 + index for index in range(pings)}
+
+    api = FakeBotApi(workbook, user_ranges, ping_users)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), api.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    import telegram_main
+    if target is not None:
+        pool = telegram_main.render_pool
+        telegram_main.render_pool = RenderPool(pool.workers, pool.queue_size, pool.initargs, pool.timeout,
+                                               target=target, initializer=initializer)
+    application = telegram_main.build_application(TOKEN, base_url)
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0)
+        # post_init вызывается только в run_polling, поэтому сервер метрик запускаем сами
+        await telegram_main.start_metrics_server(application)
+        metrics_port = telegram_main.metrics_server.port
+        loop = asyncio.get_running_loop()
+
+        api.started = time.perf_counter()
+        for chat_id in user_ranges:
+            api.push_document(chat_id)
+        # Пока идут отрисовки, другие пользователи отправляют /start
+        for chat_id in ping_users:
+            await asyncio.sleep(0.2)
+            api.push_start(chat_id)
+        # Сбор метрик во время отрисовки не должен задерживать цикл событий бота
+        scrapes = []
+        while len(api.done_at) < users:
+            _, latency, status, content_type = await loop.run_in_executor(None, scrape_metrics, metrics_port)
+            scrapes.append((status, content_type, latency))
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - api.started
+        # Сводку администратор запрашивает у работающего бота, как в чате. Запрос учитывается
+        # после отправки PDF, поэтому сводку запрашиваем снова, пока в ней не окажутся все запросы
+        stats_replies = []
+        for _ in range(25):
+            api.push_command(ADMIN_ID, "/stats")
+            for _ in range(20):
+                if len(api.admin_replies) > len(stats_replies):
+                    break
+                await asyncio.sleep(0.01)
+            stats_replies = list(api.admin_replies)
+            if stats_replies and stats_replies[-1].startswith(f"Запросов: {users},"):
+                break
+            await asyncio.sleep(0.1)
+        metrics_text, *_ = await loop.run_in_executor(None, scrape_metrics, metrics_port)
+
+        await application.updater.stop()
+        await application.stop()
+        await telegram_main.metrics_server.stop()
+    pool_stats = telegram_main.render_pool.stats()
+    stats_text = stats_replies[-1] if stats_replies else ""
+    await telegram_main.render_pool.shutdown()
+    server.shutdown()
+
+    return LoadResult(users, telegram_main.RENDER_CONCURRENCY, elapsed, dict(api.done_at), list(api.ping_latency),
+                      list(api.ping_done_at), scrapes, metrics_text, pool_stats, stats_text)
+
+
+# Функция для вывода результатов прогона. Возвращает метрики, которых нет в ответе /metrics
+def report(result):
+    latencies = sorted(result.done_at.values())
+    print(f"Пользователей: {result.users}, рабочих процессов: {result.workers}")
+    print(f"Все PDF отправлены за {result.elapsed:.2f} с ({result.users / result.elapsed:.1f} запросов/с)")
+    print(f"Время до получения PDF: медиана {latencies[len(latencies) // 2]:.2f} с, максимум {latencies[-1]:.2f} с")
+    if result.ping_latency:
+        print(f"Ответ на /start под нагрузкой: максимум {max(result.ping_latency) * 1000:.0f} мс")
+    for pid, stats in result.pool_stats["per_worker"].items():
+        print(f"  процесс {pid}: {stats['jobs']} заданий, {stats['jobs_per_second']:.1f} заданий/с")
+    print(result.stats_text)
+    missing = [name for name in EXPECTED_METRICS if name not in result.metrics_text]
+    scrape_latency = [latency for _, _, latency in result.scrapes]
+    print(f"/metrics: {len(result.metrics_text.splitlines())} строк, {len(scrape_latency)} запросов во время нагрузки, "
+          f"ответ максимум за {max(scrape_latency, default=0) * 1000:.1f} мс")
+    if missing:
+        print(f"В ответе /metrics нет метрик: {', '.join(missing)}")
+    return missing
+
+
+def main():
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    if len(sys.argv) > 1 and sys.argv[1] != '-':
+        with open(sys.argv[1], 'rb') as file:
+            workbook = file.read()
+    else:
+        # Без файла (или с "-") пользователи присылают синтетическую книгу преподавателя
+        from synthetic import generate_workbook
+        workbook = generate_workbook()
+
+    # Бот сохраняет файлы и кеш в текущем каталоге, поэтому запускаем его во временном
+    os.chdir(tempfile.mkdtemp())
+    os.environ.setdefault("TELEGRAM_TOKEN", TOKEN)
+    os.environ.setdefault("ADMIN_ID", str(ADMIN_ID))
+    os.environ.setdefault("MODERATOR_ID", "0")
+    os.environ.setdefault("METRICS_PORT", "0")  # Свободный порт, чтобы не мешать запущенному боту
+    if report(asyncio.run(run(workbook, users, pings=5))):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
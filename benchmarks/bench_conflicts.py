@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+from itertools import islice
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from conflicts import conflict_messages, find_conflicts
+from parse_xls import DocType
+from synthetic import synthetic_semester
+
+REPEATS = 5
+
+
+# Прежний способ: наложения только при совпадении ключа (дата, начало, конец) и отчёт одной строкой
+def legacy_conflicts(occurrences):
+    exercises_by_date = {}
+    for date, lesson in occurrences:
+        exercises_by_date.setdefault((date, lesson.time_start, lesson.time_end), []).append(lesson)
+    errors = ""
+    for key, value in exercises_by_date.items():
+        if len(value) > 1:
+            errors += f'{key[0].strftime("%d.%m")} с {key[1]} до {key[2]} накладываются занятия:\n'
+            for lesson in value:
+                errors += f"{lesson.subject} ({lesson.lesson_type}) у группы {lesson.participants[0]}\n"
+    return errors
+
+
+def measure(function, *args):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        result = function(*args)
+    return (time.perf_counter() - started) / REPEATS, result
+
+
+def main():
+    # Кафедра: расписания нескольких преподавателей, сведённые в одно
+    for professors in (1, 10, 50):
+        occurrences = [occurrence for seed in range(professors) for occurrence in synthetic_semester(seed=seed)]
+        legacy_time, _ = measure(legacy_conflicts, occurrences)
+        engine_time, conflicts = measure(find_conflicts, occurrences)
+        first_time, _ = measure(lambda: list(islice(conflict_messages(conflicts, DocType.PROFESSOR), 3)))
+        print(f"Преподавателей: {professors:2}, занятий: {len(occurrences):6}, наложений: {len(conflicts):5}")
+        print(f"  Ключ (дата, время) + строка:  {legacy_time * 1000:8.2f} мс")
+        print(f"  Индекс интервалов:            {engine_time * 1000:8.2f} мс")
+        print(f"  Первые три сообщения:         {first_time * 1000:8.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+import build_svg
+import font_metrics
+from build_svg import MAX_FONT_SIZE, MIN_FONT_SIZE, SEM_END, SEM_START, TableFormer, prepare_data
+from PIL import ImageFont
+from synthetic import synthetic_semester
+
+# Строки с парами символов, для которых в шрифте задан кернинг
+CHECKED_TEXTS = ["To", "AVATAR", "Tw", "Yo", "LT", "ГА", "Физика (ЛК)", "М3О-101Бк-23", "«Тест»"]
+
+
+# Прежняя реализация: шрифт загружается при каждом измерении
+def legacy_get_text_width(text, font_size=10):
+    try:
+        font = ImageFont.truetype(font_metrics.FONT_PATHS[0], font_size)
+    except OSError:
+        font = ImageFont.truetype(font_metrics.FONT_PATHS[1], font_size)
+    return font.getlength(text)*1.1
+
+
+# Функция для замера времени отрисовки полного семестра, возвращает время и документ
+def render_semester(exercises):
+    data, weekday_time_spans = prepare_data(exercises, SEM_START, SEM_END)
+    started = time.perf_counter()
+    table_former = TableFormer("Иванов Иван Иванович", SEM_START, SEM_END, data, weekday_time_spans, "bench.svg")
+    table_former.draw_timetable()
+    return time.perf_counter() - started, table_former.tostring()
+
+
+def main():
+    exercises = synthetic_semester()
+    print(f"Занятий в синтетическом семестре: {len(exercises)}")
+
+    # Отключаем кеш раскладки текста, чтобы замерять только измерение ширины строк
+    cached_form_text = build_svg.form_text
+    build_svg.form_text = cached_form_text.__wrapped__
+
+    cached_get_text_width = build_svg.get_text_width
+    build_svg.get_text_width = legacy_get_text_width
+    legacy, legacy_svg = render_semester(exercises)
+    build_svg.get_text_width = cached_get_text_width
+
+    cold, svg = render_semester(exercises)
+    warm, _ = render_semester(exercises)
+    build_svg.form_text = cached_form_text
+    print(f"Загрузка шрифта при каждом вызове: {legacy:.3f} с")
+    print(f"Кешированные метрики (первый запуск): {cold:.3f} с")
+    print(f"Кешированные метрики (повторный запуск): {warm:.3f} с")
+    print(f"Ускорение: x{legacy / cold:.1f} / x{legacy / warm:.1f}")
+
+    # Ширина строк должна совпадать с прежней до последнего знака, иначе меняется размер шрифта в ячейках
+    mismatches = [(text, font_size) for text in CHECKED_TEXTS for font_size in range(MIN_FONT_SIZE, MAX_FONT_SIZE + 1)
+                  if font_metrics.measure_text(text, font_size) * 1.1 != legacy_get_text_width(text, font_size)]
+    same = svg == legacy_svg
+    print(f"Документ совпадает с прежним измерением: {'да' if same else 'нет'}, "
+          f"расхождений ширины строк: {len(mismatches)}")
+    if mismatches or not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
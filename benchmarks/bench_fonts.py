@@ -0,0 +1,147 @@
+import ctypes
+import ctypes.util
+import os
+import sys
+import tempfile
+import time
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+import font_embedding
+from build_svg import SEM_END, SEM_START, TableFormer, prepare_data
+from draw_backends import FONT_FAMILY, CairoPdfBackend, CompactSvgBackend, SvgBackend
+from synthetic import synthetic_semester
+
+REPEATS = 5
+
+# Название шрифта, которого нет в системе: так выглядел FONT_FAMILY до регистрации шрифта,
+# fontconfig подставлял вместо него шрифт по умолчанию
+UNREGISTERED_FAMILY = "UnregisteredFont"
+
+
+class UnregisteredPdfBackend(CairoPdfBackend):
+    """
+    Отрисовка сразу в PDF шрифтом, который подбирает fontconfig вместо незнакомого названия.
+    """
+
+    def __init__(self, width, height, file_name=None):
+        super().__init__(width, height, file_name)
+        self.context.select_font_face(UNREGISTERED_FAMILY, self.cairo.FONT_SLANT_NORMAL,
+                                      self.cairo.FONT_WEIGHT_NORMAL)
+
+
+# Функция для получения файла шрифта, который fontconfig выбирает по названию (None без fontconfig)
+def matched_font_file(family):
+    library = ctypes.util.find_library('fontconfig')
+    if library is None:
+        return None
+    fontconfig = ctypes.CDLL(library)
+    fontconfig.FcNameParse.argtypes = [ctypes.c_char_p]
+    fontconfig.FcNameParse.restype = ctypes.c_void_p
+    fontconfig.FcConfigSubstitute.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]
+    fontconfig.FcDefaultSubstitute.argtypes = [ctypes.c_void_p]
+    fontconfig.FcFontMatch.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
+    fontconfig.FcFontMatch.restype = ctypes.c_void_p
+    fontconfig.FcPatternGetString.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int,
+                                              ctypes.POINTER(ctypes.c_char_p)]
+    fontconfig.FcPatternDestroy.argtypes = [ctypes.c_void_p]
+
+    pattern = fontconfig.FcNameParse(family.encode())
+    fontconfig.FcConfigSubstitute(None, pattern, 0)  # 0 - FcMatchPattern
+    fontconfig.FcDefaultSubstitute(pattern)
+    result = ctypes.c_int()
+    match = fontconfig.FcFontMatch(None, pattern, ctypes.byref(result))
+    file_name = ctypes.c_char_p()
+    fontconfig.FcPatternGetString(match, b"file", 0, ctypes.byref(file_name))
+    path = file_name.value.decode()
+    fontconfig.FcPatternDestroy(match)
+    fontconfig.FcPatternDestroy(pattern)
+    return path
+
+
+# Функция для отрисовки семестра заданным способом
+def render(backend, data, weekday_time_spans):
+    table_former = TableFormer("Иванов Иван Иванович", SEM_START, SEM_END, data, weekday_time_spans, backend=backend)
+    table_former.draw_timetable()
+    return table_former
+
+
+# Функция для замера медианного времени вызова
+def measure(function):
+    function()  # Прогрев
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2], result
+
+
+# Функция для замера подмножеств шрифта: построение, попадание в кеш и размер сохранённого SVG
+def bench_subsets(data, weekday_time_spans):
+    table_former = render(SvgBackend, data, weekday_time_spans)
+    glyphs = font_embedding.glyph_set(table_former.canvas.characters)
+    font_embedding.font_subset("0")  # Загрузка fontTools не входит в замер
+    font_embedding.font_subset.cache_clear()
+    font_embedding.font_face_rule.cache_clear()
+    started = time.perf_counter()
+    subset = font_embedding.font_subset(glyphs)
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    font_embedding.font_face_rule(glyphs)
+    font_embedding.font_face_rule(glyphs)
+    cached = time.perf_counter() - started
+    print(f"  символов {len(glyphs)}, подмножество {len(subset) / 1024:.1f} КБ "
+          f"(шрифт целиком {len(font_embedding.font_data()) / 1024:.1f} КБ), "
+          f"построение {built * 1000:.1f} мс, из кеша {cached * 1000:.3f} мс")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for title, backend in (("SVG", SvgBackend), ("компактный SVG", CompactSvgBackend)):
+            in_memory = len(render(backend, data, weekday_time_spans).to_bytes())
+            path = os.path.join(directory, "timetable.svg")
+            render(backend, data, weekday_time_spans).save(path)
+            print(f"  {title:<15} в памяти {in_memory / 1024:6.1f} КБ, "
+                  f"сохранённый со шрифтом {os.path.getsize(path) / 1024:6.1f} КБ")
+
+
+# Функция для замера PDF со шрифтом, подобранным fontconfig, и с зарегистрированным шрифтом
+def bench_pdf(data, weekday_time_spans):
+    try:
+        import cairosvg
+    except OSError:
+        print("  PDF не замерен: нет библиотеки cairo")
+        return
+
+    svg = render(SvgBackend, data, weekday_time_spans).to_bytes()
+    unregistered_svg = svg.replace(FONT_FAMILY.encode(), UNREGISTERED_FAMILY.encode())
+    for title, backend, document in (("подобранный", UnregisteredPdfBackend, unregistered_svg),
+                                     ("зарегистрированный", CairoPdfBackend, svg)):
+        direct_elapsed, pdf = measure(lambda: render(backend, data, weekday_time_spans).to_bytes())
+        svg_elapsed, svg_pdf = measure(lambda: cairosvg.svg2pdf(bytestring=document))
+        print(f"  {title:<19} cairo {direct_elapsed * 1000:7.1f} мс, PDF {len(pdf) / 1024:6.1f} КБ; "
+              f"svg2pdf {svg_elapsed * 1000:7.1f} мс, PDF {len(svg_pdf) / 1024:6.1f} КБ")
+
+
+def main():
+    print(f"Шрифт раскладки: {font_embedding.get_font_metrics().font_path}")
+    # fontconfig читает настройки при первом подборе шрифта, поэтому шрифт регистрируется до него
+    started = time.perf_counter()
+    config_path = font_embedding.register_font()
+    elapsed = time.perf_counter() - started
+    print(f"Настройки fontconfig: {config_path}, созданы за {elapsed * 1000:.1f} мс")
+    print(f"fontconfig: {FONT_FAMILY} -> {matched_font_file(FONT_FAMILY)}, "
+          f"{UNREGISTERED_FAMILY} -> {matched_font_file(UNREGISTERED_FAMILY)}")
+
+    for lessons_per_day in (2, 4, 6):
+        exercises = synthetic_semester(lessons_per_day=lessons_per_day)
+        data, weekday_time_spans = prepare_data(exercises, SEM_START, SEM_END)
+        print(f"Семестр, занятий в день: {lessons_per_day} (всего {len(exercises)}):")
+        bench_subsets(data, weekday_time_spans)
+        bench_pdf(data, weekday_time_spans)
+
+
+if __name__ == "__main__":
+    main()
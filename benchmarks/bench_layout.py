@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+from datetime import timedelta
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+import build_svg
+from build_svg import SEM_END, SEM_START, TableFormer, prepare_data
+from draw_backends import SvgBackend
+from synthetic import synthetic_semester
+
+
+class NullBackend:
+    """
+    Холст, который ничего не рисует: время отрисовки на нём - это время раскладки таблицы
+    без формирования SVG или PDF.
+    """
+
+    def __init__(self, width, height, file_name=None):
+        pass
+
+    def rect(self, x, y, width, height, **style):
+        pass
+
+    def text(self, text, x, y, font_size, text_anchor=None):
+        pass
+
+
+# Функция для отрисовки расписания за заданный диапазон дат
+def render_range(exercises, start_date, end_date, backend=SvgBackend):
+    data, weekday_time_spans = prepare_data(exercises, start_date, end_date)
+    started = time.perf_counter()
+    table_former = TableFormer("Иванов Иван Иванович", start_date, end_date, data, weekday_time_spans, "bench.svg",
+                               backend=backend)
+    table_former.draw_timetable()
+    return time.perf_counter() - started
+
+
+# Функция для вывода времени отрисовки и попаданий в кеши раскладки текста и столбцов недель
+def report(exercises, start_date, end_date):
+    before = build_svg.form_text.cache_info(), build_svg.layout_week.cache_info()
+    elapsed = render_range(exercises, start_date, end_date)
+    after = build_svg.form_text.cache_info(), build_svg.layout_week.cache_info()
+    counts = []
+    for before_info, after_info in zip(before, after):
+        hits = after_info.hits - before_info.hits
+        misses = after_info.misses - before_info.misses
+        counts.append(f"{hits}/{hits + misses}")
+    print(f"{start_date:%d.%m}-{end_date:%d.%m}: {elapsed:.3f} с, "
+          f"попаданий в кеш раскладки {counts[0]}, столбцов недель {counts[1]}")
+    return elapsed
+
+
+def main():
+    exercises = synthetic_semester()
+    ranges = [
+        (SEM_START, SEM_END),
+        (SEM_START + timedelta(days=28), SEM_END),
+        (SEM_START + timedelta(days=28), SEM_START + timedelta(days=42)),
+        (SEM_START, SEM_START + timedelta(days=49)),
+        (SEM_START + timedelta(days=49), SEM_END),
+    ]
+    for start_date, end_date in ranges:
+        report(exercises, start_date, end_date)
+
+    # Диапазон одной длины, сдвигаемый на неделю: заново раскладывается только новая неделя
+    print("Сдвиг диапазона из 4 недель:")
+    build_svg.layout_week.cache_clear()
+    for shift in range(8):
+        start_date = SEM_START + timedelta(days=7 * shift)
+        report(exercises, start_date, start_date + timedelta(days=28))
+
+    # Время раскладки без формирования SVG: с кешем столбцов недель и с раскладкой всех столбцов заново
+    # (кеш раскладки текста в обоих случаях уже заполнен)
+    for weeks in (4, 8, 12):
+        cached, full = [], []
+        for shift in range(1, 17 - weeks):
+            start_date = SEM_START + timedelta(days=7 * shift)
+            end_date = start_date + timedelta(days=7 * weeks)
+            build_svg.layout_week.cache_clear()
+            render_range(exercises, start_date - timedelta(days=7), end_date - timedelta(days=7), NullBackend)
+            cached.append(render_range(exercises, start_date, end_date, NullBackend))
+            build_svg.layout_week.cache_clear()
+            full.append(render_range(exercises, start_date, end_date, NullBackend))
+        cached_ms = sorted(cached)[len(cached) // 2] * 1000
+        full_ms = sorted(full)[len(full) // 2] * 1000
+        print(f"Раскладка {weeks} недель со сдвигом на неделю: {cached_ms:.2f} мс, "
+              f"все столбцы заново {full_ms:.2f} мс ({full_ms / cached_ms:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from parse_xls import load_timetable
+from synthetic import synthetic_workbook
+
+REPEATS = 20
+
+
+# Прежнее представление: отдельный словарь на каждую дату каждого занятия
+def legacy_lessons(occurrences):
+    groups = {}  # Список групп был общим для всех дат одной записи ячейки
+    lessons = []
+    for date, lesson in occurrences:
+        group = groups.setdefault(id(lesson), list(lesson.participants))
+        exercise = {
+            "date": date,
+            "time_start": lesson.time_start,
+            "time_end": lesson.time_end,
+            "group": group,
+            "room": lesson.room,
+            "type": lesson.lesson_type,
+            "subject": lesson.subject,
+            "joined": lesson.joined,
+        }
+        if lesson.joined:
+            exercise["time_start_s"] = lesson.time_start_s
+            exercise["time_end_s"] = lesson.time_end_s
+        lessons.append(exercise)
+    return lessons
+
+
+# Способы хранения результата разбора
+def as_dicts(timetable):
+    return legacy_lessons(timetable.occurrences())
+
+
+def as_occurrences(timetable):
+    return list(timetable.occurrences())
+
+
+def as_schedule(timetable):
+    return timetable.schedule
+
+
+# Функция для замера памяти, которую занимает результат разбора.
+# Строки в представлениях общие, различается только способ хранения занятий
+def measure(data, represent):
+    gc.collect()
+    tracemalloc.start()
+    timetable = load_timetable(io.BytesIO(data))
+    count = sum(1 for _ in timetable.occurrences())
+    lessons = represent(timetable)
+    timetable = None
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak, count
+
+
+# Функция для замера времени разворачивания дат: весь семестр против двух недель
+def measure_expansion(data):
+    timetable = load_timetable(io.BytesIO(data))
+    window_start = datetime(2026, 3, 2)
+    timings = []
+    for window in ((None, None), (window_start, window_start + timedelta(days=14))):
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            count = sum(1 for _ in timetable.occurrences(*window))
+        timings.append(((time.perf_counter() - started) / REPEATS, count))
+    return timings
+
+
+def main():
+    for entries_per_cell in (1, 3, 6):
+        data = synthetic_workbook(entries_per_cell=entries_per_cell)
+        print(f"Занятий в ячейке: {entries_per_cell}")
+        for title, represent in (("Словари на каждую дату", as_dicts), ("Lesson + Occurrence", as_occurrences),
+                                 ("Правила повторения", as_schedule)):
+            current, peak, count = measure(data, represent)
+            print(f"  {title:<24} {current / 1024:8.0f} КБ ({current / count:5.0f} Б на проведение), "
+                  f"пик {peak / 1024:8.0f} КБ")
+        (full, full_count), (window, window_count) = measure_expansion(data)
+        print(f"  Разворачивание дат: семестр {full * 1000:.2f} мс ({full_count}), "
+              f"две недели {window * 1000:.2f} мс ({window_count})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+import openpyxl
+from parse_xls import (LAST_ROW, TITLE_COLUMN, TITLE_ROW, DocType, SheetData,
+                       build_merge_index, detect_type, load_timetable,
+                       parse_professor, parse_student)
+from synthetic import generate_workbook
+
+REPEATS = 5
+# Строки под расписанием в большой оформленной выгрузке
+LARGE_EXPORT_ROWS = 3000
+
+
+# Прежний способ: книга полностью открывается дважды (check_type и read_professor/read_student)
+def legacy_load(file_name):
+    workbook = openpyxl.load_workbook(file_name)
+    doc_type = detect_type(workbook.active['C2'].value)
+    workbook = openpyxl.load_workbook(file_name)
+    sheet = workbook.active
+    cells = {(cell.row, cell.column): cell.value
+             for row in sheet.iter_rows(min_row=TITLE_ROW, max_row=LAST_ROW, min_col=2, max_col=8)
+             for cell in row}
+    sheet_data = SheetData(cells[(TITLE_ROW, TITLE_COLUMN)], cells, build_merge_index(sheet.merged_cells.ranges))
+    if doc_type == DocType.PROFESSOR:
+        return parse_professor(sheet_data)
+    return parse_student(sheet_data)
+
+
+# Функция для замера среднего времени и пикового потребления памяти
+def measure(load, file_name):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        load(file_name)
+    elapsed = (time.perf_counter() - started) / REPEATS
+    tracemalloc.start()
+    load(file_name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    file_names = sys.argv[1:]
+    if not file_names:
+        # Без аргументов замер выполняется на синтетических книгах преподавателя и группы
+        # и на большой выгрузке с оформлением каждой ячейки и тысячами строк под расписанием
+        work_dir = tempfile.mkdtemp()
+        workbooks = [(f"synthetic_{doc_type.name.lower()}", generate_workbook(doc_type)) for doc_type in DocType]
+        workbooks.append(("synthetic_large_export", generate_workbook(styled=True, extra_rows=LARGE_EXPORT_ROWS)))
+        for name, data in workbooks:
+            file_names.append(os.path.join(work_dir, f"{name}.xlsx"))
+            with open(file_names[-1], 'wb') as file:
+                file.write(data)
+    for file_name in file_names:
+        print(f"{file_name} ({os.path.getsize(file_name) / 1024:.0f} КБ)")
+        for title, load in [("Два полных открытия", legacy_load),
+                            ("Одно открытие openpyxl", lambda name: load_timetable(name, fast=False)),
+                            ("Потоковое чтение XML", load_timetable)]:
+            elapsed, peak = measure(load, file_name)
+            print(f"  {title}: {elapsed * 1000:.1f} мс, пик памяти {peak / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from metrics import Metrics
+
+ITERATIONS = 200000
+
+
+# Функция для замера средней стоимости одной операции в микросекундах
+def measure(operation):
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        operation()
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+def main():
+    metrics = Metrics()
+
+    def empty():
+        pass
+
+    def span():
+        with metrics.span("stage"):
+            pass
+
+    def observe():
+        metrics.observe("stage", 0.0123)
+
+    def increment():
+        metrics.increment("requests")
+
+    baseline = measure(empty)
+    for title, operation in (("span", span), ("observe", observe), ("increment", increment)):
+        print(f"{title:<10} {measure(operation) - baseline:6.2f} мкс")
+    started = time.perf_counter()
+    snapshot = metrics.snapshot()
+    print(f"snapshot   {(time.perf_counter() - started) * 1e6:6.1f} мкс, p99 {snapshot['stages']['stage']['p99'] * 1000:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
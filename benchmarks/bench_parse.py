@@ -0,0 +1,35 @@
+import io
+import os
+import sys
+import time
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from parse_xls import parse_professor, read_sheet
+from synthetic import synthetic_workbook
+
+REPEATS = 10
+
+
+# Функция для замера времени разбора уже прочитанного листа (без чтения xlsx)
+def measure(sheet_data):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        _, schedule = parse_professor(sheet_data)
+    return (time.perf_counter() - started) / REPEATS, len(schedule)
+
+
+def main():
+    # Время на одно занятие должно оставаться примерно постоянным при росте книги
+    for entries_per_cell in (1, 2, 4, 8, 16):
+        sheet_data = read_sheet(io.BytesIO(synthetic_workbook(entries_per_cell=entries_per_cell)))
+        elapsed, lessons = measure(sheet_data)
+        print(f"Занятий в ячейке: {entries_per_cell:2}, занятий: {lessons:4}, "
+              f"разбор {elapsed * 1000:7.2f} мс ({elapsed / lessons * 1e6:6.1f} мкс на занятие)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Подключаем локально написанные модули из папок scripts и src
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+sys.path.append(os.path.join(dir_path, '..', 'src'))
+
+from bench_bot_concurrency import ADMIN_ID, TOKEN, FakeBotApi
+from http.server import ThreadingHTTPServer
+from synthetic import generate_workbook
+
+# Пауза между загрузками файлов разными пользователями и время на выбор диапазона, с
+UPLOAD_INTERVAL = 0.25
+THINK_TIME = 2.0
+
+
+class ClickingBotApi(FakeBotApi):
+    """
+    Bot API, в котором каждый пользователь присылает свою книгу, а после ответа бота
+    через think_time секунд нажимает кнопку клавиатуры. Запоминается время от нажатия до PDF.
+    """
+
+    def __init__(self, workbooks, preset, think_time):
+        super().__init__(None, {}, set())
+        self.workbooks = workbooks  # chat_id -> содержимое книги
+        self.preset = preset
+        self.think_time = think_time
+        self.clicked_at = {}
+        self.click_latency = {}
+
+    def file_data(self, file_path):
+        return self.workbooks[int(file_path.split('.')[0])]
+
+    def push_callback(self, chat_id, data):
+        with self.condition:
+            self.update_id += 1
+            self.message_id += 1
+            chat = {"id": chat_id, "type": "private"}
+            user = {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"}
+            self.updates.append({"update_id": self.update_id, "callback_query": {
+                "id": str(self.update_id), "from": user, "chat_instance": str(chat_id), "data": data,
+                "message": {"message_id": self.message_id, "date": int(time.time()), "chat": chat},
+            }})
+            self.clicked_at[chat_id] = time.perf_counter()
+            self.condition.notify_all()
+
+    def on_reply(self, method, chat_id, text):
+        if text and text.startswith("Файл получен"):
+            threading.Timer(self.think_time, self.push_callback, (chat_id, self.preset)).start()
+        elif method == "sendDocument":
+            self.click_latency[chat_id] = time.perf_counter() - self.clicked_at[chat_id]
+        return super().on_reply(method, chat_id, text)
+
+
+# Функция для одного прогона: users пользователей присылают разные книги и нажимают кнопку preset.
+# Возвращает время от нажатия до PDF по пользователям и счётчики фоновой отрисовки
+async def run(telegram_main, users, preset, speculative, seed):
+    telegram_main.SPECULATIVE_RENDER = speculative
+    telegram_main.pdf_cache.clear()
+    # Книги разные в каждом прогоне, чтобы разбор не брался из кеша прошлого прогона
+    workbooks = {1000 + index: generate_workbook(seed=seed + index) for index in range(users)}
+    api = ClickingBotApi(workbooks, preset, THINK_TIME)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), api.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    counters_before = dict(telegram_main.metrics.counters)
+
+    application = telegram_main.build_application(TOKEN, f"http://127.0.0.1:{server.server_port}")
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0)
+        for chat_id in workbooks:
+            api.push_document(chat_id, file_id=str(chat_id))
+            await asyncio.sleep(UPLOAD_INTERVAL)
+        while len(api.click_latency) < users:
+            await asyncio.sleep(0.05)
+        await application.updater.stop()
+        await application.stop()
+    await telegram_main.render_pool.shutdown()
+    server.shutdown()
+    counters = {name: value - counters_before.get(name, 0) for name, value in telegram_main.metrics.counters.items()}
+    return sorted(api.click_latency.values()), counters
+
+
+async def compare(users, preset):
+    import telegram_main
+
+    for speculative, seed in ((False, 1), (True, 1000)):
+        latency, counters = await run(telegram_main, users, preset, speculative, seed)
+        print(f"Фоновая отрисовка {'включена' if speculative else 'выключена'}: от нажатия до PDF "
+              f"медиана {latency[len(latency) // 2] * 1000:.0f} мс, максимум {latency[-1] * 1000:.0f} мс")
+        if speculative:
+            print(f"  отрисовано заранее {counters.get('speculative_renders', 0)}, "
+                  f"использовано {counters.get('speculative_used', 0)}, "
+                  f"отменено заданий {counters.get('speculative_cancelled', 0)}")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    preset = sys.argv[2] if len(sys.argv) > 2 else 'all'
+    # Бот сохраняет файлы и кеш в текущем каталоге, поэтому запускаем его во временном
+    os.chdir(tempfile.mkdtemp())
+    os.environ.setdefault("TELEGRAM_TOKEN", TOKEN)
+    os.environ.setdefault("ADMIN_ID", str(ADMIN_ID))
+    os.environ.setdefault("MODERATOR_ID", "0")
+    os.environ.setdefault("METRICS_PORT", "")
+    print(f"Пользователей: {users}, кнопка {preset!r}, выбор диапазона {THINK_TIME:.1f} с")
+    asyncio.run(compare(users, preset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from build_svg import RENDERER_VERSION, SEM_END, SEM_START, TableFormer, align_to_weeks, prepare_data
+from conflicts import find_conflicts
+from draw_backends import CairoPdfBackend, SvgBackend
+from parse_xls import (PARSER_VERSION, DocType, Timetable, check_type, detect_type, expand_occurrences,
+                       parse_professor, parse_student, read_sheet)
+from synthetic import generate_workbook
+
+# Наборы книг: (вид расписания, записей о занятиях, недель, длина названия предмета)
+CASES = [
+    (doc_type, lessons, 17, text_length)
+    for doc_type in (DocType.PROFESSOR, DocType.STUDENT)
+    for lessons in (20, 40, 84)
+    for text_length in (20, 60)
+]
+QUICK_CASES = [(DocType.PROFESSOR, 40, 17, 30), (DocType.STUDENT, 40, 17, 30)]
+# Во сколько раз медиана этапа может превысить базовую, прежде чем считается регрессией
+DEFAULT_THRESHOLD = 1.2
+
+
+# Функция для замера этапа: setup готовит входные данные (не входит в замер), stage выполняется repeats раз.
+# Возвращает время в миллисекундах и результат последнего выполнения
+def measure(stage, repeats, setup=None):
+    timings = []
+    for _ in range(repeats):
+        argument = setup() if setup else None
+        started = time.perf_counter()
+        result = stage(argument) if setup else stage()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "median_ms": timings[len(timings) // 2],
+        "min_ms": timings[0],
+        "mean_ms": sum(timings) / len(timings),
+    }, result
+
+
+# Функция для замера всех этапов обработки одной книги по отдельности
+def run_case(doc_type, lessons, weeks, text_length, repeats, work_dir):
+    data = generate_workbook(doc_type, lessons, weeks, text_length)
+    parse = parse_professor if doc_type == DocType.PROFESSOR else parse_student
+    stages = {}
+
+    stages["check_type"], _ = measure(lambda: check_type(io.BytesIO(data)), repeats)
+    stages["read_sheet"], sheet_data = measure(lambda: read_sheet(io.BytesIO(data)), repeats)
+    stages["parse"], (label, schedule) = measure(lambda: parse(sheet_data), repeats)
+    stages["find_conflicts"], conflicts = measure(lambda: find_conflicts(expand_occurrences(schedule)), repeats)
+    timetable = Timetable(detect_type(sheet_data.title), label, schedule, conflicts)
+
+    window = align_to_weeks(SEM_START, SEM_END)
+    stages["prepare_data"], (exercises, weekday_time_spans) = measure(
+        lambda: prepare_data(timetable.occurrences(*window), SEM_START, SEM_END), repeats)
+
+    # Для каждого повтора отрисовки создаётся новая таблица, её создание в замер не входит
+    def new_table(backend, file_name=None):
+        return lambda: TableFormer(label, SEM_START, SEM_END, exercises, weekday_time_spans, file_name, backend=backend)
+
+    def drawn_svg():
+        table_former = new_table(SvgBackend, os.path.join(work_dir, "timetable.svg"))()
+        table_former.draw_timetable()
+        return table_former
+
+    stages["draw_timetable"], _ = measure(lambda table_former: table_former.draw_timetable(), repeats,
+                                          new_table(SvgBackend))
+    stages["save"], _ = measure(lambda table_former: table_former.save(), repeats, drawn_svg)
+    svg = drawn_svg().to_bytes()
+
+    import cairosvg
+    stages["svg2pdf"], _ = measure(lambda: cairosvg.svg2pdf(bytestring=svg), repeats)
+
+    # Отрисовка сразу в PDF (RENDER_BACKEND=pdf)
+    def draw_pdf(table_former):
+        table_former.draw_timetable()
+        return table_former.to_bytes()
+
+    stages["draw_pdf"], pdf = measure(draw_pdf, repeats, new_table(CairoPdfBackend))
+
+    return {
+        "name": f"{doc_type.name.lower()}-{lessons}l-{weeks}w-{text_length}c",
+        "workbook": {"type": doc_type.name.lower(), "lessons": lessons, "weeks": weeks,
+                     "text_length": text_length, "bytes": len(data)},
+        "lessons_parsed": len(schedule),
+        "occurrences": sum(len(intervals) for intervals in exercises.values()),
+        "conflicts": len(conflicts),
+        "svg_bytes": len(svg),
+        "pdf_bytes": len(pdf),
+        "stages": stages,
+    }
+
+
+# Функция для сравнения с результатами прошлого запуска: возвращает список регрессий
+def compare(results, baseline, threshold, output=sys.stderr):
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        base_case = baseline_cases.get(case["name"])
+        if base_case is None:
+            continue
+        for stage, timing in case["stages"].items():
+            base_timing = base_case["stages"].get(stage)
+            if not base_timing or not base_timing["median_ms"]:
+                continue
+            ratio = timing["median_ms"] / base_timing["median_ms"]
+            mark = ""
+            if ratio > threshold:
+                mark = "  <- регрессия"
+                regressions.append({"case": case["name"], "stage": stage, "ratio": ratio})
+            print(f"{case['name']:<28} {stage:<15} {base_timing['median_ms']:9.2f} -> "
+                  f"{timing['median_ms']:9.2f} мс ({ratio:5.2f}x){mark}", file=output)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер этапов разбора, раскладки и отрисовки на синтетических книгах")
+    parser.add_argument("-o", "--output", help="файл для результатов в JSON (по умолчанию - стандартный вывод)")
+    parser.add_argument("--repeats", type=int, default=5, help="количество повторов каждого этапа")
+    parser.add_argument("--quick", action="store_true", help="только две книги среднего размера")
+    parser.add_argument("--baseline", help="JSON прошлого запуска для сравнения")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление медианы относительно baseline")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser_version": PARSER_VERSION,
+            "renderer_version": RENDERER_VERSION,
+            "repeats": args.repeats,
+        },
+        "cases": [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for doc_type, lessons, weeks, text_length in (QUICK_CASES if args.quick else CASES):
+            case = run_case(doc_type, lessons, weeks, text_length, args.repeats, work_dir)
+            results["cases"].append(case)
+            print(f"{case['name']}: " + ", ".join(f"{stage} {timing['median_ms']:.1f}"
+                                                  for stage, timing in case["stages"].items()) + " мс",
+                  file=sys.stderr)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        if regressions:
+            print(f"Регрессий: {len(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from build_svg import SEM_END, SEM_START, TableFormer, prepare_data
+from draw_backends import CompactSvgBackend, SvgBackend
+from synthetic import synthetic_semester
+
+REPEATS = 5
+
+
+# Функция для отрисовки семестра в SVG заданным способом
+def render_svg(backend, data, weekday_time_spans):
+    table_former = TableFormer("Иванов Иван Иванович", SEM_START, SEM_END, data, weekday_time_spans, backend=backend)
+    table_former.draw_timetable()
+    return table_former.to_bytes()
+
+
+# Функция для замера медианного времени вызова
+def measure(function):
+    function()  # Прогрев: шрифты и кеш раскладки
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2], result
+
+
+def main():
+    import cairosvg
+
+    for lessons_per_day in (2, 4, 6):
+        exercises = synthetic_semester(lessons_per_day=lessons_per_day)
+        data, weekday_time_spans = prepare_data(exercises, SEM_START, SEM_END)
+        print(f"Семестр, занятий в день: {lessons_per_day} (всего {len(exercises)}):")
+        for title, backend in (("SVG", SvgBackend), ("компактный SVG", CompactSvgBackend)):
+            draw_elapsed, svg = measure(lambda: render_svg(backend, data, weekday_time_spans))
+            pdf_elapsed, pdf = measure(lambda: cairosvg.svg2pdf(bytestring=svg))
+            print(f"  {title:<15} SVG {len(svg) / 1024:6.1f} КБ за {draw_elapsed * 1000:6.1f} мс, "
+                  f"svg2pdf {pdf_elapsed * 1000:7.1f} мс, PDF {len(pdf) / 1024:6.1f} КБ")
+
+
+if __name__ == "__main__":
+    main()
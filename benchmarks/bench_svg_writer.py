@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import tracemalloc
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from build_svg import SEM_END, SEM_START, TableFormer, prepare_data
+from draw_backends import FONT_FAMILY, CompactSvgBackend, SvgBackend
+from synthetic import synthetic_semester
+
+REPEATS = 5
+
+
+class SvgwriteBackend:
+    """
+    Прежняя отрисовка в SVG через svgwrite: все элементы хранятся объектами
+    в дереве документа до сериализации.
+    """
+
+    def __init__(self, width, height, file_name=None):
+        import svgwrite
+        self.dwg = svgwrite.Drawing(file_name, profile='full', size=(f"{width}", f"{height}"))
+
+    def rect(self, x, y, width, height, **style):
+        self.dwg.add(self.dwg.rect(insert=(x, y), size=(width, height), **style))
+
+    def text(self, text, x, y, font_size, text_anchor=None):
+        if text_anchor is None:
+            self.dwg.add(self.dwg.text(text, insert=(x, y), font_family=FONT_FAMILY, font_size=font_size))
+        else:
+            self.dwg.add(self.dwg.text(text, insert=(x, y), text_anchor=text_anchor,
+                                       font_family=FONT_FAMILY, font_size=font_size))
+
+    def tostring(self):
+        return self.dwg.tostring()
+
+
+# Функция для отрисовки семестра в SVG заданным способом
+def render_svg(backend, data, weekday_time_spans):
+    table_former = TableFormer("Иванов Иван Иванович", SEM_START, SEM_END, data, weekday_time_spans, backend=backend)
+    table_former.draw_timetable()
+    return table_former.tostring()
+
+
+# Функция для замера медианного времени, пика памяти Python и количества блоков памяти,
+# которые занимает нарисованный, но ещё не сериализованный документ
+def measure(backend, data, weekday_time_spans):
+    svg = render_svg(backend, data, weekday_time_spans)  # Прогрев: шрифты и кеш раскладки
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        render_svg(backend, data, weekday_time_spans)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    table_former = TableFormer("Иванов Иван Иванович", SEM_START, SEM_END, data, weekday_time_spans, backend=backend)
+    before = tracemalloc.take_snapshot()
+    table_former.draw_timetable()
+    after = tracemalloc.take_snapshot()
+    table_former.tostring()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return sorted(timings)[len(timings) // 2], peak, blocks, svg
+
+
+def main():
+    failed = False
+    for lessons_per_day in (2, 4, 6):
+        exercises = synthetic_semester(lessons_per_day=lessons_per_day)
+        data, weekday_time_spans = prepare_data(exercises, SEM_START, SEM_END)
+        print(f"Семестр, занятий в день: {lessons_per_day} (всего {len(exercises)}):")
+        documents = {}
+        for title, backend in (("svgwrite", SvgwriteBackend), ("потоковая запись", SvgBackend),
+                               ("компактный SVG", CompactSvgBackend)):
+            elapsed, peak, blocks, documents[title] = measure(backend, data, weekday_time_spans)
+            print(f"  {title:<17} {elapsed * 1000:7.1f} мс, пик памяти {peak / 1024:7.1f} КБ, "
+                  f"блоков памяти в документе {blocks:6d}")
+        same = documents["svgwrite"] == documents["потоковая запись"]
+        print(f"  документ совпадает с svgwrite: {'да' if same else 'нет'}")
+        failed = failed or not same
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import io
+import os
+import random
+import re
+import sys
+import time
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+from parse_xls import (DocType, extract_single_lesson_info,
+                       extract_single_students_lesson_info, read_sheet)
+from synthetic import generate_workbook
+
+REPEATS = 5
+# Количество случайно собранных строк для проверки совпадения результатов
+FUZZ_LESSONS = 20000
+
+# Записи, на которых разные поля могут пересекаться: аудитория с датой, группа с датой,
+# тип занятия внутри названия, пустые и неполные записи
+EDGE_CASES = [
+    "",
+    "ауд.305",
+    "ауд.12.03 Физика (ЛК) М3О-101Бк-23 09.02-01.06",
+    "ауд.305 Физика (ЛК) М3О-101Бк-23.05.06 16.02",
+    "ауд.305 ЛКИ (ПЗ) М3О-101Бк-23 М4О-202Бк-22 09.02 16.02-01.06",
+    "ЛК ауд.305 Физика М3О-101Бк-23",
+    "5 ауд.5 Физика (ЛР) М3О-101Бк-23 09.02-01.06",
+    "ауд.каф.(-) Основы радиолокации (ЛР) М3О-101Бк-23 23.02-23.02",
+    "ауд.101(ГУК) Физика (ЛК) ПЗА-101Бк-23 09.02-01.06",
+    "ауд.Зал Б(1) Физкультура (ПЗ) 09.02-01.06",
+    "ауд.Зал  Спортивный(2) Физкультура (ПЗ) М1О-101Бк-23",
+    "ауд.каф. 12(-) Физика (ЛК) Иванов И.И. 09.02-01.06 Петров П.П. 16.02",
+    "ауд.101(Корпус А. Физика (ЛК) Иванов И.И. 09.02",
+    "ауд.) Физика (ПЗ) Сидорова А.В.",
+    "ауд.305 Физика (ЛК)\nИванов И.И.\n09.02-01.06",
+    "ауд.ауд.305 Физика (ЛР) Иванов И. 09.02-09.02",
+]
+# Фрагменты, из которых собираются случайные записи
+FRAGMENTS = ["ауд.", "305", "12", "(", ")", "(-)", "каф.", "Зал ", "ГУК", " ", "\n", "ЛК", "ЛР", "ПЗ", "(ЛК)",
+             "Физика", "М3О-101Бк-23", "ПЗА-101Бк-23", "-", ".", "09.02", "01.06", "-23", "Иванов И.И.", "А.", "Б"]
+
+
+# Прежний разбор записи расписания преподавателя: отдельный поиск каждого поля
+def legacy_extract_single_lesson_info(lesson):
+    room_match = re.search(r"ауд\.(каф\.\(-\)|\d+\([А-Яа-я\s]+\)|\d+\(?\d?\)?|Зал\s+[А-Яа-я]+\(\d+\))", lesson)
+    room = room_match.group(1) if room_match else None
+    lesson_type_match = re.search(r"(ЛР|ЛК|ПЗ)", lesson)
+    lesson_type = lesson_type_match.group(1) if lesson_type_match else None
+    if room and lesson_type:
+        subject_start = lesson.find(room) + len(room) + 1
+        subject_end = lesson.find(lesson_type) - 2
+        subject = lesson[subject_start:subject_end].strip()
+    else:
+        subject = None
+    group_pattern = r"([А-Я][\dА-Я][А-Я]-\d{3}[А-Яа-я]+-\d{2})"
+    groups = re.findall(group_pattern, lesson)
+    dates = re.findall(r"(\d{2}\.\d{2}(?:-\d{2}\.\d{2})?)", lesson)
+    if dates:
+        for i, d in enumerate(dates):
+            if '-' not in d:
+                dates[i] = f"{d}-{d}"
+    else:
+        dates = None
+    return room, subject, lesson_type, groups, dates
+
+
+# Прежний разбор записи расписания группы
+def legacy_extract_single_students_lesson_info(lesson):
+    room_match = re.search(r"ауд\.(каф\.( *\d*)\(-\)|\d+\([А-Яа-я\s]+|d*\)|Зал [А-Я]\(?\d*\)|\d+\(?\d*\)?)", lesson)
+    room = room_match.group(1) if room_match else None
+    lesson_type_match = re.search(r"(ЛР|ЛК|ПЗ)", lesson)
+    lesson_type = lesson_type_match.group(1) if lesson_type_match else None
+    if room and lesson_type:
+        subject_start = lesson.find(room) + len(room) + 1
+        subject_end = lesson.find(lesson_type) - 2
+        subject = lesson[subject_start:subject_end].strip()
+    else:
+        subject = None
+    professor_pattern = r"([А-Я][а-я]+ [А-Я]\.+(?:[А-Я]\.)*)"
+    professors = re.findall(professor_pattern, lesson)
+    if len(professors) > 0:
+        professor = professors[0]
+    else:
+        professor = ''
+    dates_match = re.search(r"(\d{2}\.\d{2}(?:-\d{2}\.\d{2})?)", lesson)
+    if dates_match:
+        dates = dates_match.group(1)
+        if "-" not in dates:
+            dates = f"{dates}-{dates}"
+    else:
+        dates = None
+    return room, subject, lesson_type, professor, dates
+
+
+# Функция для сбора записей о занятиях из синтетических книг (так, как их делит extract_*_info)
+def workbook_lessons(doc_type):
+    lessons = []
+    for lessons_count, text_length in ((40, 20), (84, 60), (300, 30)):
+        sheet_data = read_sheet(io.BytesIO(generate_workbook(doc_type, lessons_count, 17, text_length)))
+        for value in sheet_data.cells.values():
+            if isinstance(value, str):
+                lessons.extend(value.split('---'))
+    return lessons
+
+
+def fuzz_lessons(seed=1):
+    random.seed(seed)
+    return ["".join(random.choice(FRAGMENTS) for _ in range(random.randint(1, 14))) for _ in range(FUZZ_LESSONS)]
+
+
+# Функция для проверки совпадения результатов на корпусе записей: возвращает список расхождений
+def compare(extract, legacy_extract, corpus):
+    return [(lesson, extract(lesson), legacy_extract(lesson)) for lesson in corpus
+            if extract(lesson) != legacy_extract(lesson)]
+
+
+# Функция для замера пропускной способности в записях о занятиях в секунду
+def throughput(extract, corpus):
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for lesson in corpus:
+            extract(lesson)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(corpus) / best
+
+
+def main():
+    failed = False
+    for doc_type, extract, legacy_extract in (
+            (DocType.PROFESSOR, extract_single_lesson_info, legacy_extract_single_lesson_info),
+            (DocType.STUDENT, extract_single_students_lesson_info, legacy_extract_single_students_lesson_info)):
+        lessons = workbook_lessons(doc_type)
+        corpus = lessons + EDGE_CASES + fuzz_lessons()
+        mismatches = compare(extract, legacy_extract, corpus)
+        print(f"{doc_type.name.lower()}: записей {len(corpus)}, расхождений {len(mismatches)}")
+        for lesson, result, expected in mismatches[:5]:
+            print(f"  {lesson!r}\n    получено:  {result}\n    ожидалось: {expected}")
+        failed = failed or bool(mismatches)
+        legacy_rate = throughput(legacy_extract, lessons)
+        rate = throughput(extract, lessons)
+        print(f"  прежний разбор {legacy_rate:10.0f} записей/с, за один проход {rate:10.0f} записей/с "
+              f"({rate / legacy_rate:.2f}x)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import io
+import os
+import random
+import sys
+from datetime import timedelta
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+sys.path.append(scripts_path)
+
+import openpyxl
+from build_svg import SEM_END, SEM_START
+from openpyxl.utils import get_column_letter
+from parse_xls import (FIRST_COLUMN, FIRST_ROW, LAST_COLUMN, LAST_ROW,
+                       TITLE_COLUMN, TITLE_ROW, DocType, Lesson, Occurrence)
+
+SUBJECTS = [
+    "Математический анализ",
+    "Физика",
+    "Теория вероятностей и математическая статистика",
+    "Программирование",
+    "Основы радиолокации",
+    "Иностранный язык",
+]
+TYPES = ["ЛК", "ПЗ", "ЛР"]
+ROOMS = ["305", "4-12", "каф.(-)", "101(ГУК)"]
+# Аудитории, которые одинаково распознаются в расписаниях преподавателя и группы
+WORKBOOK_ROOMS = ["305", "101(2)", "каф.(-)"]
+PROFESSORS = ["Иванов И.И.", "Петров П.П.", "Сидорова А.В.", "Кузнецов Д.С."]
+# Слова для названий предметов произвольной длины: со строчной буквы, без сокращений ЛК/ПЗ/ЛР,
+# чтобы название не принималось за группу, преподавателя или тип занятия
+SUBJECT_WORDS = ["основы", "теории", "цифровой", "обработки", "сигналов", "систем", "управления",
+                 "методы", "анализа", "данных", "проектирования", "антенн", "устройств", "радиосвязи"]
+TIME_SLOTS = [
+    ('09:00', '10:30'),
+    ('10:45', '12:15'),
+    ('13:00', '14:30'),
+    ('14:45', '16:15'),
+    ('16:30', '18:00'),
+    ('18:15', '19:45'),
+    ('20:00', '21:30'),
+]
+
+
+# Функция для получения названия группы по номеру
+def synthetic_group(number):
+    return f"М{number % 9 + 1}О-{100 + number}Бк-23"
+
+
+# Функция для формирования синтетического расписания преподавателя на весь семестр
+# в том же виде, в котором его возвращает load_timetable (список Occurrence)
+def synthetic_semester(lessons_per_day=4, seed=1):
+    random.seed(seed)
+    exercises = []
+    for weekday in range(6):
+        for slot in random.sample(TIME_SLOTS, lessons_per_day):
+            group = tuple(synthetic_group(random.randint(0, 40)) for _ in range(random.randint(1, 5)))
+            room = random.choice(ROOMS)
+            lesson_type = random.choice(TYPES)
+            lesson = Lesson(random.choice(SUBJECTS), lesson_type, room, group, slot[0], slot[1])
+            date = SEM_START + timedelta(days=weekday)
+            while date <= SEM_END:
+                exercises.append(Occurrence(date, lesson))
+                date += timedelta(days=7)
+    return exercises
+
+
+# Функция для формирования синтетической книги преподавателя (xlsx в памяти).
+# Каждая ячейка объединена на две строки (занятие каждую неделю) и содержит
+# entries_per_cell занятий на весь семестр, разделённых "---"
+def synthetic_workbook(entries_per_cell=3, seed=1):
+    random.seed(seed)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.cell(TITLE_ROW, TITLE_COLUMN).value = "Расписание преподавателя Иванов Иван Иванович"
+    for row in range(FIRST_ROW, LAST_ROW + 1, 2):
+        for column in range(FIRST_COLUMN, LAST_COLUMN + 1):
+            entries = []
+            for _ in range(entries_per_cell):
+                groups = " ".join(synthetic_group(random.randint(0, 40)) for _ in range(random.randint(1, 5)))
+                entries.append(f"ауд.{random.choice(ROOMS)} {random.choice(SUBJECTS)} ({random.choice(TYPES)}) "
+                               f"{groups} {SEM_START:%d.%m}-{SEM_END:%d.%m}")
+            sheet.cell(row, column).value = "---".join(entries)
+            sheet.merge_cells(start_row=row, start_column=column, end_row=row + 1, end_column=column)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+# Функция для формирования названия предмета длиной примерно text_length символов
+def synthetic_subject(text_length):
+    words = [random.choice(SUBJECTS).split()[0]]
+    while len(" ".join(words)) < text_length:
+        words.append(random.choice(SUBJECT_WORDS))
+    return " ".join(words)
+
+
+# Функция для формирования записи о занятии в том виде, в котором она встречается в ячейке
+def synthetic_entry(doc_type, subject, date_range):
+    lesson_type = random.choice(TYPES)
+    room = random.choice(WORKBOOK_ROOMS)
+    if doc_type == DocType.PROFESSOR:
+        groups = " ".join(synthetic_group(random.randint(0, 40)) for _ in range(random.randint(1, 5)))
+        return f"ауд.{room} {subject} ({lesson_type}) {groups} {date_range}"
+    return f"ауд.{room} {subject} ({lesson_type}) {random.choice(PROFESSORS)} {date_range}"
+
+
+# Функция для разбиения weeks недель на count последовательных диапазонов дат "ДД.ММ-ДД.ММ".
+# Для занятий через неделю (step=2) границы диапазонов совпадают с датами занятий,
+# нижняя неделя (second_week) начинается на неделю позже верхней
+def synthetic_date_ranges(weekday, weeks, count, second_week=False, step=1):
+    periods = max(1, (weeks - second_week) // step)
+    count = min(count, periods)
+    bounds = [periods * index // count for index in range(count + 1)]
+    first_date = SEM_START + timedelta(days=weekday, weeks=int(second_week))
+    return [f"{first_date + timedelta(weeks=bounds[index] * step):%d.%m}-"
+            f"{first_date + timedelta(weeks=(bounds[index + 1] - 1) * step):%d.%m}" for index in range(count)]
+
+
+# Функция для формирования синтетической книги расписания (xlsx в байтах) в том виде,
+# который ожидают read_professor и read_student: подпись в C2, строки 5-16 (по две на день),
+# столбцы B-H (время занятий). В книге встречаются объединённые ячейки (занятие каждую неделю),
+# отдельные ячейки верхней и нижней недели, пары объединённых занятий в соседних столбцах
+# и ячейки с несколькими занятиями через "---", каждое на своём диапазоне дат.
+# lessons - количество записей о занятиях (в ячейке не больше одной записи на неделю), weeks - продолжительность семестра в неделях,
+# text_length - примерная длина названия предмета в символах.
+# styled - оформление ячеек, как в выгрузке: шрифты, рамки, заливка и формат чисел;
+# extra_rows - количество заполненных строк под расписанием (служебные таблицы выгрузки)
+def generate_workbook(doc_type=DocType.PROFESSOR, lessons=40, weeks=17, text_length=30, seed=1,
+                      styled=False, extra_rows=0):
+    random.seed(seed)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    if doc_type == DocType.PROFESSOR:
+        sheet.cell(TITLE_ROW, TITLE_COLUMN).value = "Расписание преподавателя Иванов Иван Иванович"
+    else:
+        sheet.cell(TITLE_ROW, TITLE_COLUMN).value = "Расписание группы М3О-101Бк-23"
+
+    # Ячейка - день недели и номер столбца. Записей больше, чем ячеек, поэтому часть ячеек
+    # содержит несколько записей: по верхней и нижней неделе или через "---"
+    cells = [(row, column) for row in range(FIRST_ROW, LAST_ROW + 1, 2)
+             for column in range(FIRST_COLUMN, LAST_COLUMN + 1)]
+    random.shuffle(cells)
+    cells = cells[:max(1, (lessons * 3 + 3) // 4)]
+    counts = {cell: lessons // len(cells) + (index < lessons % len(cells)) for index, cell in enumerate(cells)}
+    taken = set()
+    for row, column in cells:
+        if (row, column) in taken:
+            continue
+        taken.add((row, column))
+        count = counts[(row, column)]
+        weekday = (row - FIRST_ROW) // 2
+        kind = random.random()
+        if kind < 0.4 and count > 1 and weeks > 1:
+            # Отдельные ячейки: разные занятия по верхним и нижним неделям
+            for second_week, week_count in ((False, count // 2), (True, count - count // 2)):
+                sheet.cell(row + second_week, column).value = "---".join(
+                    synthetic_entry(doc_type, synthetic_subject(text_length), date_range)
+                    for date_range in synthetic_date_ranges(weekday, weeks, week_count, second_week, step=2))
+            continue
+        columns = [column]
+        if kind > 0.85 and column < LAST_COLUMN and (row, column + 1) not in taken:
+            # Занятие на два промежутка подряд: одинаковый текст в соседних ячейках.
+            # Записи соседней ячейки переходят в эту, чтобы их общее количество не изменилось
+            columns.append(column + 1)
+            taken.add((row, column + 1))
+            count += counts.get((row, column + 1), 0)
+        # Несколько занятий в ячейке идут друг за другом: у каждого свой диапазон дат
+        text = "---".join(synthetic_entry(doc_type, synthetic_subject(text_length), date_range)
+                          for date_range in synthetic_date_ranges(weekday, weeks, count))
+        for cell_column in columns:
+            sheet.cell(row, cell_column).value = text
+            letter = get_column_letter(cell_column)
+            sheet.merge_cells(f"{letter}{row}:{letter}{row + 1}")
+    if styled or extra_rows:
+        add_export_noise(sheet, styled, extra_rows)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+# Функция для добавления к листу того, что есть в больших выгрузках расписания:
+# оформления каждой ячейки и строк с числами и текстом ниже области расписания
+def add_export_noise(sheet, styled, extra_rows):
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    side = Side(style='thin')
+    styles = [(Font(name=name, size=size, bold=bold), PatternFill('solid', fgColor=color))
+              for name, size, bold, color in (("Arial", 9, False, "FFFFFF"), ("Times New Roman", 10, True, "DDEBF7"),
+                                              ("Calibri", 11, False, "FCE4D6"), ("Arial", 8, True, "E2EFDA"))]
+    first_extra_row = LAST_ROW + 2
+    for row in range(1, first_extra_row + extra_rows):
+        for column in range(1, LAST_COLUMN + 5):
+            cell = sheet.cell(row, column)
+            if row >= first_extra_row:
+                cell.value = random.random() * 1000 if column % 2 else f"Строка {row} столбец {column}"
+            if styled:
+                cell.font, cell.fill = styles[(row + column) % len(styles)]
+                cell.border = Border(left=side, right=side, top=side, bottom=side)
+                cell.alignment = Alignment(wrap_text=True, vertical='center')
+                if row >= first_extra_row and column % 2:
+                    cell.number_format = '0.00'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетическая книга расписания для бенчмарков")
+    parser.add_argument("output", help="путь к создаваемому файлу .xlsx")
+    parser.add_argument("--type", choices=["professor", "student"], default="professor", help="вид расписания")
+    parser.add_argument("--lessons", type=int, default=40, help="количество записей о занятиях")
+    parser.add_argument("--weeks", type=int, default=17, help="продолжительность семестра в неделях")
+    parser.add_argument("--text-length", type=int, default=30, help="примерная длина названия предмета")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--styled", action="store_true", help="оформить ячейки, как в выгрузке")
+    parser.add_argument("--extra-rows", type=int, default=0, help="количество строк под расписанием")
+    args = parser.parse_args()
+    doc_type = DocType.PROFESSOR if args.type == "professor" else DocType.STUDENT
+    with open(args.output, 'wb') as output:
+        output.write(generate_workbook(doc_type, args.lessons, args.weeks, args.text_length, args.seed,
+                                       args.styled, args.extra_rows))
+
+
+if __name__ == "__main__":
+    main()
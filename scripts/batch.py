@@ -0,0 +1,205 @@
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+from timetable_cache import rendered_key, workbook_digest
+
+# Файл в каталоге результатов, где запоминается, из какого содержимого сформирован каждый PDF
+MANIFEST_NAME = ".batch_manifest.json"
+SUMMARY_NAME = "summary.json"
+# Этапы обработки одного файла, время которых попадает в сводку
+STAGES = ("read", "parse", "render", "write")
+
+
+# Задание на обработку одного файла
+class BatchJob(NamedTuple):
+    file_name: str
+    output_name: str  # Путь к итоговому PDF
+    start_date: object
+    end_date: object
+    no_color: bool
+    backend_name: str
+
+
+# Функция для получения списка книг по путям, каталогам и шаблонам (в том числе "**")
+def expand_inputs(inputs):
+    file_names = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.xlsx")
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for file_name in matches:
+            if file_name not in file_names:
+                file_names.append(file_name)
+    return file_names
+
+
+# Функция для выбора имён PDF: имя книги, а при совпадении имён из разных каталогов - с номером
+def output_names(file_names, output_dir):
+    names = {}
+    used = set()
+    for file_name in file_names:
+        stem = os.path.splitext(os.path.basename(file_name))[0]
+        name, number = stem, 1
+        while name in used:
+            number += 1
+            name = f"{stem}_{number}"
+        used.add(name)
+        names[file_name] = os.path.join(output_dir, f"{name}.pdf")
+    return names
+
+
+# Функция подготовки рабочего процесса: шрифт загружается один раз на процесс
+def warm_up():
+    import font_metrics
+    font_metrics.preload()
+
+
+# Функция обработки одного файла (выполняется в рабочем процессе). render - функция отрисовки
+# с параметрами render_timetable_pdf (по умолчанию она сама).
+# Возвращает время этапов и количество наложений, ошибки возвращаются вместе с трассировкой
+def process_workbook(job, render=None):
+    import io
+
+    from parse_xls import load_timetable
+    from render_pool import render_timetable_pdf
+
+    render = render or render_timetable_pdf
+
+    stages = {}
+    result = {"file": job.file_name, "output": job.output_name, "stages": stages}
+    try:
+        started = time.perf_counter()
+        with open(job.file_name, 'rb') as workbook_file:
+            data = workbook_file.read()
+        stages["read"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        timetable = load_timetable(io.BytesIO(data))
+        stages["parse"] = time.perf_counter() - started
+        if timetable is None:
+            raise ValueError("Невозможно определить тип документа")
+
+        started = time.perf_counter()
+        pdf = render(timetable, job.start_date, job.end_date, job.no_color, job.backend_name)
+        stages["render"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        temp_name = f"{job.output_name}.{os.getpid()}.tmp"
+        with open(temp_name, 'wb') as pdf_file:
+            pdf_file.write(pdf)
+        os.replace(temp_name, job.output_name)
+        stages["write"] = time.perf_counter() - started
+
+        result.update(status="ok", label=timetable.label, conflicts=len(timetable.conflicts))
+    except Exception as error:
+        result.update(status="failed", error=str(error), traceback=traceback.format_exc())
+    return result
+
+
+# Функция для получения ключа PDF в сведениях о запуске: содержимое книги, диапазон недель,
+# цветность, версии разбора и отрисовки и способ отрисовки (PDF разных способов отличаются)
+def manifest_key(data, start_date, end_date, no_color, backend_name):
+    return f"{rendered_key(workbook_digest(data), start_date, end_date, no_color)}-{backend_name}"
+
+
+# Функция для получения результата обработки файла. Если рабочий процесс аварийно завершился
+# (BrokenProcessPool), файл учитывается как обработанный с ошибкой, а остальные файлы - нет
+def job_result(future, job):
+    try:
+        return future.result()
+    except Exception as error:
+        return {"file": job.file_name, "output": job.output_name, "stages": {}, "status": "failed",
+                "error": str(error) or type(error).__name__, "traceback": traceback.format_exc()}
+
+
+# Функция для чтения сведений о прошлом запуске
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+# Функция пакетной обработки книг.
+# Книги, содержимое которых (и диапазон дат, цветность, версии разбора и отрисовки, способ отрисовки)
+# не изменилось с прошлого запуска, пропускаются. Ход работы печатается в progress.
+# target - функция обработки одного файла в рабочем процессе (по умолчанию process_workbook)
+def run_batch(inputs, output_dir, start_date, end_date, no_color=False, workers=None,
+              backend_name='svg', force=False, progress=sys.stdout, target=process_workbook):
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    file_names = expand_inputs(inputs)
+    names = output_names(file_names, output_dir)
+    manifest = {} if force else load_manifest(output_dir)
+
+    jobs = {}
+    skipped = []
+    failures = []
+    for file_name in file_names:
+        try:
+            with open(file_name, 'rb') as workbook_file:
+                key = manifest_key(workbook_file.read(), start_date, end_date, no_color, backend_name)
+        except OSError as error:
+            failures.append({"file": file_name, "error": str(error), "traceback": traceback.format_exc()})
+            continue
+        output_name = names[file_name]
+        if manifest.get(output_name) == key and os.path.exists(output_name):
+            skipped.append(file_name)
+            continue
+        jobs[file_name] = (BatchJob(file_name, output_name, start_date, end_date, no_color, backend_name), key)
+
+    print(f"Книг: {len(file_names)}, к обработке: {len(jobs)}, без изменений: {len(skipped)}", file=progress)
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    processed = 0
+    if jobs:
+        from font_embedding import register_font
+
+        # Процессы запускаются через spawn, как и в пуле бота, и наследуют настройки fontconfig
+        register_font()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=warm_up) as executor:
+            futures = {executor.submit(target, job): file_name for file_name, (job, _) in jobs.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                result = job_result(future, jobs[futures[future]][0])
+                for stage, elapsed in result["stages"].items():
+                    stage_totals[stage] += elapsed
+                if result["status"] == "ok":
+                    processed += 1
+                    manifest[result["output"]] = jobs[futures[future]][1]
+                    print(f"[{done}/{len(jobs)}] {result['file']}: {sum(result['stages'].values()):.2f} с, "
+                          f"наложений {result['conflicts']}", file=progress)
+                else:
+                    failures.append({key: result[key] for key in ("file", "error", "traceback")})
+                    manifest.pop(result["output"], None)
+                    print(f"[{done}/{len(jobs)}] {result['file']}: ошибка: {result['error']}", file=progress)
+        save_manifest(output_dir, manifest)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "files": len(file_names),
+        "processed": processed,
+        "skipped": len(skipped),
+        "failed": len(failures),
+        "elapsed": elapsed,
+        "files_per_second": processed / elapsed if elapsed else 0.0,
+        "stages": stage_totals,  # Суммарное время этапов во всех процессах, с
+        "failures": failures,
+    }
+    with open(os.path.join(output_dir, SUMMARY_NAME), 'w', encoding='utf-8') as summary_file:
+        json.dump(summary, summary_file, ensure_ascii=False, indent=2)
+    return summary
@@ -1,34 +1,51 @@
-import base64
 import colorsys
 import hashlib
 import json
 import os
 from datetime import datetime, timedelta
+from functools import lru_cache
 from math import ceil, floor
+from typing import NamedTuple
 
-import svgwrite
+from draw_backends import SvgBackend
+from font_metrics import measure_text
 from parse_xls import (  # Подключение специализированных функций из файла parse_xls.py
     extract_initials, shorten_group)
-from PIL import ImageFont
 
 # Задаем начальную и конечную даты семестра
 SEM_START = datetime(2026, 2, 9)
 SEM_END = datetime(2026, 6, 5)
 
+# Границы размера шрифта в ячейках расписания
+MAX_FONT_SIZE = 16
+MIN_FONT_SIZE = 2
+# Количество раскладок текста ячеек, которые хранятся между отрисовками
+LAYOUT_CACHE_SIZE = 4096
+# Количество разложенных столбцов недель, которые хранятся между отрисовками
+FRAGMENT_CACHE_SIZE = 1024
+# Версия отрисовки. Увеличивается при любом изменении внешнего вида расписания,
+# чтобы готовые PDF из кеша прежней версии не отправлялись пользователям
+RENDERER_VERSION = 8
+
+DAYS_OF_WEEK = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб"]
+
 # Получаем текущую директорию, где находится выполняемый скрипт
 current_directory = os.path.dirname(os.path.abspath(__file__))
-# Определяем путь к шрифту
 
 # Функция для вычисления ширины текста при отображении
 def get_text_width(text, font_size=10):
-    FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf" # Пример пути к шрифту
-    try:
-        font = ImageFont.truetype(FONT_PATH, font_size)  # Загружаем шрифт
-    except:
-        FONT_PATH = os.path.join(current_directory, "times.ttf")
-        font = ImageFont.truetype(FONT_PATH, font_size)  # Загружаем шрифт
-    width = font.getlength(text)*1.1  # Вычисляем длину текста с учетом шрифта
-    return width
+    # Ширина считается по кешированным метрикам шрифта (см. font_metrics.py)
+    return measure_text(text, font_size)*1.1  # Вычисляем длину текста с учетом шрифта
+
+# Функция для выравнивания диапазона дат по неделям: начало сдвигается назад,
+# а конец вперёд до ближайшего понедельника
+def align_to_weeks(start_date, end_date):
+    delta = timedelta(days=1)
+    while start_date.weekday() != 0:
+        start_date -= delta
+    while end_date.weekday() != 0:
+        end_date += delta
+    return start_date, end_date
 
 # Функция подготовки данных для расписания
 def prepare_data(exercises, start_date, end_date):
@@ -41,36 +58,29 @@ def prepare_data(exercises, start_date, end_date):
         5: set(),
         6: set()
     }
-    delta = timedelta(days=1)
 
-    # Выравниваем начальную дату на начало недели (понедельник)
-    while start_date.weekday() != 0:
-        start_date -= delta
+    # Выравниваем начальную и конечную дату на начало недели (понедельник)
+    start_date, end_date = align_to_weeks(start_date, end_date)
 
-    # Выравниваем конечную дату на начало недели (понедельник)
-    while end_date.weekday() != 0:
-        end_date += delta
-
-    for exercise in exercises:
+    for date, lesson in exercises:
         # Пропускаем занятия вне заданного диапазона дат
-        if exercise['date'] < start_date or exercise['date'] > end_date:
+        if date < start_date or date > end_date:
             continue
-        date = exercise['date']
-        time_start = exercise['time_start']
-        time_end = exercise['time_end']
+        time_start = lesson.time_start
+        time_end = lesson.time_end
         time_str = f"{time_start}-{time_end}"  # Строковое представление временного промежутка
 
         # Собираем данные в структурированном виде
         if date not in organized_data:
             organized_data[date] = {}
-        _, _, exercise_week_day = exercise["date"].isocalendar()
+        _, _, exercise_week_day = date.isocalendar()
         weekday_time_spans[exercise_week_day].add((time_start, time_end))
 
         # Если занятие объединено с другим, добавляем временные промежутки
-        if exercise["joined"]:
-            weekday_time_spans[exercise_week_day].add((exercise['time_start_s'], exercise['time_end_s']))
+        if lesson.joined:
+            weekday_time_spans[exercise_week_day].add((lesson.time_start_s, lesson.time_end_s))
 
-        organized_data[date][time_str] = exercise
+        organized_data[date][time_str] = lesson
 
     # Сортируем временные промежутки для каждого дня недели
     for key, time_spans in weekday_time_spans.items():
@@ -92,7 +102,9 @@ def save_to_json(timetable_data, filename="data.json"):
 # Функция получения цвета для элемента расписания
 def get_color(subject, exercise_type, group):
     if len(group) > 0:
-        unique_str = subject + exercise_type + group[0]  # Создаем уникальную строку
+        # Первая группа или ФИО преподавателя целиком (строка в расписании группы)
+        participant = group if isinstance(group, str) else group[0]
+        unique_str = subject + exercise_type + participant  # Создаем уникальную строку
     else:
         unique_str = subject + exercise_type
     hash_value = int(hashlib.md5(unique_str.encode()).hexdigest(), 16)  # Получаем хеш-значение
@@ -128,11 +140,8 @@ def get_font_size(name, name_column_width):
         font_size -= 1
     return None  # Если подходящий размер шрифта не найден
 
-# Формируем текст для отображения в ячейке расписания
-def form_text(subject, exercise_type, groups, room, height, width):
-    average_char_width = 0.75  # Средняя ширина символа (используется как заглушка)
-    max_font_size = 16  # Максимальный размер шрифта
-
+# Функция для формирования элементов текста ячейки (предмет, тип, группы, аудитория)
+def form_elements(subject, exercise_type, groups, room):
     # Сокращаем текст в зависимости от количества групп
     if len(groups) > 26:
         elements = [
@@ -175,25 +184,175 @@ def form_text(subject, exercise_type, groups, room, height, width):
         return merged
     if len(groups) > 18:
         elements = try_merge_elements(elements)
+    return elements
+
+
+# Функция подбора разбиения текста на строки для заданного размера шрифта (None, если текст не помещается)
+def fit_lines(elements, font_size, height, width):
+    for i in range(len(elements), 0, -1):  # i - количество элементов в строке
+        combinations = [', '.join(elements[j:j+i]) for j in range(0, len(elements), i)]
+        estimated_height = 1.5 * font_size * len(combinations)
+        # Проверяем, что текст помещается по ширине и высоте
+        if all(get_text_width(comb, font_size) <= width*0.9 for comb in combinations) and estimated_height <= height:
+            return tuple(combinations)
+    return None
+
+
+# Формируем текст для отображения в ячейке расписания.
+# Одни и те же занятия повторяются в каждой неделе и в каждом новом диапазоне дат,
+# поэтому результат раскладки запоминается для всех отрисовок процесса
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def form_text(subject, exercise_type, groups, room, height, width):
+    elements = form_elements(subject, exercise_type, groups, room)
+
+    # При любом разбиении на строки ширина строк и высота текста растут вместе с размером шрифта
+    # (ширина строки по метрикам шрифта не убывает с размером), поэтому если текст помещается
+    # при некотором размере, он помещается и при всех меньших. Наибольший подходящий размер
+    # ищем бинарным поиском, результат совпадает с перебором всех размеров сверху вниз
+    # (проверяется в tests/test_form_text.py)
+    low_font_size, high_font_size = MIN_FONT_SIZE, MAX_FONT_SIZE
+    result = (None, None)  # Если не удалось подобрать размер шрифта
+    while low_font_size <= high_font_size:
+        font_size = (low_font_size + high_font_size) // 2
+        lines = fit_lines(elements, font_size, height, width)
+        if lines is None:
+            high_font_size = font_size - 1
+        else:
+            result = (lines, font_size)
+            low_font_size = font_size + 1
+    return result
+
+class FragmentRecorder:
+    """
+    Холст, который ничего не рисует, а запоминает вызовы отрисовки.
+    Координата x записывается относительно левого края столбца, поэтому
+    записанный фрагмент можно вывести в любом столбце таблицы (draw_fragment).
+    """
+
+    def __init__(self):
+        self.operations = []
+
+    def rect(self, x, y, width, height, **style):
+        self.operations.append(('rect', x, y, width, height, style))
 
-    # Уменьшаем размер шрифта, пока текст не поместится в ячейку
-    while max_font_size > 1:
-        for i in range(len(elements), 0, -1):  # i - количество строк для текста
-            combinations = [', '.join(elements[j:j+i]) for j in range(0, len(elements), i)]
-            estimated_height = 1.5 * max_font_size * len(combinations)
-            # Проверяем, что текст помещается по ширине и высоте
-            if all(get_text_width(comb, max_font_size) <= width*0.9 for comb in combinations) and estimated_height <= height:
-                return combinations, max_font_size
+    def text(self, text, x, y, font_size, text_anchor=None):
+        self.operations.append(('text', x, y, text, font_size, text_anchor))
 
-        max_font_size -= 1
+    # Метод для получения записанных вызовов (неизменяемый фрагмент для кеша)
+    def fragment(self):
+        return tuple(self.operations)
 
-    return None, None  # Если не удалось подобрать размер шрифта
 
-# Конвертируем шрифт в base64, чтобы его можно было использовать в вебе или передать как данные
-def font_to_base64(font_path):
-    with open(font_path, 'rb') as font_file:
-        # Кодируем содержимое файла шрифта в base64
-        return base64.b64encode(font_file.read()).decode('utf-8')
+# Функция для вывода записанного фрагмента на холст со сдвигом по x
+def draw_fragment(canvas, fragment, dx):
+    for kind, x, y, first, second, third in fragment:
+        if kind == 'rect':
+            canvas.rect(x + dx, y, first, second, **third)
+        else:
+            canvas.text(first, x + dx, y, second, third)
+
+
+# Геометрия таблицы, от которой зависит раскладка столбца недели
+class WeekGeometry(NamedTuple):
+    cell_width: float
+    cell_height: float
+    margin_top: float
+    header_height: float
+    full_row_height: float
+    weekday_time_spans: tuple  # Временные промежутки по дням недели (Пн-Сб)
+    no_color: bool
+
+
+# Занятие в столбце недели: только то, что влияет на его отрисовку
+class WeekLesson(NamedTuple):
+    weekday: int  # 1 - понедельник
+    time_start: str
+    time_end: str
+    subject: str
+    lesson_type: str
+    room: str
+    participants: object  # Кортеж групп или ФИО преподавателя (Lesson.participants)
+    joined: bool
+
+
+# Функция для расчёта отступов дней недели по высоте ячейки и временным промежуткам.
+# Возвращает количество строк ячеек по дням недели и отступ первой ячейки каждого дня
+def weekday_rows(geometry):
+    day_of_cells = {}
+    weekday_margin = {}
+    current_y = geometry.margin_top+geometry.cell_height/2
+    for weekday, time_spans in enumerate(geometry.weekday_time_spans, 1):
+        day_of_cells[weekday] = len(time_spans) if time_spans else 1
+        weekday_margin[weekday] = current_y+geometry.cell_height/2
+        current_y += geometry.cell_height*day_of_cells[weekday]+geometry.cell_height/2
+    return day_of_cells, weekday_margin
+
+
+# Функция для рисования ячейки расписания.
+# joined - занятие продолжается в следующем промежутке: лабораторная работа рисуется
+# одной ячейкой двойной высоты, остальные занятия - двумя отдельными ячейками.
+def draw_lesson_cell(canvas, geometry, x, y, lesson, joined):
+    if len(lesson.subject) < 8:
+        subject = lesson.subject
+    else:
+        subject = extract_initials(lesson.subject)
+    group = lesson.participants
+    room = lesson.room
+    if geometry.no_color:
+        fill_color = '#ffffff'
+    else:
+        fill_color = get_color(subject, lesson.lesson_type, group)
+    if joined and lesson.lesson_type == "ЛР":
+        cell_height = geometry.cell_height*2
+    else:
+        if joined:
+            draw_lesson_cell(canvas, geometry, x, y + geometry.cell_height, lesson, False)
+        cell_height = geometry.cell_height
+    canvas.rect(x, y, geometry.cell_width, cell_height, fill=fill_color,
+                fill_opacity=0.5, rx=10, ry=10, stroke='black')
+    cell_text = form_text(subject, lesson.lesson_type, shorten_group(group), room, cell_height, geometry.cell_width)
+    font_size = cell_text[1]
+    line_spacing = 2
+    for index in range(len(cell_text[0])):
+        text_y = y + (index + 1) * (font_size + line_spacing)
+        canvas.text(cell_text[0][index], x + 5, text_y, font_size)
+
+
+# Функция для раскладки столбца одной недели. Результат зависит только от аргументов,
+# поэтому столбец, который уже рисовался (например, в диапазоне, сдвинутом на неделю),
+# берётся из кеша, а раскладываются только новые или изменившиеся недели.
+# Серая подложка чередуется по столбцам и при сдвиге диапазона меняется, поэтому рисуется отдельно.
+# week_start - понедельник недели, lessons - занятия недели (WeekLesson) в порядке отрисовки.
+# Возвращает фрагменты трёх слоёв: заголовок, даты и кортеж фрагментов занятий
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def layout_week(geometry, week_start, lessons):
+    day_of_cells, weekday_margin = weekday_rows(geometry)
+
+    header = FragmentRecorder()
+    week_label = (week_start - SEM_START).days // 7 + 1
+    font_size = 14
+    header.rect(0, geometry.margin_top-geometry.header_height, geometry.cell_width, geometry.header_height,
+                fill='white', stroke='black', rx=10, ry=10)
+    txt = str(week_label)+" В" if week_label % 2 == 1 else str(week_label)+" Н"
+    header.text(txt, geometry.cell_width/2, geometry.margin_top-geometry.header_height/2+font_size/2-1,
+                font_size, text_anchor="middle")
+
+    dates = FragmentRecorder()
+    current_y = geometry.margin_top
+    for weekday in range(1, len(DAYS_OF_WEEK) + 1):
+        date = week_start + timedelta(days=weekday - 1)
+        dates.rect(0, current_y, geometry.cell_width, geometry.cell_height/2, fill='rgb(220, 220, 220)', fill_opacity=0.2, rx=10, ry=10, stroke='black')
+        dates.text(date.strftime("%d.%m"), geometry.cell_width/2, current_y + geometry.cell_height/4 + 3, 10, text_anchor="middle")
+        current_y += geometry.cell_height*day_of_cells[weekday]+geometry.cell_height/2
+
+    cells = []
+    for lesson in lessons:
+        cell = FragmentRecorder()
+        y = weekday_margin[lesson.weekday] + geometry.weekday_time_spans[lesson.weekday - 1].index(
+            (lesson.time_start, lesson.time_end))*geometry.cell_height-geometry.cell_height/2
+        draw_lesson_cell(cell, geometry, 0, y, lesson, lesson.joined)
+        cells.append(cell.fragment())
+    return header.fragment(), dates.fragment(), tuple(cells)
 
 
 class TableFormer:
@@ -221,15 +380,12 @@ class TableFormer:
                  end_date,
                  exercises,
                  weekday_time_spans,
-                 file_name, no_color=False):
+                 file_name=None, no_color=False, backend=SvgBackend):
+        # file_name нужен только для сохранения SVG на диск (save), для отрисовки в память не требуется.
+        # backend задаёт способ отрисовки: SvgBackend (SVG для cairosvg) или CairoPdfBackend (сразу PDF).
         # Инициализация класса с заданными параметрами.
-        delta = timedelta(days=1)
-
         # Корректировка начальной и конечной даты до ближайшего понедельника.
-        while start_date.weekday() != 0:
-            start_date -= delta
-        while end_date.weekday() != 0:
-            end_date += delta
+        start_date, end_date = align_to_weeks(start_date, end_date)
 
         # Сохранение переданных параметров в атрибуты экземпляра.
         self.name = name  # Имя таблицы
@@ -258,132 +414,108 @@ class TableFormer:
         self.cell_width = (self.full_width - self.margin_left * 2 - self.name_column) / self.week_count
         self.full_row_height = ceil(self.full_width * 0.707) - self.margin_top - self.header_height
 
-        # Создание объекта SVG.
-        self.dwg = svgwrite.Drawing(file_name, profile='full', size=(f"{self.full_width}", f"{ceil(self.full_width * 0.707)}"))
-
-    # Метод для рисования ячейки расписания.
-    def draw_timetable_cell(self, x, y, exercise):
-        if len(exercise["subject"]) < 8:
-            subject = exercise["subject"]
-        else:
-            subject = extract_initials(exercise["subject"])
-        group = exercise.get("group", exercise.get("professor"))
-        room = exercise["room"]
-        if self.no_color:
-            fill_color = '#ffffff'
-        else:
-            fill_color = get_color(subject, exercise["type"], group)
-        if exercise["joined"] and exercise["type"] == "ЛР":
-            rect = self.dwg.rect(insert=(x, y), size=(self.cell_width, self.cell_height*2), fill=fill_color,
-                                 fill_opacity=0.5, rx=10, ry=10, stroke='black')
-        else:
-            if exercise["joined"]:
-                exercise["joined"] = False
-                self.draw_timetable_cell(x, y + self.cell_height, exercise)
-            rect = self.dwg.rect(insert=(x, y), size=(self.cell_width, self.cell_height), fill=fill_color,
-                                 fill_opacity=0.5, rx=10, ry=10, stroke='black')
-        self.dwg.add(rect)
-        if exercise["joined"] and exercise["type"] == "ЛР":
-            cell_text = form_text(subject, exercise['type'], shorten_group(group), room, self.cell_height*2, self.cell_width)
-        else:
-            cell_text = form_text(subject, exercise['type'], shorten_group(group), room, self.cell_height, self.cell_width)
-        font_size = cell_text[1]
-        line_spacing = 2
-        for index in range(len(cell_text[0])):
-            text_y = y + (index + 1) * (font_size + line_spacing)
-            self.dwg.add(self.dwg.text(cell_text[0][index], insert=(x + 5, text_y), font_family="CustomFont",
-                                       font_size=font_size))
-
-    # Метод для рисования заголовка таблицы.
-    def draw_header(self):
-        font_size = get_font_size(self.name, self.name_column)
-        self.dwg.add(self.dwg.text(self.name,
-                                   insert=(self.margin_left, self.margin_top-self.header_height/2+font_size/2),
-                                   font_family="CustomFont", font_size=font_size))
-
-        current_x = self.margin_left + self.name_column
-        current_y = self.margin_top
-
-        colored_row = True
-        font_size = 14
-        for week_number in range(1, self.week_count + 1):
-            self.dwg.add(self.dwg.rect(insert=(current_x, current_y-self.header_height),
-                                       size=(self.cell_width, self.header_height),
-                                       fill='white', stroke='black', rx=10, ry=10))
-            txt = str(self.week_start_number + week_number)+" В" if (self.week_start_number + week_number) % 2 == 1 \
-                else str(self.week_start_number + week_number)+" Н"
-            self.dwg.add(self.dwg.text(txt,
-                                       insert=(current_x+self.cell_width/2, current_y-self.header_height/2+font_size/2-1),
-                                       text_anchor="middle", font_family="CustomFont", font_size=font_size))
-            if colored_row:
-                self.dwg.add(self.dwg.rect(insert=(current_x, current_y),
-                                           size=(self.cell_width, self.full_row_height),
-                                           fill='rgb(220, 220, 220)', fill_opacity=0.2, rx=10, ry=10))
-            colored_row = not colored_row
-            current_x += self.cell_width
-
-    # Метод для рисования дней недели и временных интервалов.
-    def draw_week_days_and_time_spans(self):
-        date_list = generate_date_list(self.start_date, self.end_date)
-        days_of_week = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб"]
-        day_of_cells = {}
+        # Создание холста для отрисовки.
+        self.canvas = backend(self.full_width, ceil(self.full_width * 0.707), file_name)
 
+    # Метод для расчёта высоты ячейки и отступов дней недели по количеству временных промежутков.
+    # Вся геометрия, от которой зависит раскладка столбцов недель, собирается в WeekGeometry
+    def layout_rows(self):
         needed_cell_rows = 6
-        for day in days_of_week:
-            if self.weekday_time_spans[self.weekday_numbers[day]]:
-                needed_cell_rows += len(self.weekday_time_spans[self.weekday_numbers[day]])-1
-                day_of_cells[day] = len(self.weekday_time_spans[self.weekday_numbers[day]])
-            else:
-                day_of_cells[day] = 1
+        for weekday in range(1, len(DAYS_OF_WEEK) + 1):
+            if self.weekday_time_spans[weekday]:
+                needed_cell_rows += len(self.weekday_time_spans[weekday])-1
 
         self.cell_height = ceil((self.full_row_height/(needed_cell_rows+3)))-1
-        current_x = self.margin_left+self.name_column
+        self.geometry = WeekGeometry(
+            self.cell_width, self.cell_height, self.margin_top, self.header_height, self.full_row_height,
+            tuple(tuple(self.weekday_time_spans[weekday]) for weekday in range(1, len(DAYS_OF_WEEK) + 1)),
+            self.no_color)
+        self.day_of_cells, self.weekday_margin = weekday_rows(self.geometry)
+
+    # Метод для раскладки столбцов недель. Занятия распределяются по столбцам в порядке отрисовки,
+    # а разложенный столбец берётся из кеша layout_week, если такая неделя уже рисовалась.
+    # Возвращает словарь {номер столбца: (x, фрагменты layout_week)} и номера столбцов занятий по порядку
+    def layout_columns(self):
+        week_lessons = {column_index: [] for column_index in range(self.week_count)}
+        lesson_columns = []
+        _, start_week_number, _ = self.start_date.isocalendar()
+        for date, time_intervals in self.exercises.items():
+            for lesson in time_intervals.values():
+                _, exercise_week_number, exercise_week_day = date.isocalendar()
+                if start_week_number > exercise_week_number:
+                    exercise_week_number = 53
+                column_index = exercise_week_number-start_week_number
+                week_lessons.setdefault(column_index, []).append(WeekLesson(
+                    exercise_week_day, lesson.time_start, lesson.time_end, lesson.subject, lesson.lesson_type,
+                    lesson.room, lesson.participants, lesson.joined))
+                lesson_columns.append(column_index)
+
+        columns = {}
+        for column_index, lessons in week_lessons.items():
+            x = self.margin_left + self.name_column + column_index * self.cell_width
+            columns[column_index] = (x, layout_week(self.geometry, self.start_date + timedelta(weeks=column_index),
+                                                    tuple(lessons)))
+        return columns, lesson_columns
+
+    # Метод для рисования заголовка таблицы и заголовков столбцов недель.
+    def draw_header(self, columns):
+        font_size = get_font_size(self.name, self.name_column)
+        self.canvas.text(self.name, self.margin_left, self.margin_top-self.header_height/2+font_size/2, font_size)
+
+        for column_index in range(self.week_count):
+            x, (header, _, _) = columns[column_index]
+            draw_fragment(self.canvas, header, x)
+            if column_index % 2 == 0:
+                self.canvas.rect(x, self.margin_top, self.cell_width, self.full_row_height,
+                                 fill='rgb(220, 220, 220)', fill_opacity=0.2, rx=10, ry=10)
 
-        for week_number in range(1, self.week_count + 1):
-            current_y = self.margin_top
-            for day in days_of_week:
-                self.dwg.add(self.dwg.rect(insert=(current_x, current_y), size=(self.cell_width, self.cell_height/2), fill='rgb(220, 220, 220)', fill_opacity=0.2, rx=10, ry=10, stroke='black'))
-                self.dwg.add(self.dwg.text(date_list[(week_number-1)*6+days_of_week.index(day)], insert=(current_x+self.cell_width/2, current_y + self.cell_height/4 + 3), text_anchor="middle", font_family="CustomFont", font_size=10))
-                current_y += self.cell_height*day_of_cells[day]+self.cell_height/2
-            current_x += self.cell_width
+    # Метод для рисования дат, дней недели и временных интервалов.
+    def draw_week_days_and_time_spans(self, columns):
+        for column_index in range(self.week_count):
+            x, (_, dates, _) = columns[column_index]
+            draw_fragment(self.canvas, dates, x)
 
         current_y = self.margin_top+self.cell_height/2
-        for day in days_of_week:
-            self.weekday_margin[self.weekday_numbers[day]] = current_y+self.cell_height/2
-            self.dwg.add(self.dwg.rect(insert=(self.margin_left, current_y), size=(self.name_column/2, self.cell_height*day_of_cells[day]), fill='rgb(220, 220, 220)', fill_opacity=0.2, rx=10, ry=10, stroke='black'))
-            self.dwg.add(self.dwg.text(day, insert=(self.margin_left+self.name_column/4, current_y+self.cell_height*day_of_cells[day]/2 + 6), text_anchor="middle", font_family="CustomFont", font_size=24))
-            current_y += self.cell_height*day_of_cells[day]+self.cell_height/2
+        for weekday, day in enumerate(DAYS_OF_WEEK, 1):
+            self.canvas.rect(self.margin_left, current_y, self.name_column/2, self.cell_height*self.day_of_cells[weekday], fill='rgb(220, 220, 220)', fill_opacity=0.2, rx=10, ry=10, stroke='black')
+            self.canvas.text(day, self.margin_left+self.name_column/4, current_y+self.cell_height*self.day_of_cells[weekday]/2 + 6, 24, text_anchor="middle")
+            current_y += self.cell_height*self.day_of_cells[weekday]+self.cell_height/2
         current_x = self.margin_left+self.name_column/2
         current_y = self.margin_top+self.cell_height/2
-        for day in days_of_week:
-            if self.weekday_time_spans[self.weekday_numbers[day]]:
-                for time_span in self.weekday_time_spans[self.weekday_numbers[day]]:
-                    self.dwg.add(self.dwg.rect(insert=(current_x, current_y), size=(self.name_column/2, self.cell_height), fill='rgb(220, 220, 220)', fill_opacity=0.2, rx=10, ry=10, stroke='black'))
-                    self.dwg.add(self.dwg.text(time_span[0], insert=(current_x+self.name_column/4, current_y+self.cell_height/2 - 3), text_anchor="middle", font_family="CustomFont", font_size=12))
-                    self.dwg.add(self.dwg.text(time_span[1], insert=(current_x+self.name_column/4, current_y+self.cell_height/2 + 9), text_anchor="middle", font_family="CustomFont", font_size=12))
+        for weekday in range(1, len(DAYS_OF_WEEK) + 1):
+            if self.weekday_time_spans[weekday]:
+                for time_span in self.weekday_time_spans[weekday]:
+                    self.canvas.rect(current_x, current_y, self.name_column/2, self.cell_height, fill='rgb(220, 220, 220)', fill_opacity=0.2, rx=10, ry=10, stroke='black')
+                    self.canvas.text(time_span[0], current_x+self.name_column/4, current_y+self.cell_height/2 - 3, 12, text_anchor="middle")
+                    self.canvas.text(time_span[1], current_x+self.name_column/4, current_y+self.cell_height/2 + 9, 12, text_anchor="middle")
                     current_y += self.cell_height
                 current_y += self.cell_height/2
             else:
                 current_y += self.cell_height*1.5
 
     # Основной метод для рисования всего расписания.
+    # Столбцы недель раскладываются заранее (layout_columns), а затем выводятся слоями:
+    # заголовки, даты, дни недели и занятия в прежнем порядке, поэтому наложение элементов не меняется
     def draw_timetable(self):
-        self.draw_header()
-        self.draw_week_days_and_time_spans()
-
-        for date, time_intervals in self.exercises.items():
-            for time_interval, exercise in time_intervals.items():
-                _, exercise_week_number, exercise_week_day = exercise["date"].isocalendar()
-                _, start_week_number, _ = self.start_date.isocalendar()
-                if start_week_number > exercise_week_number:
-                    exercise_week_number = 53
-                column_index = exercise_week_number-start_week_number
-                x = self.margin_left + self.name_column + column_index * self.cell_width
-                y = self.weekday_margin[exercise_week_day] + self.weekday_time_spans[exercise_week_day].index(
-                    (exercise["time_start"], exercise["time_end"]))*self.cell_height-self.cell_height/2
-
-                self.draw_timetable_cell(x, y, exercise)
-
-    # Метод для сохранения сгенерированного SVG файла.
-    def save(self):
-        self.dwg.save()
+        self.layout_rows()
+        columns, lesson_columns = self.layout_columns()
+        self.draw_header(columns)
+        self.draw_week_days_and_time_spans(columns)
+
+        cursors = dict.fromkeys(columns, 0)
+        for column_index in lesson_columns:
+            x, (_, _, cells) = columns[column_index]
+            draw_fragment(self.canvas, cells[cursors[column_index]], x)
+            cursors[column_index] += 1
+
+    # Метод для получения результата отрисовки в байтах (SVG или PDF, в зависимости от backend).
+    def to_bytes(self):
+        return self.canvas.finish()
+
+    # Метод для получения сгенерированного SVG в виде строки (только для SvgBackend).
+    def tostring(self):
+        return self.canvas.tostring()
+
+    # Метод для сохранения сгенерированного SVG файла (для отладки, только для SvgBackend).
+    def save(self, file_name=None):
+        self.canvas.save(file_name)
@@ -0,0 +1,108 @@
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+from typing import NamedTuple
+
+# Предельная длина одного сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+# Наложение занятий: в дату date в промежутке с time_start до time_end проходят сразу несколько занятий
+class Conflict(NamedTuple):
+    date: datetime
+    time_start: str
+    time_end: str
+    lessons: tuple  # Наложившиеся занятия (Lesson) в порядке начала
+
+    # Группы (для расписания преподавателя) или преподаватели (для расписания группы) наложившихся занятий
+    @property
+    def participants(self):
+        return tuple(lesson.participants for lesson in self.lessons)
+
+
+# Функция для перевода времени "ЧЧ:ММ" в минуты от начала суток
+@lru_cache(maxsize=None)
+def to_minutes(time_str):
+    hours, minutes = time_str.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+# Функция для построения индекса интервалов:
+# дата -> отсортированный по началу список (начало, конец, время начала, время конца, занятия).
+# Сначала занятия собираются по одинаковым промежуткам, поэтому на каждое проведение
+# приходится одна операция со словарём, а сортируются только различные промежутки дня.
+# Объединённое занятие занимает оба промежутка одним интервалом
+def build_interval_index(occurrences):
+    slots = {}
+    for date, lesson in occurrences:
+        time_end = lesson.time_end_s if lesson.joined else lesson.time_end
+        slots.setdefault((date, lesson.time_start, time_end), []).append(lesson)
+    index = {}
+    for (date, time_start, time_end), lessons in slots.items():
+        index.setdefault(date, []).append((to_minutes(time_start), to_minutes(time_end), time_start, time_end, lessons))
+    for intervals in index.values():
+        intervals.sort(key=itemgetter(0, 1))
+    return index
+
+
+# Функция для поиска наложений занятий.
+# Интервалы каждой даты просматриваются по порядку начала, при этом хранятся интервалы, которые ещё
+# не закончились. Занятия одного промежутка накладываются друг на друга, а начавшийся интервал
+# накладывается на каждый незакончившийся - в промежутке от своего начала до первого из окончаний.
+# Так в одно наложение попадают только занятия, которые действительно проходят одновременно:
+# если A пересекается с B, а B с C, но A и C не пересекаются, это два наложения, а не одно.
+# Учитываются и частичные пересечения, и объединённые занятия на два промежутка
+def find_conflicts(occurrences):
+    conflicts = []
+    for date, intervals in sorted(build_interval_index(occurrences).items(), key=itemgetter(0)):
+        active = []
+        for start, end, time_start, time_end, lessons in intervals:
+            active = [interval for interval in active if interval[1] > start]
+            add_conflict(conflicts, date, time_start, time_end, lessons)
+            for _, other_end, _, other_time_end, other_lessons in active:
+                overlap_end = other_time_end if other_end < end else time_end
+                add_conflict(conflicts, date, time_start, overlap_end, other_lessons + lessons)
+            active.append((start, end, time_start, time_end, lessons))
+    return conflicts
+
+
+# Функция для добавления наложения, если в нём больше одного различного занятия.
+# Одно и то же занятие (например, из пересекающихся диапазонов дат) не накладывается само на себя
+def add_conflict(conflicts, date, time_start, time_end, lessons):
+    if len(lessons) > 1:
+        lessons = tuple({id(lesson): lesson for lesson in lessons}.values())
+        if len(lessons) > 1:
+            conflicts.append(Conflict(date, time_start, time_end, lessons))
+
+
+# Функция для описания наложения текстом
+def format_conflict(conflict, doc_type):
+    from parse_xls import DocType  # parse_xls сам использует этот модуль при разборе
+
+    lines = [f'{conflict.date.strftime("%d.%m")} с {conflict.time_start} до {conflict.time_end} накладываются занятия:']
+    for lesson in conflict.lessons:
+        if doc_type == DocType.PROFESSOR:
+            group = lesson.participants[0] if lesson.participants else ''
+            lines.append(f"{lesson.subject} ({lesson.lesson_type}) у группы {group}")
+        else:
+            professor = lesson.participants
+            lines.append(f"{lesson.subject} ({lesson.room}) {professor}")
+    return "\n".join(lines) + "\n"
+
+
+# Функция для разбиения описаний наложений на сообщения не длиннее limit символов.
+# Описания формируются лениво: если нужны только первые сообщения, остальные наложения не форматируются
+def conflict_messages(conflicts, doc_type, limit=TELEGRAM_MESSAGE_LIMIT):
+    message = ""
+    for conflict in conflicts:
+        text = format_conflict(conflict, doc_type)
+        if message and len(message) + len(text) > limit:
+            yield message
+            message = ""
+        # Описание одного наложения длиннее сообщения - разбиваем его по limit символов
+        while len(text) > limit:
+            yield text[:limit]
+            text = text[limit:]
+        message += text
+    if message:
+        yield message
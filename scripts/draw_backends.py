@@ -0,0 +1,309 @@
+import io
+import math
+import re
+from xml.sax.saxutils import escape
+
+from font_embedding import FONT_FAMILY, font_face_rule, glyph_set, register_font
+
+# Количество точек PDF в одном пикселе SVG (cairosvg считает 96 пикселей на дюйм)
+PT_PER_PX = 0.75
+
+# Количество знаков после запятой в координатах компактного SVG
+COMPACT_PRECISION = 4
+
+# Именованные цвета, которые используются в расписании
+NAMED_COLORS = {
+    'black': (0, 0, 0),
+    'white': (255, 255, 255),
+}
+RGB_COLOR = re.compile(r'rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)')
+
+# Атрибуты корневого элемента SVG (те же, что записывал svgwrite с профилем 'full')
+SVG_ROOT_ATTRIBUTES = {
+    'baseProfile': 'full',
+    'version': '1.1',
+    'xmlns': 'http://www.w3.org/2000/svg',
+    'xmlns:ev': 'http://www.w3.org/2001/xml-events',
+    'xmlns:xlink': 'http://www.w3.org/1999/xlink',
+}
+# Заголовок файла SVG при сохранении на диск
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8" ?>\n'
+# Замены символов в значениях атрибутов сверх &, < и > (так же экранирует ElementTree)
+ATTRIBUTE_ENTITIES = {'"': '&quot;', '\r': '&#13;', '\n': '&#10;', '\t': '&#09;'}
+
+
+# Функция для преобразования цвета SVG ('#rrggbb', 'rgb(r, g, b)' или имя) в компоненты от 0 до 1
+def parse_color(color):
+    if color.startswith('#'):
+        rgb = tuple(int(color[index:index + 2], 16) for index in (1, 3, 5))
+    elif color in NAMED_COLORS:
+        rgb = NAMED_COLORS[color]
+    else:
+        rgb = tuple(int(value) for value in RGB_COLOR.fullmatch(color).groups())
+    return tuple(value / 255 for value in rgb)
+
+
+class SvgWriter:
+    """
+    Потоковая запись SVG: каждый элемент сразу записывается текстом в sink
+    (io.StringIO или открытый текстовый файл) в порядке вызовов, без дерева объектов в памяти.
+    Атрибуты записываются по алфавиту, пустые значения и None пропускаются, числа
+    записываются через str, а значения и текст экранируются так же, как в svgwrite (ElementTree),
+    поэтому документ совпадает с прежним побайтно.
+    """
+
+    def __init__(self, sink):
+        self.write = sink.write
+
+    # Функция для записи атрибутов элемента (словарь с именами атрибутов SVG)
+    @staticmethod
+    def attributes(attributes):
+        parts = []
+        for name, value in sorted(attributes.items()):
+            if value is not None:
+                value = str(value)
+                if value:
+                    parts.append(f' {name}="{escape(value, ATTRIBUTE_ENTITIES)}"')
+        return "".join(parts)
+
+    # Метод для записи открывающего тега элемента с вложенными элементами
+    def start(self, tag, attributes):
+        self.write(f"<{tag}{self.attributes(attributes)}>")
+
+    def end(self, tag):
+        self.write(f"</{tag}>")
+
+    # Метод для записи элемента целиком (с текстом или пустого)
+    def element(self, tag, attributes, text=None):
+        if text:
+            self.write(f"<{tag}{self.attributes(attributes)}>{escape(text)}</{tag}>")
+        else:
+            self.write(f"<{tag}{self.attributes(attributes)} />")
+
+
+# Функция для перевода имени именованного аргумента в имя атрибута SVG (fill_opacity -> fill-opacity)
+def svg_name(name):
+    return name.rstrip('_').replace('_', '-')
+
+
+class SvgBackend:
+    """
+    Отрисовка в SVG. Используется для отладки и как исходный вариант для cairosvg.
+    Элементы сразу записываются текстом (SvgWriter), документ совпадает с тем,
+    который раньше строил svgwrite. Стиль прямоугольников передаётся атрибутами SVG
+    (fill, fill_opacity, stroke, rx, ry).
+    При сохранении на диск (save) в документ встраивается подмножество шрифта
+    с использованными символами, чтобы файл везде открывался тем же шрифтом.
+    """
+
+    def __init__(self, width, height, file_name=None):
+        self.file_name = file_name
+        self.output = io.StringIO()
+        self.writer = SvgWriter(self.output)
+        self.root_attributes = dict(SVG_ROOT_ATTRIBUTES, width=f"{width}", height=f"{height}")
+        self.closed = False
+        self.characters = set()  # Символы надписей для подмножества шрифта
+        self.start_document()
+
+    # Метод для записи начала документа: корневой элемент и <defs>
+    def start_document(self):
+        self.writer.start('svg', self.root_attributes)
+        self.writer.element('defs', {})
+
+    def rect(self, x, y, width, height, **style):
+        attributes = {'x': x, 'y': y, 'width': width, 'height': height}
+        for name, value in style.items():
+            attributes[svg_name(name)] = value
+        self.writer.element('rect', attributes)
+
+    def text(self, text, x, y, font_size, text_anchor=None):
+        self.characters.update(text)
+        self.writer.element('text', {'x': x, 'y': y, 'text-anchor': text_anchor,
+                                     'font-family': FONT_FAMILY, 'font-size': font_size}, text)
+
+    # Метод для получения правила @font-face с подмножеством шрифта для символов документа
+    def font_face(self):
+        return font_face_rule(glyph_set(self.characters))
+
+    # Метод для завершения документа (после него элементы добавлять нельзя).
+    # Шрифт встраивается только по запросу: cairosvg не читает @font-face и берёт шрифт
+    # из fontconfig (register_font), поэтому при отрисовке в PDF подмножество не строится
+    def close(self, embed_font=False):
+        if not self.closed:
+            if embed_font:
+                self.writer.write(f'<style type="text/css"><![CDATA[{self.font_face()}]]></style>')
+            self.writer.end('svg')
+            self.closed = True
+
+    def tostring(self):
+        self.close()
+        return self.output.getvalue()
+
+    # Метод для получения результата отрисовки: SVG в байтах
+    def finish(self):
+        return self.tostring().encode('utf-8')
+
+    def save(self, file_name=None):
+        self.close(embed_font=True)
+        with open(file_name or self.file_name, 'w', encoding='utf-8') as svg_file:
+            svg_file.write(XML_DECLARATION)
+            svg_file.write(self.tostring())
+
+
+# Функция для округления числа в компактном SVG: целые значения записываются без дробной части
+def compact_number(value):
+    value = round(value, COMPACT_PRECISION)
+    return int(value) if value == int(value) else value
+
+
+class CompactSvgBackend(SvgBackend):
+    """
+    Компактный SVG для cairosvg: стиль прямоугольников и надписей задаётся классами
+    в блоке <style>, подряд идущие надписи одного стиля объединяются в <g>, координаты
+    округляются до COMPACT_PRECISION знаков. Геометрия и вычисленный стиль каждого элемента
+    совпадают с SvgBackend с точностью до округления (проверяется в tests/test_svg_compact.py).
+    Одинаковые прямоугольники не выносятся в <defs>/<use>: cairosvg для каждого <use>
+    заново ищет и разбирает описание фигуры, и преобразование в PDF становится медленнее.
+    Блок <style> стоит в начале документа, а классы появляются по ходу отрисовки,
+    поэтому элементы записываются в отдельный буфер и добавляются в документ при завершении.
+    """
+
+    def __init__(self, width, height, file_name=None):
+        super().__init__(width, height, file_name)
+        self.body = io.StringIO()
+        self.writer = SvgWriter(self.body)
+        self.classes = {}  # Правило CSS -> имя класса
+        self.text_class = None  # Класс надписей текущей группы
+
+    def start_document(self):
+        pass
+
+    # Метод для получения имени класса по правилу CSS (новое правило получает новый класс)
+    def class_name(self, prefix, rule):
+        if rule not in self.classes:
+            self.classes[rule] = f"{prefix}{len(self.classes)}"
+        return self.classes[rule]
+
+    # Метод для завершения группы надписей
+    def end_text_group(self):
+        if self.text_class is not None:
+            self.writer.end('g')
+            self.text_class = None
+
+    def rect(self, x, y, width, height, fill='black', fill_opacity=1, stroke=None, rx=0, ry=0):
+        self.end_text_group()
+        rule = f"fill:{fill}"
+        if fill_opacity != 1:
+            rule += f";fill-opacity:{fill_opacity}"
+        if stroke is not None:
+            rule += f";stroke:{stroke}"
+        self.writer.element('rect', {'x': compact_number(x), 'y': compact_number(y),
+                                     'width': compact_number(width), 'height': compact_number(height),
+                                     'rx': compact_number(rx), 'ry': compact_number(ry),
+                                     'class': self.class_name("s", rule)})
+
+    def text(self, text, x, y, font_size, text_anchor=None):
+        rule = f"font-size:{font_size}px"
+        if text_anchor is not None:
+            rule += f";text-anchor:{text_anchor}"
+        text_class = self.class_name("t", rule)
+        if self.text_class != text_class:
+            self.end_text_group()
+            self.writer.start('g', {'class': text_class})
+            self.text_class = text_class
+        self.characters.update(text)
+        self.writer.element('text', {'x': compact_number(x), 'y': compact_number(y)}, text)
+
+    def close(self, embed_font=False):
+        if not self.closed:
+            self.end_text_group()
+            style = f"text{{font-family:{FONT_FAMILY}}}" + "".join(
+                f".{name}{{{rule}}}" for rule, name in self.classes.items())
+            if embed_font:
+                style = self.font_face() + style
+            writer = SvgWriter(self.output)
+            writer.start('svg', self.root_attributes)
+            writer.write(f'<defs><style type="text/css"><![CDATA[{style}]]></style></defs>')
+            writer.write(self.body.getvalue())
+            writer.end('svg')
+            self.closed = True
+
+
+class CairoPdfBackend:
+    """
+    Отрисовка сразу в PDF через cairocffi, без построения и повторного разбора SVG.
+    Координаты задаются в пикселях SVG и переводятся в точки PDF так же, как это
+    делает cairosvg. Выходной PDF не сверялся с PDF, который cairosvg строит из SvgBackend
+    (шрифт выбирается простым API cairo, скругления рисуются своими дугами), поэтому
+    этот способ включается только явно (RENDER_BACKEND=pdf).
+    Шрифт FONT_FAMILY регистрируется в fontconfig (register_font), cairo встраивает
+    в PDF только использованные символы.
+    """
+
+    def __init__(self, width, height, file_name=None):
+        import cairocffi
+
+        register_font()
+        self.cairo = cairocffi
+        self.output = io.BytesIO()
+        self.surface = cairocffi.PDFSurface(self.output, width * PT_PER_PX, height * PT_PER_PX)
+        self.context = cairocffi.Context(self.surface)
+        self.context.scale(PT_PER_PX, PT_PER_PX)
+        self.context.select_font_face(FONT_FAMILY, cairocffi.FONT_SLANT_NORMAL, cairocffi.FONT_WEIGHT_NORMAL)
+        self.context.set_line_width(1)
+
+    # Метод для построения контура прямоугольника со скруглёнными углами (как rx/ry в SVG)
+    def rounded_rect_path(self, x, y, width, height, rx, ry):
+        context = self.context
+        rx = min(rx, width / 2)
+        ry = min(ry, height / 2)
+        if rx <= 0 or ry <= 0:
+            context.rectangle(x, y, width, height)
+            return
+        context.new_sub_path()
+        # Углы обходятся по часовой стрелке, каждый — четверть эллипса с полуосями rx и ry
+        for center_x, center_y, angle in ((x + width - rx, y + ry, -math.pi / 2),
+                                          (x + width - rx, y + height - ry, 0),
+                                          (x + rx, y + height - ry, math.pi / 2),
+                                          (x + rx, y + ry, math.pi)):
+            context.save()
+            context.translate(center_x, center_y)
+            context.scale(rx, ry)
+            context.arc(0, 0, 1, angle, angle + math.pi / 2)
+            context.restore()
+        context.close_path()
+
+    def rect(self, x, y, width, height, fill='black', fill_opacity=1, stroke=None, rx=0, ry=0):
+        context = self.context
+        self.rounded_rect_path(x, y, width, height, rx, ry)
+        context.set_source_rgba(*parse_color(fill), fill_opacity)
+        if stroke is None:
+            context.fill()
+        else:
+            context.fill_preserve()
+            context.set_source_rgb(*parse_color(stroke))
+            context.stroke()
+
+    def text(self, text, x, y, font_size, text_anchor=None):
+        context = self.context
+        context.set_font_size(font_size)
+        if text_anchor == "middle":
+            # Выравнивание по центру так же, как в cairosvg: по габаритам надписи
+            x_bearing, _, width, _, _, _ = context.text_extents(text)
+            x -= width / 2 + x_bearing
+        context.set_source_rgb(0, 0, 0)
+        context.move_to(x, y)
+        context.show_text(text)
+
+    # Метод для получения результата отрисовки: PDF в байтах
+    def finish(self):
+        self.surface.finish()
+        return self.output.getvalue()
+
+
+# Доступные способы отрисовки по названию
+BACKENDS = {
+    'svg': SvgBackend,
+    'svg-compact': CompactSvgBackend,
+    'pdf': CairoPdfBackend,
+}
@@ -0,0 +1,124 @@
+import base64
+import io
+import os
+import tempfile
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from font_metrics import get_font_metrics
+
+# Название шрифта в документах: под ним шрифт подключается в SVG (@font-face) и в fontconfig
+FONT_FAMILY = "CustomFont"
+# Количество подмножеств шрифта (по наборам символов), которые хранятся в памяти процесса
+FONT_SUBSET_CACHE_SIZE = 64
+# Имя файла настроек fontconfig, который подключает шрифт под названием FONT_FAMILY
+FONTCONFIG_NAME = "timetable-fonts.conf"
+# Настройки fontconfig: прежние настройки (относительный путь fontconfig ищет в своём каталоге настроек),
+# каталог шрифта раскладки и замена FONT_FAMILY на семейство и начертание этого шрифта
+FONTCONFIG_TEMPLATE = """<?xml version="1.0"?>
+<!DOCTYPE fontconfig SYSTEM "fonts.dtd">
+<fontconfig>
+  <include ignore_missing="yes">{include}</include>
+  <dir>{font_dir}</dir>
+  <match target="pattern">
+    <test name="family"><string>{alias}</string></test>
+    <edit name="family" mode="assign" binding="strong"><string>{family}</string></edit>
+    <edit name="style" mode="assign" binding="strong"><string>{style}</string></edit>
+  </match>
+</fontconfig>
+"""
+# Записи таблицы name с названием шрифта: семейство, полное имя, имя PostScript и типографское семейство
+FAMILY_NAME_IDS = (1, 4, 6, 16)
+
+
+# Функция для замены названия шрифта во всех записях таблицы name
+def rename_font(font, family):
+    for record in font['name'].names:
+        if record.nameID in FAMILY_NAME_IDS:
+            record.string = family
+
+
+# Функция для сохранения шрифта fontTools в байты
+def font_bytes(font):
+    output = io.BytesIO()
+    font.save(output)
+    return output.getvalue()
+
+
+# Функция для чтения файла шрифта, по которому рассчитывается ширина текста (font_metrics.py).
+# Файл читается один раз на процесс, подмножества строятся из байтов в памяти
+@lru_cache(maxsize=None)
+def font_data():
+    with open(get_font_metrics().font_path, 'rb') as font_file:
+        return font_file.read()
+
+
+# Функция для построения подмножества шрифта только с символами glyphs (строка без повторов).
+# Подмножество встраивается только в сохраняемые SVG (SvgBackend.save): cairosvg не читает @font-face,
+# поэтому в PDF оно не попадает, а шрифт в PDF встраивает cairo из файла, найденного через fontconfig.
+# Шрифт загружается лениво: разбираются только описания нужных символов, а не все несколько тысяч.
+# Одинаковые наборы символов повторяются от документа к документу, поэтому результат запоминается
+@lru_cache(maxsize=FONT_SUBSET_CACHE_SIZE)
+def font_subset(glyphs):
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(io.BytesIO(font_data()), lazy=True)
+    # Подсказки растеризации (hinting) сохраняются: без них ширина надписей мелким шрифтом
+    # отличается от той, по которой рассчитана раскладка. Из правил GSUB/GPOS сохраняется только
+    # кернинг: раскладка измеряет ширину текста с кернингом пар символов (font_metrics.py)
+    options = subset.Options()
+    options.layout_features = ['kern']
+    options.drop_tables += ['FFTM']  # Служебная таблица FontForge, fontTools её не обрезает
+    options.name_IDs = list(FAMILY_NAME_IDS)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=glyphs)
+    subsetter.subset(font)
+    rename_font(font, FONT_FAMILY)
+    return font_bytes(font)
+
+
+# Функция для получения правила @font-face с подмножеством шрифта для встраивания в SVG
+@lru_cache(maxsize=FONT_SUBSET_CACHE_SIZE)
+def font_face_rule(glyphs):
+    data = base64.b64encode(font_subset(glyphs)).decode('ascii')
+    return f"@font-face{{font-family:{FONT_FAMILY};src:url(data:font/ttf;base64,{data})}}"
+
+
+# Функция для получения набора символов текста в виде ключа для кеша подмножеств
+def glyph_set(characters):
+    return "".join(sorted(set(characters)))
+
+
+# Временный каталог с файлом настроек fontconfig (удаляется при завершении процесса, который его создал)
+fontconfig_dir = None
+
+
+# Функция для регистрации шрифта раскладки в fontconfig под названием FONT_FAMILY.
+# cairo (CairoPdfBackend) и cairosvg выбирают шрифт по названию через fontconfig, поэтому
+# после регистрации PDF рисуется тем же шрифтом, по которому рассчитана раскладка,
+# а не шрифтом, который fontconfig подставил бы вместо неизвестного ему названия.
+# Файл шрифта не копируется: настройки fontconfig (FONTCONFIG_FILE) заменяют FONT_FAMILY
+# на семейство и начертание шрифта раскладки. fontconfig читает настройки один раз на процесс,
+# поэтому функция вызывается до первой отрисовки, а рабочие процессы, запущенные после неё,
+# получают те же настройки через окружение. Какие символы шрифта попадут в PDF, решает cairo,
+# а не font_subset. Возвращает путь к файлу настроек
+@lru_cache(maxsize=None)
+def register_font():
+    global fontconfig_dir
+    config_path = os.environ.get('FONTCONFIG_FILE', '')
+    if os.path.basename(config_path) == FONTCONFIG_NAME and os.path.exists(config_path):
+        return config_path  # Настройки созданы родительским процессом
+    from PIL import ImageFont
+
+    include = config_path or "fonts.conf"  # Настройки, заданные пользователем, сохраняются
+    font_path = os.path.abspath(get_font_metrics().font_path)
+    family, style = ImageFont.truetype(font_path).getname()
+    fontconfig_dir = tempfile.TemporaryDirectory(prefix="timetable_fonts_")
+    config_path = os.path.join(fontconfig_dir.name, FONTCONFIG_NAME)
+    with open(config_path, 'w', encoding='utf-8') as config_file:
+        config_file.write(FONTCONFIG_TEMPLATE.format(include=escape(include), font_dir=escape(os.path.dirname(font_path)),
+                                                     alias=escape(FONT_FAMILY), family=escape(family),
+                                                     style=escape(style)))
+    os.environ['FONTCONFIG_FILE'] = config_path
+    return config_path
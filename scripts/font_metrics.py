@@ -0,0 +1,73 @@
+import os
+import threading
+from functools import lru_cache
+
+from PIL import ImageFont
+
+# Получаем текущую директорию, где находится выполняемый скрипт
+current_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Шрифты в порядке предпочтения: первый найденный используется для всех измерений
+FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    os.path.join(current_directory, "times.ttf"),
+]
+
+# Количество строк, ширина которых запоминается целиком
+TEXT_CACHE_SIZE = 16384
+
+
+class FontMetrics:
+    """
+    Метрики шрифта для вычисления ширины текста.
+    Файл шрифта загружается один раз на процесс и для каждого размера хранится
+    загруженным, ширина строки измеряется FreeType целиком (с кернингом пар символов),
+    поэтому совпадает с прежним измерением через ImageFont.getlength.
+    """
+
+    def __init__(self, font_path):
+        self.font_path = font_path
+        self.faces = {}  # Загруженные шрифты по размерам
+        # Обращения к FreeType выполняются под блокировкой: отрисовка может идти в нескольких потоках
+        self.lock = threading.Lock()
+
+    # Метод для получения шрифта нужного размера (загружается один раз)
+    def face(self, font_size):
+        font = self.faces.get(font_size)
+        if font is None:
+            font = ImageFont.truetype(self.font_path, font_size)
+            self.faces.setdefault(font_size, font)
+        return self.faces[font_size]
+
+    # Метод для вычисления ширины строки. Ширины отдельных символов не суммируются:
+    # кернинг (например, в парах "To" и "AV") уменьшает ширину строки
+    def text_width(self, text, font_size):
+        font = self.face(font_size)
+        with self.lock:
+            return font.getlength(text)
+
+
+# Функция для получения метрик шрифта (создаются один раз на процесс)
+@lru_cache(maxsize=None)
+def get_font_metrics():
+    for font_path in FONT_PATHS:
+        try:
+            ImageFont.truetype(font_path, 10)  # Проверяем, что шрифт загружается
+        except OSError:
+            continue
+        return FontMetrics(font_path)
+    raise OSError("Не найден ни один из шрифтов: " + ", ".join(FONT_PATHS))
+
+
+# Функция для вычисления ширины текста с кешированием результата для целых строк
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def measure_text(text, font_size):
+    return get_font_metrics().text_width(text, font_size)
+
+
+# Функция для загрузки шрифта всех размеров заранее (например, в рабочих процессах)
+def preload(font_sizes=range(1, 25)):
+    metrics = get_font_metrics()
+    for font_size in font_sizes:
+        metrics.face(font_size)
+    return metrics
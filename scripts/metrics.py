@@ -0,0 +1,236 @@
+import asyncio
+import functools
+import os
+import time
+from bisect import bisect_left
+
+# Границы интервалов гистограмм в секундах: от 0,1 мс до ~5 минут, каждая следующая в 1,25 раза больше.
+# Погрешность перцентиля не превышает ширины интервала, а запись значения - это один двоичный поиск
+BUCKET_BOUNDS = tuple(0.0001 * 1.25 ** index for index in range(68))
+PERCENTILES = (0.5, 0.95, 0.99)
+# Время на чтение запроса к /metrics, после которого соединение закрывается
+METRICS_REQUEST_TIMEOUT = 5
+
+
+class Histogram:
+    """
+    Гистограмма длительностей с фиксированными интервалами.
+    Хранит только счётчики по интервалам, поэтому занимает постоянную память
+    и позволяет оценить перцентили за всё время работы бота.
+    """
+
+    __slots__ = ('counts', 'count', 'errors', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # Последний интервал - всё, что больше границ
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    # Метод для оценки перцентиля: линейная интерполяция внутри интервала, куда он попадает
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = BUCKET_BOUNDS[index - 1] if index else 0.0
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+    def snapshot(self):
+        snapshot = {"count": self.count, "errors": self.errors, "sum": self.total, "max": self.max,
+                    "buckets": tuple(self.counts)}
+        for fraction in PERCENTILES:
+            snapshot[f"p{round(fraction * 100)}"] = self.percentile(fraction)
+        return snapshot
+
+
+class Span:
+    """
+    Замер длительности участка кода: with metrics.span("upload"): ...
+    Исключение внутри участка учитывается как ошибка этапа и передаётся дальше.
+    После выхода из участка его длительность доступна в elapsed.
+    """
+
+    __slots__ = ('histogram', 'started', 'elapsed')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed, exc_type is not None)
+        return False
+
+
+class Metrics:
+    """
+    Метрики процесса бота: гистограммы длительностей этапов и счётчики событий.
+    Все обработчики выполняются в одном потоке цикла событий, поэтому блокировки не нужны.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def span(self, name):
+        return Span(self.histogram(name))
+
+    # Декоратор для замера каждого вызова асинхронной функции целиком
+    def timed(self, name):
+        def decorator(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return await function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # Метод для записи длительности, измеренной в другом месте (например, в рабочем процессе)
+    def observe(self, name, seconds, error=False):
+        self.histogram(name).observe(seconds, error)
+
+    def increment(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        return {
+            "stages": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            "counters": dict(self.counters),
+        }
+
+
+# Функция для вычисления доли попаданий в кеш по счётчикам попаданий и промахов
+def hit_rate(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+# Функция для описания длительностей этапов текстом: перцентили в миллисекундах, количество и ошибки
+def format_stages(snapshot):
+    lines = ["Этап: p50 / p95 / p99, мс (количество, ошибок)"]
+    for name, stage in snapshot["stages"].items():
+        lines.append(f"{name}: {stage['p50'] * 1000:.1f} / {stage['p95'] * 1000:.1f} / {stage['p99'] * 1000:.1f} "
+                     f"({stage['count']}, {stage['errors']})")
+    return "\n".join(lines)
+
+
+# Функция для получения объёма памяти процесса в ОЗУ (RSS) в байтах.
+# В Linux берётся текущее значение из /proc, в остальных системах - пиковое из getrusage
+def process_rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024  # В Linux ru_maxrss в килобайтах
+
+
+# Функция для формирования описания одной метрики в текстовом формате Prometheus.
+# samples - пары (метки, значение), метки - словарь или None
+def prometheus_metric(name, metric_type, help_text, samples):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{prometheus_labels(labels)} {value}")
+    return lines
+
+
+def prometheus_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+# Функция для представления гистограмм и счётчиков снимка метрик в формате Prometheus
+def format_prometheus(snapshot, prefix):
+    lines = [f"# HELP {prefix}_stage_seconds Длительность этапов обработки запросов",
+             f"# TYPE {prefix}_stage_seconds histogram"]
+    for stage, histogram in snapshot["stages"].items():
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKET_BOUNDS, histogram["buckets"]):
+            cumulative += bucket_count
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+    lines += prometheus_metric(f"{prefix}_stage_errors_total", "counter", "Количество этапов, завершившихся ошибкой",
+                               (({"stage": stage}, histogram["errors"]) for stage, histogram in snapshot["stages"].items()))
+    for name, value in snapshot["counters"].items():
+        lines += prometheus_metric(f"{prefix}_{name}_total", "counter", f"Счётчик {name}", ((None, value),))
+    return lines
+
+
+class MetricsServer:
+    """
+    HTTP сервер для сбора метрик (GET /metrics) в цикле событий бота.
+    Запросы обрабатываются асинхронно, а формирование ответа занимает доли миллисекунды,
+    поэтому сервер не задерживает получение обновлений. collect возвращает строки ответа.
+    """
+
+    def __init__(self, collect, host='127.0.0.1', port=9108):
+        self.collect = collect
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        # При port=0 система выбирает свободный порт
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), METRICS_REQUEST_TIMEOUT)
+            # Заголовки запроса не нужны, но их нужно дочитать до пустой строки
+            while True:
+                line = await asyncio.wait_for(reader.readline(), METRICS_REQUEST_TIMEOUT)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] in ('GET', 'HEAD') and parts[1].split('?')[0] == '/metrics':
+                status = "200 OK"
+                body = ("\n".join(self.collect()) + "\n").encode('utf-8')
+            else:
+                status = "404 Not Found"
+                body = b"Not Found\n"
+            headers = (f"HTTP/1.1 {status}\r\n"
+                       f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                       f"Content-Length: {len(body)}\r\n"
+                       f"Connection: close\r\n\r\n").encode('latin-1')
+            writer.write(headers if parts and parts[0] == 'HEAD' else headers + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -1,8 +1,20 @@
+import posixpath
 import re
+import sys
+import zipfile
 from datetime import datetime, timedelta
 from enum import Enum
+from typing import NamedTuple, Optional
 
 import openpyxl
+from conflicts import find_conflicts
+from openpyxl.cell.text import Text
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_to_tuple
+from openpyxl.utils.datetime import from_ISO8601
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.xml.constants import PKG_REL_NS, REL_NS, SHEET_MAIN_NS
+from openpyxl.xml.functions import iterparse
 
 
 class DocType(Enum):
@@ -11,6 +23,120 @@ class DocType(Enum):
 
 
 YEAR = 2026  # Определяем константу для года, который будет использоваться в коде
+# Версия формата результата разбора. Увеличивается при изменении структуры занятий,
+# чтобы кешированные результаты прежних версий не использовались
+PARSER_VERSION = 9
+
+# Область листа, которую занимает расписание: строки 5-16 (по две на день недели), столбцы B-H
+FIRST_ROW, LAST_ROW = 5, 16
+FIRST_COLUMN, LAST_COLUMN = 2, 8
+# Ячейка C2 с подписью документа (ФИО преподавателя или номер группы)
+TITLE_ROW, TITLE_COLUMN = 2, 3
+
+SHEET_DATA_TAG = '{%s}sheetData' % SHEET_MAIN_NS
+MERGE_CELL_TAG = '{%s}mergeCell' % SHEET_MAIN_NS
+ROW_TAG = '{%s}row' % SHEET_MAIN_NS
+CELL_TAG = '{%s}c' % SHEET_MAIN_NS
+VALUE_TAG = '{%s}v' % SHEET_MAIN_NS
+INLINE_STRING_TAG = '{%s}is' % SHEET_MAIN_NS
+STRING_TAG = '{%s}si' % SHEET_MAIN_NS
+SHEET_TAG = '{%s}sheet' % SHEET_MAIN_NS
+WORKBOOK_VIEW_TAG = '{%s}workbookView' % SHEET_MAIN_NS
+RELATIONSHIP_TAG = '{%s}Relationship' % PKG_REL_NS
+# Открывающий тег строки листа с номером (с префиксом пространства имён или без него)
+NUMBERED_ROW_START = re.compile(rb'<(?:[\w.-]+:)?row\b[^>]*?\sr=["\'](\d+)["\']')
+# Закрывающий тег данных листа, после которого идёт список объединений
+SHEET_DATA_END = re.compile(rb'</(?:[\w.-]+:)?sheetData\s*>')
+# Размер блока, которым читается XML листа
+SHEET_CHUNK_SIZE = 64 * 1024
+
+
+# Содержимое листа, необходимое для разбора расписания
+class SheetData(NamedTuple):
+    title: Optional[str]  # Значение ячейки C2
+    cells: dict  # Значения ячеек по координатам (строка, столбец)
+    merge_index: dict  # Объединённые ячейки области расписания: (строка, столбец) -> MergedRange
+
+
+# Объединение ячеек листа и его высота (количество строк)
+class MergedRange(NamedTuple):
+    cell_range: CellRange
+    height: int
+
+
+class Lesson:
+    """
+    Занятие из одной записи ячейки расписания: всё, что не зависит от даты.
+    Один объект используется для всех дат занятия, а строки интернируются,
+    поэтому одинаковые названия, аудитории и группы хранятся в памяти один раз.
+    participants - кортеж групп (в расписании преподавателя) или строка с ФИО преподавателя
+    (в расписании группы), как в прежних словарях занятий.
+    """
+
+    __slots__ = ('subject', 'lesson_type', 'room', 'participants', 'time_start', 'time_end',
+                 'time_start_s', 'time_end_s', 'joined')
+
+    def __init__(self, subject, lesson_type, room, participants, time_start, time_end,
+                 joined=False, time_start_s=None, time_end_s=None):
+        self.subject = subject
+        self.lesson_type = lesson_type
+        self.room = room
+        self.participants = participants
+        self.time_start = time_start
+        self.time_end = time_end
+        self.joined = joined  # Занятие продолжается в следующем временном промежутке
+        self.time_start_s = time_start_s  # Время следующего промежутка (только для объединённых занятий)
+        self.time_end_s = time_end_s
+
+    def __repr__(self):
+        return f"Lesson({self.subject!r}, {self.lesson_type!r}, {self.room!r}, {self.participants!r}, " \
+               f"{self.time_start!r}-{self.time_end!r}, joined={self.joined!r})"
+
+
+# Проведение занятия в конкретную дату
+class Occurrence(NamedTuple):
+    date: datetime
+    lesson: Lesson
+
+
+# Правило повторения занятия: даты с start по end (включительно) с шагом step дней.
+# start уже совпадает с днём недели занятия, поэтому даты вычисляются арифметически
+class Recurrence(NamedTuple):
+    start: datetime
+    end: datetime
+    step: int = 7  # 7 - каждую неделю, 14 - через неделю
+    exceptions: frozenset = frozenset()  # Даты, в которые занятие не проводится
+
+    # Метод для получения дат занятия (лениво), при необходимости только внутри окна [window_start, window_end]
+    def dates(self, window_start=None, window_end=None):
+        step = timedelta(days=self.step)
+        date = self.start
+        if window_start is not None and window_start > date:
+            # Сразу переходим к первой дате внутри окна
+            date += step * -(-(window_start - date).days // self.step)
+        end = self.end if window_end is None else min(self.end, window_end)
+        while date <= end:
+            if date not in self.exceptions:
+                yield date
+            date += step
+
+
+# Занятие вместе с правилом его повторения
+class ScheduledLesson(NamedTuple):
+    lesson: Lesson
+    recurrence: Recurrence
+
+
+# Результат разбора файла расписания
+class Timetable(NamedTuple):
+    doc_type: DocType
+    label: str  # ФИО преподавателя или номер группы
+    schedule: list  # Занятия с правилами повторения (ScheduledLesson)
+    conflicts: list  # Наложения занятий (Conflict)
+
+    # Метод для получения проведений занятий внутри окна дат (все даты, если окно не задано)
+    def occurrences(self, window_start=None, window_end=None):
+        return expand_occurrences(self.schedule, window_start, window_end)
 
 
 # Функция для извлечения инициалов из названия предмета
@@ -63,18 +189,323 @@ def extract_group(text):
         return None  # Если результат отсутствует, возвращаем None
 
 
-def check_type(file_name):
-    workbook = openpyxl.load_workbook(file_name)
+# Функция для построения индекса объединённых ячеек.
+# Индекс строится один раз на лист, после чего проверка ячейки выполняется за O(1)
+def build_merge_index(merged_cells):
+    merge_index = {}
+    for cell_range in merged_cells:
+        merged = MergedRange(cell_range, cell_range.max_row - cell_range.min_row + 1)
+        # В индекс попадают только ячейки из области расписания
+        for row in range(max(cell_range.min_row, FIRST_ROW), min(cell_range.max_row, LAST_ROW) + 1):
+            for column in range(max(cell_range.min_col, FIRST_COLUMN), min(cell_range.max_col, LAST_COLUMN) + 1):
+                merge_index[(row, column)] = merged
+    return merge_index
+
+
+# Функция для получения высоты объединения, в которое входит ячейка (0 - ячейка не объединена)
+def merge_height(merge_index, row, column):
+    merged = merge_index.get((row, column))
+    return merged.height if merged else 0
+
+
+class UnsupportedWorkbook(Exception):
+    """Книга, которую не может прочитать read_sheet_xml: её читает openpyxl."""
+
+
+# Функция для получения пути к XML активного листа внутри архива книги
+def active_sheet_path(archive):
+    active_tab = 0
+    sheet_ids = []
+    with archive.open('xl/workbook.xml') as source:
+        for _, element in iterparse(source):
+            if element.tag == WORKBOOK_VIEW_TAG:
+                active_tab = int(element.get('activeTab', 0))
+            elif element.tag == SHEET_TAG:
+                sheet_ids.append(element.get('{%s}id' % REL_NS))
+    targets = {}
+    with archive.open('xl/_rels/workbook.xml.rels') as source:
+        for _, element in iterparse(source):
+            if element.tag == RELATIONSHIP_TAG:
+                targets[element.get('Id')] = element.get('Target')
+    target = targets[sheet_ids[active_tab]]
+    if not target.startswith('worksheets/') and not target.startswith('/xl/worksheets/'):
+        raise UnsupportedWorkbook(f"Активный лист не является таблицей: {target}")
+    return target[1:] if target.startswith('/') else posixpath.join('xl', target)
+
+
+# Функция для чтения нужных строк из таблицы общих строк.
+# Читается только начало таблицы до последнего нужного номера, остальные строки не разбираются
+def read_shared_strings(archive, indexes):
+    strings = {}
+    if not indexes:
+        return strings
+    last_index = max(indexes)
+    index = 0
+    with archive.open('xl/sharedStrings.xml') as source:
+        for _, element in iterparse(source):
+            if element.tag != STRING_TAG:
+                continue
+            if index in indexes:
+                # Текст собирается так же, как в openpyxl: все фрагменты без фонетических подсказок
+                strings[index] = Text.from_tree(element).content.replace('x005F_', '')
+            element.clear()
+            if index == last_index:
+                break
+            index += 1
+    return strings
+
+
+# Функция для перевода числа из XML ячейки в int или float (так же, как при чтении через openpyxl)
+def cast_number(value):
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+# Функция для чтения значения ячейки из XML так же, как это делает openpyxl с data_only=True.
+# Возвращает значение (номер общей строки для ячеек типа "s") и признак общей строки
+def read_cell_value(element):
+    data_type = element.get('t', 'n')
+    if data_type == 'inlineStr':
+        child = element.find(INLINE_STRING_TAG)
+        return (Text.from_tree(child).content if child is not None else None), False
+    value = element.findtext(VALUE_TAG, None) or None
+    if value is None:
+        return None, False
+    if data_type == 'n':
+        if int(element.get('s', 0)):
+            # Число с форматом может оказаться датой, а для этого нужны стили книги
+            raise UnsupportedWorkbook(f"Число с форматом в ячейке {element.get('r')}")
+        return cast_number(value), False
+    if data_type == 's':
+        return int(value), True
+    if data_type == 'b':
+        return bool(int(value)), False
+    if data_type == 'd':
+        return from_ISO8601(value), False
+    return value, False  # "str" (результат формулы) и "e" (ошибка) остаются текстом
+
+
+class ScheduleRowsSource:
+    """
+    Файловый объект поверх XML листа для iterparse, который не передаёт разборщику строки
+    ниже области расписания. Байты просматриваются регулярным выражением: начиная с первой строки
+    с номером больше last_row и до закрывающего тега sheetData всё пропускается, а список
+    объединений и остальная часть листа передаются как есть. Строки без номера не пропускаются,
+    поэтому такой лист просто разбирается целиком.
+    """
+
+    def __init__(self, source, last_row):
+        self.source = source
+        self.last_row = last_row
+        self.pending = b""  # Прочитанные, но ещё не переданные байты
+        self.skipping = False  # Пропускаются строки ниже области расписания
+        self.passing = False  # Данные листа закончились, остальное передаётся как есть
+
+    def read(self, size=SHEET_CHUNK_SIZE):
+        while True:
+            chunk = self.source.read(max(size, SHEET_CHUNK_SIZE))
+            data = self.pending + chunk
+            self.pending = b""
+            if self.passing or not data:
+                return data
+            if self.skipping:
+                match = SHEET_DATA_END.search(data)
+                if match is None:
+                    if not chunk:
+                        return b""  # Лист оборван: разборщик сообщит об ошибке
+                    self.pending = data[-64:]  # Закрывающий тег может оказаться на границе блоков
+                    continue
+                self.skipping = False
+                self.passing = True
+                return data[match.start():]
+            for match in NUMBERED_ROW_START.finditer(data):
+                if int(match.group(1)) > self.last_row:
+                    self.skipping = True
+                    self.pending = data[match.end():]
+                    return data[:match.start()] or self.read(size)
+            # Незаконченный тег в конце блока передаётся вместе со следующим блоком
+            tag_start = data.rfind(b"<")
+            if chunk and tag_start >= 0 and b">" not in data[tag_start:]:
+                self.pending = data[tag_start:]
+                data = data[:tag_start]
+            if data or not chunk:
+                return data
+
+
+# Функция для чтения листа расписания напрямую из XML книги, без openpyxl.load_workbook.
+# Лист разбирается потоково (iterparse из openpyxl - стандартный xml.etree, защищённый defusedxml),
+# ячейки читаются по строкам: у строк до LAST_ROW - значения нужных ячеек, а разобранная строка
+# сразу очищается. Строки ниже LAST_ROW (служебные таблицы больших выгрузок) до разборщика
+# не доходят (ScheduleRowsSource), после данных листа разбирается список объединений.
+# Из общих строк читаются только строки нужных ячеек. Стили и остальные листы не загружаются.
+# Строки и ячейки без номера (атрибута r) идут следом за предыдущими, как в openpyxl.
+# Если книга устроена непривычно, выбрасывается UnsupportedWorkbook
+def read_sheet_xml(file_name):
+    cells = {(row, column): None for row in range(TITLE_ROW, LAST_ROW + 1)
+             for column in range(FIRST_COLUMN, LAST_COLUMN + 1)}
+    shared = {}  # Координаты ячеек с общими строками -> номер строки
+    merged_cells = []
+    has_sheet_data = False
+    row = 0
+    with zipfile.ZipFile(file_name) as archive, archive.open(active_sheet_path(archive)) as source:
+        for _, element in iterparse(ScheduleRowsSource(source, LAST_ROW)):
+            tag = element.tag
+            if tag == ROW_TAG:
+                row = int(element.get('r', row + 1))
+                if row <= LAST_ROW:
+                    read_row_cells(element, row, cells, shared)
+                element.clear()
+            elif tag == MERGE_CELL_TAG:
+                merged_cells.append(CellRange(element.get('ref')))
+            elif tag == SHEET_DATA_TAG:
+                has_sheet_data = True
+        if not has_sheet_data:
+            # Например, лист в формате Strict OOXML с другим пространством имён
+            raise UnsupportedWorkbook("В листе нет данных")
+        strings = read_shared_strings(archive, set(shared.values()))
+    for coordinate, index in shared.items():
+        cells[coordinate] = strings[index]
+    return SheetData(cells[(TITLE_ROW, TITLE_COLUMN)], cells, build_merge_index(merged_cells))
+
+
+# Функция для чтения значений ячеек строки row листа, которые есть в cells.
+# Номера общих строк записываются в shared
+def read_row_cells(row_element, row, cells, shared):
+    column = 0
+    for element in row_element.iter(CELL_TAG):
+        reference = element.get('r')
+        if reference:
+            coordinate = coordinate_to_tuple(reference)
+            column = coordinate[1]
+        else:
+            column += 1
+            coordinate = (row, column)
+        if coordinate in cells:
+            value, is_shared = read_cell_value(element)
+            if is_shared:
+                shared[coordinate] = value
+            else:
+                cells[coordinate] = value
+
+
+# Функция для чтения листа расписания через openpyxl (для книг, которые не читает read_sheet_xml).
+# В режиме read_only openpyxl не разбирает объединения, поэтому книга открывается полностью
+# и объединения берутся из sheet.merged_cells
+def read_sheet_openpyxl(file_name):
+    workbook = openpyxl.load_workbook(file_name, data_only=True)
     sheet = workbook.active
-    name = extract_fio(sheet['C2'].value)
+    cells = {}
+    rows = sheet.iter_rows(min_row=TITLE_ROW, max_row=LAST_ROW,
+                           min_col=FIRST_COLUMN, max_col=LAST_COLUMN, values_only=True)
+    for row_index, row in enumerate(rows, TITLE_ROW):
+        for column_index, value in enumerate(row, FIRST_COLUMN):
+            cells[(row_index, column_index)] = value
+    return SheetData(cells.get((TITLE_ROW, TITLE_COLUMN)), cells, build_merge_index(sheet.merged_cells.ranges))
+
+
+# Функция для чтения листа расписания за одно открытие книги.
+# Сначала книга читается напрямую из XML, openpyxl используется, если это не удалось
+def read_sheet(file_name, fast=True):
+    if fast:
+        try:
+            return read_sheet_xml(file_name)
+        except (UnsupportedWorkbook, zipfile.BadZipFile, KeyError, IndexError, ValueError, SyntaxError):
+            if hasattr(file_name, 'seek'):
+                file_name.seek(0)
+    return read_sheet_openpyxl(file_name)
+
+
+# Функция для определения типа документа по подписи в ячейке C2
+def detect_type(title):
+    if not title:
+        return None
+    name = extract_fio(title)
     if name is not None:
         return DocType.PROFESSOR
-    group = extract_group(sheet['C2'].value)
+    group = extract_group(title)
     if group is not None:
         return DocType.STUDENT
     return None
 
 
+def check_type(file_name):
+    return detect_type(read_sheet(file_name).title)
+
+
+# Функция для разбора файла расписания: книга открывается один раз,
+# тип документа определяется по ячейке C2 и выбирается соответствующий разбор.
+# fast=False - читать книгу только через openpyxl
+def load_timetable(file_name, fast=True):
+    sheet_data = read_sheet(file_name, fast)
+    doc_type = detect_type(sheet_data.title)
+    if doc_type == DocType.PROFESSOR:
+        label, schedule = parse_professor(sheet_data)
+    elif doc_type == DocType.STUDENT:
+        label, schedule = parse_student(sheet_data)
+    else:
+        return None  # Невозможно определить тип документа
+    # Наложения ищутся по всем датам семестра
+    return Timetable(doc_type, label, schedule, find_conflicts(expand_occurrences(schedule)))
+
+
+# Диапазон дат занятия "ДД.ММ" или "ДД.ММ-ДД.ММ"
+DATE_PATTERN = r"\d{2}\.\d{2}(?:-\d{2}\.\d{2})?"
+# Дата, которая начинается с двух последних цифр участника ("М3О-101Бк-23.05"):
+# при отдельном поиске дат она находится, поэтому при совместном поиске захватывается вместе с участником
+OVERLAPPING_DATE_PATTERN = r"(?:(?<=(\d\d))(\.\d{2}(?:-\d{2}\.\d{2})?))?"
+LESSON_TYPE = re.compile(r"ЛР|ЛК|ПЗ")
+
+
+class LessonGrammar:
+    """
+    Разбор текста одного занятия ("ауд.305 Физика (ЛК) М3О-101Бк-23 09.02-01.06").
+    Форматы расписания преподавателя и группы отличаются только записью аудитории
+    и участников (группы или преподаватель), поэтому задаются шаблонами:
+    room_pattern - аудитория после "ауд.", participant_pattern - участник,
+    participant_start - символы, с которых может начинаться участник.
+    Все шаблоны компилируются один раз. Участники и даты, которые встречаются в записи
+    по нескольку раз, находятся одним шаблоном за один проход по тексту; проверка первого
+    символа позволяет не пробовать оба варианта в каждой позиции.
+    Результат совпадает с прежним раздельным поиском каждого поля: первая аудитория,
+    первый тип занятия, все участники и все даты в порядке следования.
+    """
+
+    def __init__(self, room_pattern, participant_pattern, participant_start):
+        self.room = re.compile(f"ауд\\.({room_pattern})")
+        self.scanner = re.compile(f"(?=[\\d{participant_start}])"
+                                  f"(?:({participant_pattern}){OVERLAPPING_DATE_PATTERN}|({DATE_PATTERN}))")
+
+    def tokenize(self, lesson):
+        room_match = self.room.search(lesson)
+        room = room_match.group(1) if room_match else None
+        type_match = LESSON_TYPE.search(lesson)
+        lesson_type = type_match.group() if type_match else None
+        if room and lesson_type:
+            # Название предмета - текст между аудиторией и типом занятия "(ЛК)"
+            subject_start = lesson.find(room) + len(room) + 1
+            subject = lesson[subject_start:type_match.start() - 2].strip()
+        else:
+            subject = None
+        tokens = self.scanner.findall(lesson)
+        participants = [participant for participant, _, _, _ in tokens if participant]
+        dates = [date or head + tail for _, head, tail, date in tokens if date or tail]
+        return room, subject, lesson_type, participants, dates
+
+
+# Форматы текста занятий в расписании преподавателя и в расписании группы
+PROFESSOR_GRAMMAR = LessonGrammar(
+    r"каф\.\(-\)|\d+\([А-Яа-я\s]+\)|\d+\(?\d?\)?|Зал\s+[А-Яа-я]+\(\d+\)",
+    r"[А-Я][\dА-Я][А-Я]-\d{3}[А-Яа-я]+-\d{2}",
+    "А-Я",
+)
+STUDENT_GRAMMAR = LessonGrammar(
+    r"каф\.( *\d*)\(-\)|\d+\([А-Яа-я\s]+|d*\)|Зал [А-Я]\(?\d*\)|\d+\(?\d*\)?",
+    r"[А-Я][а-я]+ [А-Я]\.+(?:[А-Я]\.)*",
+    "А-Я",
+)
+
+
 # Функция для извлечения информации о занятиях из текста
 def extract_professor_info(text):
     if not text:
@@ -85,34 +516,14 @@ def extract_professor_info(text):
     for lesson in lessons:
         # Для каждого занятия извлекаем отдельную информацию
         room, subject, lesson_type, group, dates = extract_single_lesson_info(lesson)
-        results.append((room, subject, lesson_type, group, dates))
+        # Списки заменяются кортежами, чтобы занятие можно было хранить в множестве
+        results.append((room, subject, lesson_type, tuple(group), tuple(dates) if dates else dates))
     return results  # Возвращаем список с информацией о занятиях
 
 
 # Функция для извлечения информации о конкретном занятии
 def extract_single_lesson_info(lesson):
-    # Ищем информацию о комнате с помощью регулярного выражения
-    room_match = re.search(r"ауд\.(каф\.\(-\)|\d+\([А-Яа-я\s]+\)|\d+\(?\d?\)?|Зал\s+[А-Яа-я]+\(\d+\))", lesson)
-    room = room_match.group(1) if room_match else None
-
-    # Ищем тип занятия (ЛР, ЛК, ПЗ)
-    lesson_type_match = re.search(r"(ЛР|ЛК|ПЗ)", lesson)
-    lesson_type = lesson_type_match.group(1) if lesson_type_match else None
-
-    if room and lesson_type:
-        # Если найдены комната и тип, извлекаем название предмета из текста занятия
-        subject_start = lesson.find(room) + len(room) + 1
-        subject_end = lesson.find(lesson_type) - 2
-        subject = lesson[subject_start:subject_end].strip()
-    else:
-        subject = None
-
-    # Ищем названия групп с помощью регулярного выражения
-    group_pattern = r"([А-Я][\dА-Я][А-Я]-\d{3}[А-Яа-я]+-\d{2})"
-    groups = re.findall(group_pattern, lesson)
-
-    # Ищем даты занятий
-    dates = re.findall(r"(\d{2}\.\d{2}(?:-\d{2}\.\d{2})?)", lesson)
+    room, subject, lesson_type, groups, dates = PROFESSOR_GRAMMAR.tokenize(lesson)
     if dates:
         for i, d in enumerate(dates):
             if '-' not in d:
@@ -137,32 +548,11 @@ def extract_student_info(text):
 
 
 def extract_single_students_lesson_info(lesson):
-    # Ищем информацию о комнате с помощью регулярного выражения
-    room_match = re.search(r"ауд\.(каф\.( *\d*)\(-\)|\d+\([А-Яа-я\s]+|d*\)|Зал [А-Я]\(?\d*\)|\d+\(?\d*\)?)", lesson)
-    room = room_match.group(1) if room_match else None
-
-    # Ищем тип занятия (ЛР, ЛК, ПЗ)
-    lesson_type_match = re.search(r"(ЛР|ЛК|ПЗ)", lesson)
-    lesson_type = lesson_type_match.group(1) if lesson_type_match else None
-    if room and lesson_type:
-        # Если найдены комната и тип, извлекаем название предмета из текста занятия
-        subject_start = lesson.find(room) + len(room) + 1
-        subject_end = lesson.find(lesson_type) - 2
-        subject = lesson[subject_start:subject_end].strip()
-    else:
-        subject = None
-    # Ищем названия групп с помощью регулярного выражения
-    professor_pattern = r"([А-Я][а-я]+ [А-Я]\.+(?:[А-Я]\.)*)"
-    professors = re.findall(professor_pattern, lesson)
-    if len(professors) > 0:
-        professor = professors[0]
-    else:
-        professor = ''
-
-    # Ищем даты занятий
-    dates_match = re.search(r"(\d{2}\.\d{2}(?:-\d{2}\.\d{2})?)", lesson)
-    if dates_match:
-        dates = dates_match.group(1)
+    # В расписании группы нужны только первый преподаватель и первый диапазон дат
+    room, subject, lesson_type, professors, dates = STUDENT_GRAMMAR.tokenize(lesson)
+    professor = professors[0] if professors else ''
+    if dates:
+        dates = dates[0]
         if "-" not in dates:
             dates = f"{dates}-{dates}"
     else:
@@ -170,21 +560,46 @@ def extract_single_students_lesson_info(lesson):
     return room, subject, lesson_type, professor, dates  # Возвращаем извлеченные данные о занятии
 
 
-# Функция для получения дат по определённому дню недели между двумя датами
-def get_dates_between(start_date, end_date, weekday):
-    current_date = start_date
-    while current_date <= end_date:  # Перебираем даты в диапазоне от начальной до конечной
-        if current_date.weekday() == weekday:  # Проверяем, соответствует ли текущий день недели заданному
-            yield current_date  # Если да, то возвращаем текущую дату
-        current_date += timedelta(days=1)  # Переходим к следующему дню
+# Функция для разбора диапазона дат вида "ДД.ММ-ДД.ММ"
+def parse_date_range(date_range):
+    start_date_str, end_date_str = date_range.split('-')
+    start_date = datetime.strptime(start_date_str + "." + str(YEAR), '%d.%m.%Y')
+    end_date = datetime.strptime(end_date_str + "." + str(YEAR), '%d.%m.%Y')
+    return start_date, end_date
+
+
+# Функция для построения правила повторения занятия по дню недели.
+# Первая дата - ближайший к start_date нужный день недели, далее шаг 7 или 14 дней
+def weekly_recurrence(start_date, end_date, weekday, every_week=True, exceptions=()):
+    first_date = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+    return Recurrence(first_date, end_date, 7 if every_week else 14, frozenset(exceptions))
 
-# Функция для проверки, присоединено ли занятие к следующему
-def check_if_exercise_joined(exercise, next_cell):
-    # Возвращаем True, если в следующей ячейке есть значение и оно содержит информацию о занятии
-    return next_cell.value and exercise in extract_professor_info(next_cell.value)
 
-# Функция для получения временного периода занятий на основе буквы столбца
-def get_time_period(cell):
+# Функция для получения проведений занятий (лениво), при необходимости только внутри окна дат
+def expand_occurrences(schedule, window_start=None, window_end=None):
+    for lesson, recurrence in schedule:
+        for date in recurrence.dates(window_start, window_end):
+            yield Occurrence(date, lesson)
+
+# Функция для разбора текста всех ячеек области расписания.
+# Текст каждой ячейки разбирается ровно один раз: (строка, столбец) -> кортеж занятий
+def tokenize_grid(sheet_data, extract_info):
+    grid = {}
+    for row in range(FIRST_ROW, LAST_ROW + 1):
+        for column in range(FIRST_COLUMN, LAST_COLUMN + 1):
+            value = sheet_data.cells.get((row, column))
+            if value:  # Если в ячейке есть значение
+                grid[(row, column)] = tuple(extract_info(value))
+    return grid
+
+
+# Функция для получения занятий, которые продолжаются в следующей ячейке строки.
+# Занятие объединено со следующим, если та же запись есть и в соседней ячейке справа
+def joined_entries(grid, row, column):
+    return frozenset(grid.get((row, column), ())) & frozenset(grid.get((row, column + 1), ()))
+
+# Функция для получения временного периода занятий на основе номера столбца
+def get_time_period(column):
     # Словарь, сопоставляющий буквы столбцов с временными промежутками
     time_mapping = {
         'B': ('09:00', '10:30'),
@@ -195,54 +610,35 @@ def get_time_period(cell):
         'G': ('18:15', '19:45'),
         'H': ('20:00', '21:30')
     }
-    start_time, end_time = time_mapping[cell.column_letter]  # Получаем начальное и конечное время на основе буквы столбца
+    start_time, end_time = time_mapping[get_column_letter(column)]  # Получаем начальное и конечное время на основе буквы столбца
     return start_time, end_time
 
-# Функция для формирования информации о занятии
-def form_exercise(date, cell, next_cell, joined, room, subject, lesson_type, group):
-    time_start, time_end = get_time_period(cell)  # Получаем начальное и конечное время занятия
-    # Создаём словарь с деталями занятия
-    exercise_details = {
-        "date": date,
-        "time_start": time_start,
-        "time_end": time_end,
-        "group": group,
-        "room": room,
-        "type": lesson_type,
-        "subject": subject,
-        "joined": joined,
-    }
-    if joined:  # Если занятие объединено со следующим
-        time_start_s, time_end_s = get_time_period(next_cell)  # Получаем временной период следующего занятия
-        # Добавляем информацию о времени начала и окончания следующего занятия
-        exercise_details["time_start_s"] = time_start_s
-        exercise_details["time_end_s"] = time_end_s
-    return exercise_details  # Возвращаем словарь с информацией о занятии
-
-
-# Функция для формирования информации о занятии
-def form_exercise_student(date, cell, next_cell, joined, room, subject, lesson_type, professor):
-    time_start, time_end = get_time_period(cell)  # Получаем начальное и конечное время занятия
-    # Создаём словарь с деталями занятия
-    exercise_details = {
-        "date": date,
-        "time_start": time_start,
-        "time_end": time_end,
-        "professor": professor,
-        "room": room,
-        "type": lesson_type,
-        "subject": subject,
-        "joined": joined,
-    }
+# Функция для интернирования строки (одинаковые строки хранятся одним объектом)
+def intern_text(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# Функция для формирования занятия из записи ячейки.
+# participants - список групп или ФИО преподавателя
+def form_lesson(column, joined, room, subject, lesson_type, participants):
+    time_start, time_end = get_time_period(column)  # Получаем начальное и конечное время занятия
+    if not isinstance(participants, str):
+        participants = tuple(intern_text(participant) for participant in participants)
+    lesson = Lesson(intern_text(subject), intern_text(lesson_type), intern_text(room),
+                    intern_text(participants), time_start, time_end, bool(joined))
     if joined:  # Если занятие объединено со следующим
-        time_start_s, time_end_s = get_time_period(next_cell)  # Получаем временной период следующего занятия
         # Добавляем информацию о времени начала и окончания следующего занятия
-        exercise_details["time_start_s"] = time_start_s
-        exercise_details["time_end_s"] = time_end_s
-    return exercise_details  # Возвращаем словарь с информацией о занятии
+        lesson.time_start_s, lesson.time_end_s = get_time_period(column + 1)
+    return lesson
+
+
 
 
 def read_professor(file_name):
+    return parse_professor(read_sheet(file_name))
+
+
+def parse_professor(sheet_data):
     # Словарь для сопоставления номеров строк с днями недели
     day_mapping = {
         5: 0,  # понедельник
@@ -259,92 +655,46 @@ def read_professor(file_name):
         16: 5  # суббота
     }
 
-    # Загрузка рабочей книги Excel и активного листа
-    workbook = openpyxl.load_workbook(file_name)
-    sheet = workbook.active
-    lessons = [] # Список для хранения занятий
-    added_exercises = [] # Список для отслеживания уже добавленных занятий
+    schedule = [] # Список занятий с правилами повторения
+    added_exercises = set() # Множество уже добавленных занятий
 
     # Извлечение ФИО преподавателя
-    name = extract_fio(sheet['C2'].value)
+    name = extract_fio(sheet_data.title)
 
-    # Словарь для хранения занятий по датам
-    exercises_by_date = {}
+    # Текст всех ячеек разбирается один раз
+    grid = tokenize_grid(sheet_data, extract_professor_info)
     # Итерация по строкам и столбцам листа
-    for row in sheet.iter_rows(min_row=5, max_row=16, min_col=2, max_col=8):
-        for cell in row:
-            if cell.coordinate: # Если ячейка имеет координату
-                if cell.value: # Если в ячейке есть значение
-                    # Проверка, объединена ли ячейка
-                    is_merged = any([cell.coordinate in item for item in sheet.merged_cells.ranges])
-                    if is_merged:
-                        cell_height = 2 # Высота объединенной ячейки
-                    else:
-                        cell_height = 1 # Высота необъединенной ячейки
-
-                    every_week = cell_height > 1 # Занятие каждую неделю, если ячейка объединена
-
-                    # Извлечение информации о занятии из ячейки
-                    for exercise in extract_professor_info(cell.value):
-                        if exercise in added_exercises:
-                            continue # Пропускаем, если занятие уже обработано
-                        added_exercises.append(exercise)
-                        room, subject, lesson_type, group, date_list = exercise
-                        # Разбор дат начала и конца занятий
-                        for date_range in date_list:
-                            start_date_str, end_date_str = date_range.split('-')
-                            start_date = datetime.strptime(start_date_str + "." + str(YEAR), '%d.%m.%Y')
-                            end_date = datetime.strptime(end_date_str + "." + str(YEAR), '%d.%m.%Y')
-                            once_in_two_weeks = True # Переключатель для занятий через неделю
-                            for date in get_dates_between(start_date, end_date, day_mapping[cell.row]):
-                                # Проверяем, соответствует ли дата текущей строке расписания
-                                if date.weekday() == day_mapping[cell.row]:
-                                    # Получаем следующую ячейку для проверки, объединено ли занятие
-                                    next_cell = sheet.cell(row=cell.row, column=cell.column + 1)
-                                    joined = check_if_exercise_joined(exercise, next_cell)
-                                    if every_week:
-                                        # Формируем структуру занятия, если оно каждую неделю
-                                        exercise_struct = form_exercise(date, cell, next_cell, joined, room, subject, lesson_type, group)
-                                        # Проверяем и добавляем занятие в словарь по датам и времени
-                                        if (date, exercise_struct["time_start"], exercise_struct["time_end"]) not in exercises_by_date:
-                                            exercises_by_date[(date, exercise_struct["time_start"], exercise_struct["time_end"])] = []
-                                        exercises_by_date[(date, exercise_struct["time_start"], exercise_struct["time_end"])].append(exercise)
-                                        # Если занятие объединено, добавляем информацию о времени объединенного занятия
-                                        if exercise_struct["joined"]:
-                                            if (date, exercise_struct["time_start_s"], exercise_struct["time_end_s"]) not in exercises_by_date:
-                                                exercises_by_date[(date, exercise_struct["time_start_s"], exercise_struct["time_end_s"])] = []
-                                            exercises_by_date[(date, exercise_struct["time_start_s"], exercise_struct["time_end_s"])].append(exercise)
-                                        # Добавляем структуру занятия в список занятий
-                                        lessons.append(exercise_struct)
-                                    else:
-                                        # Если занятие через неделю, переключаемся на следующую неделю
-                                        if once_in_two_weeks:
-                                            exercise_struct = form_exercise(date, cell, next_cell, joined, room, subject, lesson_type, group)
-                                            if (date, exercise_struct["time_start"], exercise_struct["time_end"]) not in exercises_by_date:
-                                                exercises_by_date[(date, exercise_struct["time_start"], exercise_struct["time_end"])] = []
-                                            exercises_by_date[(date, exercise_struct["time_start"], exercise_struct["time_end"])].append(exercise)
-                                            if exercise_struct["joined"]:
-                                                if (date, exercise_struct["time_start_s"], exercise_struct["time_end_s"]) not in exercises_by_date:
-                                                    exercises_by_date[(date, exercise_struct["time_start_s"], exercise_struct["time_end_s"])] = []
-                                                exercises_by_date[(date, exercise_struct["time_start_s"], exercise_struct["time_end_s"])].append(exercise)
-                                            lessons.append(exercise_struct)
-                                            once_in_two_weeks = False # Переключаемся на другую неделю
-                                        else:
-                                            once_in_two_weeks = True # Следующая итерация будет для "другой" недели
-
-    # Строка для сбора ошибок в расписании
-    erorrs = ""
-    for key, value in exercises_by_date.items():
-        if (len(value) > 1):
-            # Формирование сообщений об ошибках для перекрывающихся занятий
-            erorrs += f'{key[0].strftime("%d.%m")} с {key[1]} до {key[2]} накладываются занятия:\n'
-            for val in value:
-                erorrs += f"{val[1]} ({val[2]}) у группы {val[3][0]}\n"
-    # Возвращаем ФИО преподавателя, список занятий и ошибки
-    return name, lessons, erorrs
+    for row in range(FIRST_ROW, LAST_ROW + 1):
+        for column in range(FIRST_COLUMN, LAST_COLUMN + 1):
+            entries = grid.get((row, column))
+            if entries: # Если в ячейке есть занятия
+                # Занятие каждую неделю, если ячейка входит в объединение любой высоты
+                # (в том числе в одну строку, по горизонтали, как и при проверке по списку объединений)
+                every_week = merge_height(sheet_data.merge_index, row, column) > 0
+                # Занятия, продолжающиеся в следующей ячейке, определяются один раз для ячейки
+                joined = joined_entries(grid, row, column)
+
+                for exercise in entries:
+                    if exercise in added_exercises:
+                        continue # Пропускаем, если занятие уже обработано
+                    added_exercises.add(exercise)
+                    room, subject, lesson_type, group, date_list = exercise
+                    lesson = form_lesson(column, exercise in joined, room, subject, lesson_type, group)
+                    # Разбор дат начала и конца занятий: каждый диапазон - отдельное правило повторения
+                    for date_range in date_list:
+                        start_date, end_date = parse_date_range(date_range)
+                        recurrence = weekly_recurrence(start_date, end_date, day_mapping[row], every_week)
+                        schedule.append(ScheduledLesson(lesson, recurrence))
+
+    # Возвращаем ФИО преподавателя и список занятий
+    return name, schedule
 
 
 def read_student(file_name):
+    return parse_student(read_sheet(file_name))
+
+
+def parse_student(sheet_data):
     # Словарь для сопоставления номеров строк с днями недели
     day_mapping = {
         5: 0,  # понедельник
@@ -361,88 +711,37 @@ def read_student(file_name):
         16: 5  # суббота
     }
 
-    # Загрузка рабочей книги Excel и активного листа
-    workbook = openpyxl.load_workbook(file_name)
-    sheet = workbook.active
-    lessons = [] # Список для хранения занятий
-    added_exercises = [] # Список для отслеживания уже добавленных занятий
+    schedule = [] # Список занятий с правилами повторения
+    added_exercises = set() # Множество уже добавленных занятий
 
     # Извлечение ФИО преподавателя
-    group = extract_group(sheet['C2'].value)
+    group = extract_group(sheet_data.title)
 
-    # Словарь для хранения занятий по датам
-    exercises_by_date = {}
+    # Текст всех ячеек разбирается один раз
+    grid = tokenize_grid(sheet_data, extract_student_info)
     # Итерация по строкам и столбцам листа
-    for row in sheet.iter_rows(min_row=5, max_row=16, min_col=2, max_col=8):
-        for cell in row:
-            if cell.coordinate: # Если ячейка имеет координату
-                if cell.value: # Если в ячейке есть значение
-                    # Проверка, объединена ли ячейка
-                    is_merged = any([cell.coordinate in item for item in sheet.merged_cells.ranges])
-                    if is_merged:
-                        cell_height = 2 # Высота объединенной ячейки
-                    else:
-                        cell_height = 1 # Высота необъединенной ячейки
-
-                    every_week = cell_height > 1 # Занятие каждую неделю, если ячейка объединена
-
-                    # Извлечение информации о занятии из ячейки
-
-                    for exercise in extract_student_info(cell.value):
-                        if exercise in added_exercises:
-                            continue # Пропускаем, если занятие уже обработано
-                        added_exercises.append(exercise)
-                        room, subject, lesson_type, professor, date_range = exercise
-                        # Разбор дат начала и конца занятий
-                        start_date_str, end_date_str = date_range.split('-')
-                        start_date = datetime.strptime(start_date_str + "." + str(YEAR), '%d.%m.%Y')
-                        end_date = datetime.strptime(end_date_str + "." + str(YEAR), '%d.%m.%Y')
-                        once_in_two_weeks = True # Переключатель для занятий через неделю
-                        for date in get_dates_between(start_date, end_date, day_mapping[cell.row]):
-                            # Проверяем, соответствует ли дата текущей строке расписания
-                            if date.weekday() == day_mapping[cell.row]:
-                                # Получаем следующую ячейку для проверки, объединено ли занятие
-                                next_cell = sheet.cell(row=cell.row, column=cell.column + 1)
-                                joined = check_if_exercise_joined(exercise, next_cell)
-                                if every_week:
-                                    # Формируем структуру занятия, если оно каждую неделю
-                                    exercise_struct = form_exercise_student(date, cell, next_cell, joined, room, subject, lesson_type, professor)
-                                    # Проверяем и добавляем занятие в словарь по датам и времени
-                                    if (date, exercise_struct["time_start"], exercise_struct["time_end"]) not in exercises_by_date:
-                                        exercises_by_date[(date, exercise_struct["time_start"], exercise_struct["time_end"])] = []
-                                    exercises_by_date[(date, exercise_struct["time_start"], exercise_struct["time_end"])].append(exercise)
-                                    # Если занятие объединено, добавляем информацию о времени объединенного занятия
-                                    if exercise_struct["joined"]:
-                                        if (date, exercise_struct["time_start_s"], exercise_struct["time_end_s"]) not in exercises_by_date:
-                                            exercises_by_date[(date, exercise_struct["time_start_s"], exercise_struct["time_end_s"])] = []
-                                        exercises_by_date[(date, exercise_struct["time_start_s"], exercise_struct["time_end_s"])].append(exercise)
-                                    # Добавляем структуру занятия в список занятий
-                                    lessons.append(exercise_struct)
-                                else:
-                                    # Если занятие через неделю, переключаемся на следующую неделю
-                                    if once_in_two_weeks:
-                                        exercise_struct = form_exercise_student(date, cell, next_cell, joined, room, subject, lesson_type, group)
-                                        if (date, exercise_struct["time_start"], exercise_struct["time_end"]) not in exercises_by_date:
-                                            exercises_by_date[(date, exercise_struct["time_start"], exercise_struct["time_end"])] = []
-                                        exercises_by_date[(date, exercise_struct["time_start"], exercise_struct["time_end"])].append(exercise)
-                                        if exercise_struct["joined"]:
-                                            if (date, exercise_struct["time_start_s"], exercise_struct["time_end_s"]) not in exercises_by_date:
-                                                exercises_by_date[(date, exercise_struct["time_start_s"], exercise_struct["time_end_s"])] = []
-                                            exercises_by_date[(date, exercise_struct["time_start_s"], exercise_struct["time_end_s"])].append(exercise)
-                                        lessons.append(exercise_struct)
-                                        once_in_two_weeks = False # Переключаемся на другую неделю
-                                    else:
-                                        once_in_two_weeks = True # Следующая итерация будет для "другой" недели
-    # Строка для сбора ошибок в расписании
-    erorrs = ""
-    for key, value in exercises_by_date.items():
-        if (len(value) > 1):
-            # Формирование сообщений об ошибках для перекрывающихся занятий
-            erorrs += f'{key[0].strftime("%d.%m")} с {key[1]} до {key[2]} накладываются занятия:\n'
-            for val in value:
-                erorrs += f"{val[1]} ({val[0]}) {val[3]}\n"
-    # Возвращаем ФИО преподавателя, список занятий и ошибки
-    return group, lessons, erorrs
+    for row in range(FIRST_ROW, LAST_ROW + 1):
+        for column in range(FIRST_COLUMN, LAST_COLUMN + 1):
+            entries = grid.get((row, column))
+            if entries: # Если в ячейке есть занятия
+                # Занятие каждую неделю, если ячейка входит в объединение любой высоты
+                # (в том числе в одну строку, по горизонтали, как и при проверке по списку объединений)
+                every_week = merge_height(sheet_data.merge_index, row, column) > 0
+                # Занятия, продолжающиеся в следующей ячейке, определяются один раз для ячейки
+                joined = joined_entries(grid, row, column)
+
+                for exercise in entries:
+                    if exercise in added_exercises:
+                        continue # Пропускаем, если занятие уже обработано
+                    added_exercises.add(exercise)
+                    room, subject, lesson_type, professor, date_range = exercise
+                    lesson = form_lesson(column, exercise in joined, room, subject, lesson_type, professor)
+                    # Разбор дат начала и конца занятий
+                    start_date, end_date = parse_date_range(date_range)
+                    recurrence = weekly_recurrence(start_date, end_date, day_mapping[row], every_week)
+                    schedule.append(ScheduledLesson(lesson, recurrence))
+    # Возвращаем номер группы и список занятий
+    return group, schedule
 
 
 if __name__ == '__main__':
@@ -456,5 +755,5 @@ if __name__ == '__main__':
     sys.path.append(scripts_path)
 
     file_name = "data/example.xlsx"
-    name, exercises, errors = read_professor(file_name)
-    print(exercises)
\ No newline at end of file
+    name, schedule = read_professor(file_name)
+    print(schedule)
\ No newline at end of file
@@ -0,0 +1,394 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import signal
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import NamedTuple
+
+# Количество попыток выполнить задание, если рабочий процесс аварийно завершился
+MAX_ATTEMPTS = 2
+# Время выполнения задания по умолчанию, после которого процесс считается зависшим, с
+RENDER_TIMEOUT = 60
+
+# Каталог для сохранения промежуточных SVG и PDF при отладке.
+# По умолчанию отрисовка выполняется целиком в памяти и ничего не пишет на диск
+DEBUG_RENDER_DIR = os.getenv('DEBUG_RENDER_DIR')
+
+# Способ отрисовки: 'svg' — через SVG и cairosvg, 'svg-compact' — через компактный SVG
+# (стили классами, округлённые координаты), 'pdf' — сразу в PDF через cairo. Пока PDF, нарисованный
+# сразу через cairo, не сверен с PDF из SVG, по умолчанию используется 'svg'
+RENDER_BACKEND = os.getenv('RENDER_BACKEND', 'svg')
+# Способы отрисовки, при которых PDF получается из SVG через cairosvg
+SVG_BACKENDS = ('svg', 'svg-compact')
+
+# Приоритеты заданий: запросы пользователей выполняются раньше фоновых заданий
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+# Задание на формирование расписания
+class RenderJob(NamedTuple):
+    data: bytes  # Содержимое присланной книги
+    start_date: datetime
+    end_date: datetime
+    no_color: bool
+
+
+# Результат выполнения задания
+class RenderResult(NamedTuple):
+    doc_type: object  # DocType документа
+    label: str  # ФИО преподавателя или номер группы
+    conflicts: list  # Наложения занятий (Conflict)
+    pdf: bytes  # Готовый PDF
+    pid: int  # Рабочий процесс, выполнивший задание
+    elapsed: float  # Время выполнения в секундах
+    stages: dict  # Время этапов в рабочем процессе (разбор, раскладка, отрисовка, PDF), с
+    counters: dict  # Попадания и промахи кешей рабочего процесса при выполнении задания
+
+
+# Ошибка разбора присланной книги (в отличие от ошибок отрисовки)
+class TimetableParseError(Exception):
+    pass
+
+
+# Кеш разобранных расписаний рабочего процесса (создаётся при запуске процесса)
+worker_cache = None
+
+
+# Функция подготовки рабочего процесса: модули и шрифт загружаются заранее, чтобы первое задание
+# не тратило на это время. Настройки fontconfig процесс получает от пула через окружение (register_font)
+def warm_up(cache_dir, parsed_items, parsed_disk_bytes):
+    global worker_cache
+    import font_embedding
+    import font_metrics
+    if RENDER_BACKEND in SVG_BACKENDS:
+        import cairosvg  # noqa: F401
+    else:
+        import cairocffi  # noqa: F401
+    from timetable_cache import DiskCache, LRUCache, TieredCache
+
+    font_metrics.preload()
+    font_embedding.register_font()
+    # Память у каждого процесса своя, а каталог на диске общий для всех рабочих процессов
+    worker_cache = TieredCache(
+        LRUCache(max_items=parsed_items),
+        DiskCache(os.path.join(cache_dir, 'parsed'), max_bytes=parsed_disk_bytes)
+    )
+
+
+# Функция для отрисовки расписания в PDF (выполняется в рабочем процессе).
+# В режимах 'svg' и 'svg-compact' SVG формируется строкой и передаётся в cairosvg,
+# в режиме 'pdf' таблица рисуется сразу в PDF. Результат возвращается байтами.
+# Если передан словарь stages, в него записывается время этапов в секундах
+def render_timetable_pdf(timetable, start_date, end_date, no_color, backend_name=None, stages=None):
+    from build_svg import TableFormer, align_to_weeks, prepare_data
+    from draw_backends import BACKENDS
+
+    stages = {} if stages is None else stages
+    backend_name = backend_name or RENDER_BACKEND
+    started = time.perf_counter()
+    # Даты занятий разворачиваются только для отображаемых недель, а не для всего семестра
+    window_start, window_end = align_to_weeks(start_date, end_date)
+    exercises, weekday_time_spans = prepare_data(timetable.occurrences(window_start, window_end), start_date, end_date)
+    stages["prepare_data"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    table_former = TableFormer(timetable.label, start_date, end_date, exercises, weekday_time_spans,
+                               no_color=no_color, backend=BACKENDS[backend_name])
+    # Раскладка текста ячеек (form_text) выполняется во время отрисовки и входит в этот этап
+    table_former.draw_timetable()
+    stages["draw"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if backend_name in SVG_BACKENDS:
+        import cairosvg
+        from font_embedding import register_font
+        register_font()  # cairosvg выбирает шрифт по названию через fontconfig
+        svg = table_former.to_bytes()
+        pdf = cairosvg.svg2pdf(bytestring=svg)
+    else:
+        svg = None
+        pdf = table_former.to_bytes()
+    stages["pdf"] = time.perf_counter() - started
+    if DEBUG_RENDER_DIR:
+        save_debug_files(svg, pdf)
+    return pdf
+
+
+# Функция для сохранения промежуточных файлов отрисовки (только при заданном DEBUG_RENDER_DIR)
+def save_debug_files(svg, pdf):
+    os.makedirs(DEBUG_RENDER_DIR, exist_ok=True)
+    base_name = os.path.join(DEBUG_RENDER_DIR, f"timetable_{os.getpid()}")
+    if svg is not None:
+        with open(f"{base_name}.svg", 'wb') as svg_file:
+            svg_file.write(svg)
+    with open(f"{base_name}.pdf", 'wb') as pdf_file:
+        pdf_file.write(pdf)
+
+
+# Функция выполнения задания в рабочем процессе: разбор книги (с кешем) и отрисовка.
+# Вместе с PDF возвращается время этапов и попадания в кеши, их учитывает процесс бота
+def render_job(job):
+    from build_svg import form_text
+    from timetable_cache import load_cached_timetable
+
+    started = time.perf_counter()
+    parsed_hits = worker_cache.hits
+    layout_info = form_text.cache_info()
+    try:
+        _, timetable = load_cached_timetable(job.data, worker_cache)
+    except Exception as error:
+        raise TimetableParseError(str(error)) from error
+    if timetable is None:
+        raise TimetableParseError("Невозможно определить тип документа")
+    stages = {"parse": time.perf_counter() - started}
+    pdf = render_timetable_pdf(timetable, job.start_date, job.end_date, job.no_color, stages=stages)
+    parsed_hit = int(worker_cache.hits > parsed_hits)
+    layout_hits = form_text.cache_info().hits - layout_info.hits
+    layout_misses = form_text.cache_info().misses - layout_info.misses
+    counters = {
+        "parsed_cache_hits": parsed_hit,
+        "parsed_cache_misses": 1 - parsed_hit,
+        "layout_cache_hits": layout_hits,
+        "layout_cache_misses": layout_misses,
+    }
+    return RenderResult(timetable.doc_type, timetable.label, timetable.conflicts, pdf,
+                        os.getpid(), time.perf_counter() - started, stages, counters)
+
+
+# Функция запуска рабочего процесса: сообщает пулу pid процесса (чтобы пул мог завершить
+# зависший процесс) и вызывает функцию подготовки процесса
+def start_worker(pid_queue, initializer, *initargs):
+    pid_queue.put(os.getpid())
+    initializer(*initargs)
+
+
+class RenderPool:
+    """
+    Пул рабочих процессов для разбора и отрисовки расписаний.
+    Задания попадают в ограниченную очередь: если она заполнена, submit сразу
+    сообщает об этом, а не заставляет пользователя ждать. Аварийно завершившийся
+    процесс приводит к перезапуску пула, а прерванные задания повторяются на новом пуле.
+    По ошибке пула нельзя понять, какое из прерванных заданий к ней привело, поэтому
+    они повторяются по одному, и попыткой засчитывается только такой повтор: задания,
+    прерванные чужой ошибкой, не расходуют попытки. Задание, которое выполняется дольше
+    timeout секунд, завершается ошибкой asyncio.TimeoutError, а пул с зависшим процессом
+    перезапускается.
+    Фоновые задания (BACKGROUND) берутся из очереди, только когда в ней нет запросов
+    пользователей, и ограничиваются отдельно, поэтому не занимают их места в очереди.
+    Выполняемое задание не прерывается, поэтому фоновые задания занимают не больше workers - 1
+    процессов: для запросов пользователей остаётся свободный процесс. При workers == 1
+    фоновое задание всё же может занять единственный процесс, и запрос пользователя ждёт
+    его завершения (иначе фоновые задания не выполнялись бы вовсе).
+    """
+
+    # target и initializer - функция задания и функция подготовки процесса (другие подставляются в тестах пула)
+    def __init__(self, workers, queue_size, initargs=(), timeout=RENDER_TIMEOUT, target=render_job, initializer=warm_up):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.initargs = initargs
+        self.timeout = timeout
+        self.target = target
+        self.initializer = initializer
+        self.queue = None
+        self.sequence = itertools.count()  # Порядок постановки внутри одного приоритета
+        self.queued = {INTERACTIVE: 0, BACKGROUND: 0}  # Заданий в очереди по приоритетам
+        self.running = set()  # Future заданий, переданных в пул процессов
+        self.background_limit = max(1, workers - 1)
+        self.background_running = 0
+        self.deferred = deque()  # Фоновые задания, ожидающие, пока освободится место для них
+        self.executor = None
+        self.pid_queue = None  # Рабочие процессы текущего пула сообщают в неё свои pid
+        self.dispatchers = []
+        self.idle = 0  # Количество свободных обработчиков очереди
+        self.slots = None  # Условие для ожидания процессов, когда задание повторяется в одиночку
+        self.active = 0  # Заданий, переданных в пул процессов
+        self.isolating = False  # Одно из заданий ждёт или выполняется в пуле в одиночку
+        self.terminated = weakref.WeakSet()  # Пулы, завершённые из-за зависшего задания
+        self.restarts = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.worker_stats = {}  # pid -> {"jobs": ..., "busy": ...}
+
+    def create_executor(self):
+        # Процессы запускаются через spawn: родительский процесс многопоточный (HTTP клиент бота)
+        context = multiprocessing.get_context('spawn')
+        self.pid_queue = context.SimpleQueue()
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=start_worker,
+                                   initargs=(self.pid_queue, self.initializer, *self.initargs))
+
+    # Метод для получения pid процессов текущего пула. Процесс сообщает pid до первого задания,
+    # поэтому процесс, выполняющий задание, всегда есть в списке
+    def worker_pids(self):
+        pids = []
+        while not self.pid_queue.empty():
+            pids.append(self.pid_queue.get())
+        return pids
+
+    # Метод для запуска пула (вызывается при первом задании внутри цикла событий)
+    def start(self):
+        from font_embedding import register_font
+
+        register_font()  # До запуска рабочих процессов: они наследуют FONTCONFIG_FILE
+        self.queue = asyncio.PriorityQueue()
+        self.slots = asyncio.Condition()
+        self.executor = self.create_executor()
+        self.dispatchers = [asyncio.ensure_future(self.dispatch()) for _ in range(self.workers)]
+
+    async def shutdown(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    # Метод для постановки задания в очередь.
+    # Возвращает future с результатом и количество заданий пользователей впереди;
+    # если очередь заданий этого приоритета заполнена, выбрасывает asyncio.QueueFull.
+    # Отмена future снимает задание, которое ещё не передано в пул процессов
+    def submit(self, job, priority=INTERACTIVE):
+        if self.executor is None:
+            self.start()
+        if self.queued[priority] >= self.queue_size:
+            raise asyncio.QueueFull
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((priority, next(self.sequence), job, future))
+        self.queued[priority] += 1
+        position = max(0, self.queued[INTERACTIVE] - self.idle)
+        return future, position
+
+    # Метод для проверки, передано ли задание в пул процессов (или уже выполнено)
+    def started(self, future):
+        return future in self.running or future.done()
+
+    # Обработчик очереди: передаёт задания в пул процессов по одному
+    async def dispatch(self):
+        while True:
+            self.idle += 1
+            try:
+                priority, sequence, job, future = await self.queue.get()
+            finally:
+                self.idle -= 1
+            if future.cancelled():
+                self.queued[priority] -= 1
+                continue
+            if priority == BACKGROUND and self.background_running >= self.background_limit:
+                # Задание вернётся в очередь, когда завершится одно из выполняемых фоновых заданий
+                self.deferred.append((priority, sequence, job, future))
+                continue
+            self.queued[priority] -= 1
+            self.running.add(future)
+            if priority == BACKGROUND:
+                self.background_running += 1
+            try:
+                await self.execute(job, future)
+            finally:
+                self.running.discard(future)
+                if priority == BACKGROUND:
+                    self.background_running -= 1
+                    if self.deferred:
+                        self.queue.put_nowait(self.deferred.popleft())
+
+    # Метод для перезапуска пула после ошибки. Пул перезапускается один раз для всех прерванных заданий;
+    # если terminate, процессы старого пула завершаются (иначе зависший процесс занимал бы его до конца)
+    def restart(self, executor, terminate=False):
+        if executor is not self.executor:
+            return
+        if terminate:
+            pids = self.worker_pids()
+            self.terminated.add(executor)
+        executor.shutdown(wait=False)
+        if terminate:
+            for pid in pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass  # Процесс уже завершился
+        self.executor = self.create_executor()
+        self.restarts += 1
+
+    # Метод для ожидания места в пуле. Задание, повторяемое в одиночку, ждёт завершения остальных,
+    # а новые задания в это время не передаются в пул
+    async def acquire(self, isolated):
+        async with self.slots:
+            await self.slots.wait_for(lambda: not self.isolating)
+            if isolated:
+                self.isolating = True
+                await self.slots.wait_for(lambda: self.active == 0)
+            self.active += 1
+
+    async def release(self, isolated):
+        async with self.slots:
+            self.active -= 1
+            if isolated:
+                self.isolating = False
+            self.slots.notify_all()
+
+    def fail(self, future, error):
+        self.failed += 1
+        if not future.done():
+            future.set_exception(error)
+
+    # Метод для выполнения задания в пуле процессов с повтором после аварийного завершения процесса
+    async def execute(self, job, future):
+        loop = asyncio.get_running_loop()
+        attempts = 0
+        isolated = False
+        while True:
+            await self.acquire(isolated)
+            executor = self.executor
+            try:
+                result = await asyncio.wait_for(loop.run_in_executor(executor, self.target, job), self.timeout)
+            except asyncio.TimeoutError as error:
+                # Зависшее задание не повторяется: оно зависло бы и на новом пуле
+                self.timeouts += 1
+                self.restart(executor, terminate=True)
+                self.fail(future, error)
+                return
+            except BrokenProcessPool as error:
+                self.restart(executor)
+                if executor in self.terminated:
+                    continue  # Пул завершён из-за другого, зависшего задания
+                if isolated:
+                    # Задание выполнялось в пуле одно: процесс завершился из-за него
+                    attempts += 1
+                    if attempts == MAX_ATTEMPTS:
+                        self.fail(future, error)
+                        return
+            except Exception as error:
+                self.fail(future, error)
+                return
+            else:
+                stats = self.worker_stats.setdefault(result.pid, {"jobs": 0, "busy": 0.0})
+                stats["jobs"] += 1
+                stats["busy"] += result.elapsed
+                if not future.done():
+                    future.set_result(result)
+                return
+            finally:
+                await self.release(isolated)
+            # Прерванное задание повторяется в одиночку, чтобы узнать, не оно ли привело к ошибке
+            isolated = True
+
+    # Метод для получения статистики пула
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queued": self.queued[INTERACTIVE],
+            "background_queued": self.queued[BACKGROUND],
+            "busy": len(self.dispatchers) - self.idle if self.queue is not None else 0,
+            "restarts": self.restarts,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "per_worker": {
+                pid: {"jobs": stats["jobs"], "busy_seconds": stats["busy"],
+                      "jobs_per_second": stats["jobs"] / stats["busy"] if stats["busy"] else 0.0}
+                for pid, stats in self.worker_stats.items()
+            },
+        }
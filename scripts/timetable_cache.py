@@ -0,0 +1,194 @@
+import hashlib
+import io
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from build_svg import RENDERER_VERSION, align_to_weeks
+from parse_xls import PARSER_VERSION, load_timetable
+
+
+# Функция для вычисления адреса содержимого книги (SHA-256 от байтов файла)
+def workbook_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class LRUCache:
+    """
+    Кеш в памяти с вытеснением давно не использованных записей.
+    Ограничивается количеством записей и (необязательно) суммарным размером в байтах,
+    размер записи определяется функцией size.
+    """
+
+    def __init__(self, max_items=128, max_bytes=None, size=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size = size or (lambda value: 0)
+        self.items = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)  # Запись снова становится самой свежей
+            self.hits += 1
+            return self.items[key]
+
+    # Метод для проверки наличия записи без учёта в статистике и без изменения порядка вытеснения
+    def peek(self, key):
+        with self.lock:
+            return self.items.get(key)
+
+    def put(self, key, value):
+        value_size = self.size(value)
+        if self.max_bytes is not None and value_size > self.max_bytes:
+            return  # Запись больше всего бюджета кеша, не храним её
+        with self.lock:
+            if key in self.items:
+                self.total_bytes -= self.size(self.items.pop(key))
+            self.items[key] = value
+            self.total_bytes += value_size
+            # Вытесняем самые старые записи, пока не уложимся в ограничения
+            while len(self.items) > self.max_items or \
+                    (self.max_bytes is not None and self.total_bytes > self.max_bytes):
+                _, evicted = self.items.popitem(last=False)
+                self.total_bytes -= self.size(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        return {"items": len(self.items), "bytes": self.total_bytes, "hits": self.hits, "misses": self.misses}
+
+
+class DiskCache:
+    """
+    Кеш на диске: каждая запись хранится в отдельном файле в каталоге directory.
+    Порядок использования отслеживается по времени изменения файлов, при превышении
+    max_bytes удаляются самые давно использованные записи.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+            os.utime(path)  # Отмечаем запись как недавно использованную
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # Запись через временный файл, чтобы параллельные читатели не увидели неполный файл
+        with open(temp_path, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.evict()
+
+    # Метод для удаления самых старых записей при превышении размера каталога
+    def evict(self):
+        with self.lock:
+            entries = []
+            total_bytes = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith('.pickle'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Файл уже удалён другим процессом
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+            entries.sort()
+            for _, file_size, path in entries:
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total_bytes -= file_size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """
+    Двухуровневый кеш: сначала проверяется память, затем диск.
+    Запись, найденная на диске, поднимается в память.
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0  # Найдено в памяти или на диске
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def stats(self):
+        stats = {"hits": self.hits, "misses": self.misses, "memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+# Функция для получения разобранного расписания по содержимому книги с учётом кеша.
+# Ключ — SHA-256 содержимого книги, поэтому одинаковые файлы разных пользователей
+# разбираются один раз. Возвращает адрес содержимого и результат разбора.
+def load_cached_timetable(data, cache):
+    digest = workbook_digest(data)
+    key = f"{PARSER_VERSION}-{digest}"  # Смена версии разбора делает старые записи недоступными
+    timetable = cache.get(key)
+    if timetable is None:
+        timetable = load_timetable(io.BytesIO(data))
+        if timetable is not None:
+            cache.put(key, timetable)
+    return digest, timetable
+
+
+# Функция для формирования ключа готового PDF.
+# Отрисовка зависит только от выровненных по неделям дат, поэтому разные даты
+# внутри одних и тех же недель дают один и тот же ключ
+def rendered_key(digest, start_date, end_date, no_color):
+    start_date, end_date = align_to_weeks(start_date, end_date)
+    return f"{PARSER_VERSION}.{RENDERER_VERSION}-{digest}-{start_date:%Y%m%d}-{end_date:%Y%m%d}-{int(no_color)}"
@@ -1,3 +1,4 @@
+import argparse
 import datetime
 import os
 import sys
@@ -9,11 +10,13 @@ scripts_path = os.path.join(dir_path, '..', 'scripts')
 sys.path.append(scripts_path)
 
 # import cairosvg
-from build_svg import TableFormer, prepare_data
-from parse_xls import DocType, check_type, read_professor, read_student
+from batch import SUMMARY_NAME, run_batch
+from build_svg import SEM_END, SEM_START, TableFormer, align_to_weeks, prepare_data
+from conflicts import conflict_messages
+from parse_xls import load_timetable
 
 
-def main():
+def debug_single_file():
     """
     Локальный скрипт для отладки методов parse_xls и build_svg
     без запуска Telegram бота. Использует тот же функционал,
@@ -28,22 +31,16 @@ def main():
     end_date   = datetime.datetime(2026, 6, 5)
 
     try:
-        # Определяем тип файла (преподаватель / студент)
-        doc_type = check_type(file_name)
-        
-        if doc_type == DocType.PROFESSOR:
-            # Если это файл преподавателя
-            name, exercises, errors = read_professor(file_name)
-            label = name  # Подпись для будущей таблицы (ФИО)
-        elif doc_type == DocType.STUDENT:
-            # Если это файл студента
-            group, exercises, errors = read_student(file_name)
-            label = group  # Подпись для будущей таблицы (№ группы)
-        else:
+        # Открываем файл один раз: тип (преподаватель / студент) определяется при разборе
+        timetable = load_timetable(file_name)
+        if timetable is None:
             print("Невозможно определить тип документа (ни студент, ни преподаватель).")
             return
+        label = timetable.label  # Подпись для будущей таблицы (ФИО или № группы)
+        conflicts = timetable.conflicts
 
-        # Готовим данные для формирования расписания
+        # Готовим данные для формирования расписания: даты занятий разворачиваются только для нужных недель
+        exercises = timetable.occurrences(*align_to_weeks(start_date, end_date))
         exercises, weekday_time_spans = prepare_data(exercises, start_date, end_date)
 
         # Рисуем SVG-таблицу расписания
@@ -66,11 +63,11 @@ def main():
         # cairosvg.svg2pdf(url=svg_filename, write_to=pdf_filename)
         print(f"✔ Расписание сохранено в файлах: {svg_filename}, {pdf_filename}")
 
-        # Если при разборе файла найдены ошибки (например, пересечения занятий)
-        if errors and len(errors) > 0:
+        # Если при разборе файла найдены наложения занятий
+        if conflicts:
             print("При обработке файла возникли замечания:")
-            for err in errors:
-                print(" -", err)
+            for text in conflict_messages(conflicts, timetable.doc_type):
+                print(text, end="")
         else:
             print("Ошибок при разборе файла не обнаружено.")
 
@@ -79,5 +76,45 @@ def main():
         print(e)
         print(traceback.format_exc())
 
+
+# Функция для разбора даты вида ДД.ММ (год берётся из начала семестра)
+def parse_date(text):
+    return datetime.datetime.strptime(f"{SEM_START.year}.{text}", "%Y.%d.%m")
+
+
+def main():
+    """
+    Без аргументов - отладка на data/example.xlsx.
+    С путями к книгам - пакетное формирование PDF, например:
+    python src/main.py "timetables/**/*.xlsx" -o output --start 09.02 --end 05.06 -j 8
+    """
+    parser = argparse.ArgumentParser(description="Пакетное формирование расписаний в PDF")
+    parser.add_argument("inputs", nargs="*", help="книги xlsx, каталоги или шаблоны (поддерживается **)")
+    parser.add_argument("-o", "--output", default="output", help="каталог для PDF и сводки")
+    parser.add_argument("--start", type=parse_date, default=SEM_START, help="начало диапазона, ДД.ММ")
+    parser.add_argument("--end", type=parse_date, default=SEM_END, help="конец диапазона, ДД.ММ")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="количество процессов (по умолчанию - по числу ядер)")
+    parser.add_argument("--no-color", action="store_true", help="расписание без цветной заливки")
+    parser.add_argument("--backend", choices=["svg", "svg-compact", "pdf"], default="svg", help="способ отрисовки")
+    parser.add_argument("--force", action="store_true", help="обработать и неизменившиеся книги")
+    args = parser.parse_args()
+
+    if not args.inputs:
+        debug_single_file()
+        return
+
+    summary = run_batch(args.inputs, args.output, args.start, args.end, no_color=args.no_color,
+                        workers=args.workers, backend_name=args.backend, force=args.force)
+    print(f"Готово: {summary['processed']} сформировано, {summary['skipped']} без изменений, "
+          f"{summary['failed']} с ошибками за {summary['elapsed']:.1f} с "
+          f"({summary['files_per_second']:.1f} файлов/с)")
+    print("Время этапов: " + ", ".join(f"{stage} {elapsed:.1f} с" for stage, elapsed in summary["stages"].items()))
+    for failure in summary["failures"]:
+        print(f"  {failure['file']}: {failure['error']}")
+    print(f"Сводка: {os.path.join(args.output, SUMMARY_NAME)}")
+    if summary["failed"]:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
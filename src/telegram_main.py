@@ -8,21 +8,28 @@ dir_path = os.path.dirname(os.path.realpath(__file__))
 scripts_path = os.path.join(dir_path, '..', 'scripts')
 sys.path.append(scripts_path)
 
+import asyncio
 import datetime  # Импорт модуля datetime для работы с датами
+import io
 import traceback
+from itertools import islice
 
-import cairosvg  # Импорт модуля для конвертации SVG в PDF
-from build_svg import (  # Импорт функций для подготовки данных и формирования SVG таблицы
-    TableFormer, prepare_data)
+from conflicts import conflict_messages
 from dotenv import load_dotenv
-from parse_xls import (  # Импорт функции для чтения данных из xlsx файла
-    DocType, check_type, read_professor, read_student)
+from metrics import (  # Импорт метрик для /stats и /metrics
+    Metrics, MetricsServer, format_prometheus, format_stages, hit_rate,
+    process_rss_bytes, prometheus_metric)
+from parse_xls import DocType
+from render_pool import (  # Импорт пула процессов для разбора и отрисовки расписаний
+    BACKGROUND, RenderJob, RenderPool, TimetableParseError)
+from timetable_cache import (  # Импорт кеша готовых PDF
+    LRUCache, rendered_key, workbook_digest)
 from telegram import \
     Update  # Импорт класса Update для обработки обновлений в Telegram
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (  # Импорт необходимых классов для работы бота
-    CallbackContext, CallbackQueryHandler, CommandHandler, Filters,
-    MessageHandler, Updater)
+    Application, ApplicationBuilder, CallbackQueryHandler, CommandHandler,
+    ContextTypes, MessageHandler, filters)
 
 # Загрузка переменных окружения из файла .env
 load_dotenv()
@@ -31,262 +38,423 @@ load_dotenv()
 ADMIN_ID = os.getenv('ADMIN_ID')
 MODERATOR_ID = int(os.getenv('MODERATOR_ID'))
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
+# Адрес Bot API (например, локального сервера); по умолчанию используется api.telegram.org
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+# Количество рабочих процессов для разбора и отрисовки расписаний
+RENDER_CONCURRENCY = int(os.getenv('RENDER_CONCURRENCY', '2'))
+# Количество заданий, которые могут ждать свободного процесса
+RENDER_QUEUE_SIZE = int(os.getenv('RENDER_QUEUE_SIZE', '32'))
+# Время отрисовки одного расписания, после которого процесс считается зависшим и перезапускается, с
+RENDER_TIMEOUT = float(os.getenv('RENDER_TIMEOUT', '60'))
+# Адрес HTTP сервера с метриками в формате Prometheus (GET /metrics); пустой METRICS_PORT отключает сервер
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('METRICS_PORT', '9108')
+# Фоновая отрисовка всех диапазонов клавиатуры сразу после получения файла; SPECULATIVE_RENDER=0 отключает её
+SPECULATIVE_RENDER = os.getenv('SPECULATIVE_RENDER', '1') != '0'
+# Сколько сообщений с наложениями занятий отправляется пользователю, остальные только подсчитываются
+MAX_CONFLICT_MESSAGES = 3
 
-def notify_admin(context: CallbackContext, text: str) -> None:
+# Кеш готовых PDF по (содержимое файла, диапазон недель, цветность) с ограничением по объёму
+pdf_cache = LRUCache(max_items=4096, max_bytes=int(os.getenv('PDF_CACHE_MB', '128')) * 1024 * 1024,
+                     size=lambda result: len(result.pdf) + 512 * len(result.conflicts))  # ~512 байт на наложение
+
+# Пул процессов для разбора и отрисовки: тяжёлые вычисления выполняются вне процесса бота,
+# поэтому долгая отрисовка одного пользователя не задерживает ответы остальным.
+# Разобранные книги кешируются в каждом процессе и в общем каталоге на диске
+render_pool = RenderPool(RENDER_CONCURRENCY, RENDER_QUEUE_SIZE, initargs=(
+    CACHE_DIR,
+    int(os.getenv('PARSED_CACHE_ITEMS', '64')),
+    int(os.getenv('PARSED_CACHE_DISK_MB', '64')) * 1024 * 1024,
+), timeout=RENDER_TIMEOUT)
+
+# Длительности этапов обработки запросов и счётчики событий для /stats и /metrics
+metrics = Metrics()
+# Сервер метрик создаётся при запуске бота, если задан METRICS_PORT
+metrics_server = None
+
+# Встроенная клавиатура с предустановленными диапазонами дат
+RANGE_KEYBOARD = [
+    [InlineKeyboardButton("Весь семестр", callback_data='all')],
+    [InlineKeyboardButton("С текущей даты до конца семестра", callback_data='now')],
+    [InlineKeyboardButton("Две недели с текущей даты", callback_data='short')],
+    [InlineKeyboardButton("Первая половина семестра", callback_data='first_half')],
+    [InlineKeyboardButton("Вторая половина семестра", callback_data='second_half')]
+]
+# Диапазоны клавиатуры в порядке фоновой отрисовки
+RANGE_PRESETS = [row[0].callback_data for row in RANGE_KEYBOARD]
+
+
+class Speculation:
+    """
+    Фоновая отрисовка диапазонов клавиатуры для последнего присланного пользователем файла.
+    Хранится в данных пользователя до следующей загрузки.
+    """
+
+    def __init__(self):
+        self.task = None
+        self.in_flight = {}  # Ключ PDF -> future задания пула, которое ещё не завершилось
+        self.rendered = set()  # Ключи PDF, отрисованных заранее и ещё не отправленных пользователю
+
+
+async def notify_admin(context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
     # Функция для отправки уведомлений администратору
-    context.bot.send_message(chat_id=ADMIN_ID, text=text)
+    await context.bot.send_message(chat_id=ADMIN_ID, text=text)
 
-def start(update: Update, context: CallbackContext) -> None:
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     # Обработчик команды /start для бота, отправляет приветственное сообщение
-    update.message.reply_text("Отправьте мне файл и диапазон дат для обработки!")
+    await update.message.reply_text("Отправьте мне файл и диапазон дат для обработки!")
 
-def handle_document(update: Update, context: CallbackContext) -> None:
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     # Обработчик получения документа от пользователя
     user_id = update.message.from_user.id
     user_name = update.message.from_user.first_name
-    file = update.message.document.get_file()
-    # Скачиваем присланный файл и сохраняем его
-    file.download(f'recieved_timetable_{user_id}.xlsx')
+    with metrics.span("download"):
+        file = await update.message.document.get_file()
+        # Скачиваем присланный файл в память: он хранится в данных пользователя до следующей загрузки
+        context.user_data['timetable'] = bytes(await file.download_as_bytearray())
+    metrics.increment("downloaded_bytes", len(context.user_data['timetable']))
+    # Пока пользователь выбирает диапазон, расписания для кнопок клавиатуры отрисовываются в фоне
+    cancel_speculation(context.user_data.pop('speculation', None))
+    if SPECULATIVE_RENDER:
+        speculation = context.user_data['speculation'] = Speculation()
+        speculation.task = asyncio.ensure_future(
+            speculate(context.user_data['timetable'], user_id == MODERATOR_ID, speculation))
     # Запрашиваем у пользователя диапазон дат
-    keyboard = [
-        [InlineKeyboardButton("Весь семестр", callback_data='all')],
-        [InlineKeyboardButton("С текущей даты до конца семестра", callback_data='now')],
-        [InlineKeyboardButton("Две недели с текущей даты", callback_data='short')],
-        [InlineKeyboardButton("Первая половина семестра", callback_data='first_half')],
-        [InlineKeyboardButton("Вторая половина семестра", callback_data='second_half')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    update.message.reply_text("Файл получен! Теперь отправьте мне диапазон дат в формате 'ДД.ММ-ДД.ММ'. Или воспользуйтесь встроенной клавиатурой.", reply_markup=reply_markup)
+    reply_markup = InlineKeyboardMarkup(RANGE_KEYBOARD)
+    await update.message.reply_text("Файл получен! Теперь отправьте мне диапазон дат в формате 'ДД.ММ-ДД.ММ'. Или воспользуйтесь встроенной клавиатурой.", reply_markup=reply_markup)
     # Уведомляем админа о получении файла
-    notify_admin(context, f"Пользователь {user_name} (ID: {user_id}) отправил файл.")
-
-def handle_text(update: Update, context: CallbackContext) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Весь семестр", callback_data='all')],
-        [InlineKeyboardButton("С текущей даты до конца семестра", callback_data='now')],
-        [InlineKeyboardButton("Две недели с текущей даты", callback_data='short')],
-        [InlineKeyboardButton("Первая половина семестра", callback_data='first_half')],
-        [InlineKeyboardButton("Вторая половина семестра", callback_data='second_half')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    # Обработчик текстовых сообщений от пользователя, в основном для дат
-    text = update.message.text
-    user_id = update.message.from_user.id
-    user_name = update.message.from_user.first_name
-    try:
-        # Преобразуем текст в диапазон дат
-        current_year = datetime.datetime.now().year
-        start_date, end_date = [
-            datetime.datetime.strptime(f"{current_year}.{date.strip()}", "%Y.%d.%m") for date in text.split('-')
-        ]
-    except:
-        # Если не удалось преобразовать текст в диапазон дат, отправляем сообщение об ошибке
-        update.message.reply_text("Ошибка в формате даты! Пожалуйста, используйте формат 'ДД.ММ-ДД.ММ'.")
+    await notify_admin(context, f"Пользователь {user_name} (ID: {user_id}) отправил файл.")
+
+def record_render_stages(result, render_elapsed=None):
+    # Учёт времени этапов, измеренного в рабочем процессе, и попаданий в его кеши.
+    # Ожидание в очереди - это время ответа пула за вычетом работы процесса (только для запросов пользователей)
+    for stage, seconds in result.stages.items():
+        metrics.observe(stage, seconds)
+    if render_elapsed is not None:
+        metrics.observe("queue_wait", max(0.0, render_elapsed - result.elapsed))
+    for name, value in result.counters.items():
+        metrics.increment(name, value)
+
+async def speculate(data: bytes, no_color: bool, speculation: Speculation) -> None:
+    # Фоновая отрисовка диапазонов клавиатуры в кеш готовых PDF.
+    # Задания ставятся по одному с низким приоритетом: запросы пользователей их опережают,
+    # а книга разбирается только первым заданием, следующие берут её из кеша разбора
+    digest = workbook_digest(data)
+    for preset in RANGE_PRESETS:
+        start_date, end_date = parse_date_range(preset_range_text(preset))
+        key = rendered_key(digest, start_date, end_date, no_color)
+        if pdf_cache.peek(key) is not None:
+            continue
+        if render_pool.stats()["queued"]:
+            return  # Запросы пользователей ждут в очереди: процессы нужны им
+        try:
+            future, _ = render_pool.submit(RenderJob(data, start_date, end_date, no_color), BACKGROUND)
+        except asyncio.QueueFull:
+            return
+        speculation.in_flight[key] = future
+        try:
+            # Отмена этой задачи не должна отменять future: его может ждать запрос пользователя
+            await asyncio.wait((future,))
+        except asyncio.CancelledError:
+            if not render_pool.started(future):
+                future.cancel()  # Задание ещё в очереди - процесс его не возьмёт
+            else:
+                future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            raise
+        # Если ключа уже нет, этот PDF ждёт запрос пользователя, и он учтён как использованный
+        joined = speculation.in_flight.pop(key, None) is None
+        if future.cancelled():
+            continue  # Пользователь запросил этот диапазон раньше, чем до задания дошла очередь
+        if future.exception() is not None:
+            return  # Ошибку разбора пользователь увидит, когда запросит расписание
+        result = future.result()
+        metrics.increment("speculative_renders")
+        record_render_stages(result)
+        pdf_cache.put(key, result)
+        if not joined:
+            speculation.rendered.add(key)
+
+def cancel_speculation(speculation) -> None:
+    # Отмена фоновой отрисовки для прежнего файла: неотправленные PDF считаются отрисованными напрасно
+    if speculation is None:
+        return
+    if not speculation.task.done():
+        speculation.task.cancel()
+        metrics.increment("speculative_cancelled")
+    metrics.increment("speculative_wasted", len(speculation.rendered))
+
+async def use_speculative_render(speculation: Speculation, key: str):
+    # Результат фоновой отрисовки для запроса пользователя: готовый PDF из кеша
+    # или ожидание задания, которое уже выполняется. Возвращает None, если его нет
+    result = pdf_cache.get(key)
+    if result is not None:
+        if key in speculation.rendered:
+            speculation.rendered.discard(key)
+            metrics.increment("speculative_used")
+        return result
+    future = speculation.in_flight.pop(key, None)
+    if future is None:
+        return None
+    if not render_pool.started(future):
+        # Фоновое задание ещё в очереди: снимаем его и отрисовываем с обычным приоритетом
+        future.cancel()
+        return None
+    metrics.increment("speculative_used")
+    with metrics.span("render"):
+        result = await asyncio.shield(future)
+    pdf_cache.put(key, result)
+    return result
+
+@metrics.timed("request")
+async def send_timetable(context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_id: int, user_name: str,
+                         start_date: datetime.datetime, end_date: datetime.datetime) -> None:
+    # Формирует расписание из присланного файла за указанный диапазон дат и отправляет его в чат
+    reply_markup = InlineKeyboardMarkup(RANGE_KEYBOARD)
+    no_color = False
+    if user_id==MODERATOR_ID:
+        no_color = True
+    data = context.user_data.get('timetable')
+    if data is None:
+        # Файл ещё не присылали (или бот был перезапущен после загрузки)
+        await context.bot.send_message(chat_id=chat_id, text="Сначала отправьте мне файл расписания в формате .xlsx.")
+        return
     try:
-        # Читаем данные из файла и подготавливаем их
-        # Проверить тип документа, студент или преподаватель и в зависимости от этого по разному разбирать
-        type = check_type(f'recieved_timetable_{user_id}.xlsx')
-        if type == DocType.PROFESSOR:
-            name, exercises, errors = read_professor(f'recieved_timetable_{user_id}.xlsx')
-            exercises, weekday_time_spans = prepare_data(exercises, start_date, end_date)
+        # Такой же запрос уже формировался (этим или другим пользователем) - отправляем готовый PDF
+        key = rendered_key(workbook_digest(data), start_date, end_date, no_color)
+        speculation = context.user_data.get('speculation')
+        if speculation is not None:
+            result = await use_speculative_render(speculation, key)
+        else:
+            result = pdf_cache.get(key)
+        if result is None:
             try:
-                # Создаём расписание в виде SVG и конвертируем его в PDF
-                no_color = False
-                if user_id==MODERATOR_ID:
-                    no_color = True
-                svg_table_former = TableFormer(name, start_date, end_date, exercises, weekday_time_spans, f"timetable_{user_id}.svg", no_color)
-                svg_table_former.draw_timetable()
-                svg_table_former.save()
-                cairosvg.svg2pdf(url=f"timetable_{user_id}.svg", write_to=f"timetable_{user_id}.pdf")
-                processed_file_path = f"timetable_{user_id}.pdf"
-                # Отправляем сформированный PDF пользователю
-                update.message.reply_document(open(processed_file_path, 'rb'))
-                if len(errors) > 0:
-                    # Если в процессе обработки возникли ошибки, сообщаем об этом пользователю
-                    update.message.reply_text("Ваше расписание готово!\nОбратите внимание что в изначальном расписании есть наложения:")
-                    if len(errors) < 4096:
-                        update.message.reply_text(errors, reply_markup=reply_markup)
-                    else:
-                        update.message.reply_text(errors[0:4000]+'...', reply_markup=reply_markup)
-                else:
-                    # Если ошибок нет, сообщаем, что расписание готово
-                    update.message.reply_text("Ваше расписание готово!", reply_markup=reply_markup)
-                # Уведомляем админа о завершении формирования расписания
-                notify_admin(context, f"Пользователь {user_name} сформировал расписание для {name}.")
-            except:
-                # В случае неизвестной ошибки сообщаем пользователю обратиться к разработчику
-                update.message.reply_text("Неизвестная ошибка при формировании расписания. Обратитесь к разработчику.")
-        if type == DocType.STUDENT:
-            group, exercises, errors = read_student(f'recieved_timetable_{user_id}.xlsx')
-            exercises, weekday_time_spans = prepare_data(exercises, start_date, end_date)
-            try:
-                # Создаём расписание в виде SVG и конвертируем его в PDF
-                no_color = False
-                if user_id==MODERATOR_ID:
-                    no_color = True
-                svg_table_former = TableFormer(group, start_date, end_date, exercises, weekday_time_spans, f"timetable_{user_id}.svg", no_color)
-                svg_table_former.draw_timetable()
-                svg_table_former.save()
-                cairosvg.svg2pdf(url=f"timetable_{user_id}.svg", write_to=f"timetable_{user_id}.pdf")
-                processed_file_path = f"timetable_{user_id}.pdf"
-                # Отправляем сформированный PDF пользователю
-                update.message.reply_document(open(processed_file_path, 'rb'))
-                if len(errors) > 0:
-                    # Если в процессе обработки возникли ошибки, сообщаем об этом пользователю
-                    update.message.reply_text("Ваше расписание готово!\nОбратите внимание что в изначальном расписании есть наложения:")
-                    if len(errors) < 4096:
-                        update.message.reply_text(errors, reply_markup=reply_markup)
-                    else:
-                        update.message.reply_text(errors[0:4000]+'...', reply_markup=reply_markup)
-                else:
-                    # Если ошибок нет, сообщаем, что расписание готово
-                    update.message.reply_text("Ваше расписание готово!", reply_markup=reply_markup)
-                # Уведомляем админа о завершении формирования расписания
-                notify_admin(context, f"Пользователь {user_name} сформировал расписание для группы {group}.")
-            except Exception as e:
-                error_traceback = traceback.format_exc()
-                print(error_traceback)
-                # В случае неизвестной ошибки сообщаем пользователю обратиться к разработчику
-                update.message.reply_text("Неизвестная ошибка при формировании расписания. Обратитесь к разработчику.")
-    except Exception as e:
+                # Разбор и отрисовка выполняются в пуле процессов
+                future, position = render_pool.submit(RenderJob(data, start_date, end_date, no_color))
+            except asyncio.QueueFull:
+                # Очередь заполнена: сразу сообщаем об этом, а не заставляем пользователя ждать
+                metrics.increment("queue_full")
+                await context.bot.send_message(chat_id=chat_id, text="Сейчас формируется слишком много расписаний. Попробуйте через минуту.", reply_markup=reply_markup)
+                return
+            if position > 0:
+                await context.bot.send_message(chat_id=chat_id, text=f"Запрос поставлен в очередь, позиция {position}. Расписание придёт автоматически.")
+            with metrics.span("render") as render_span:
+                result = await future
+            record_render_stages(result, render_span.elapsed)
+            pdf_cache.put(key, result)
+    except (OSError, TimetableParseError) as e:
+        metrics.increment("parse_errors")
         error_traceback = traceback.format_exc()
         print(error_traceback)
         # В случае ошибки при чтении файла отправляем сообщение пользователю
-        update.message.reply_text("Возникла ошибка при разборе файла, проверьте ваш файл и загрузите его снова или обратитесь к разработчику.")
-
-def auto_range(update: Update, context: CallbackContext) -> None:
-    keyboard = [
-        [InlineKeyboardButton("Весь семестр", callback_data='all')],
-        [InlineKeyboardButton("С текущей даты до конца семестра", callback_data='now')],
-        [InlineKeyboardButton("Две недели с текущей даты", callback_data='short')],
-        [InlineKeyboardButton("Первая половина семестра", callback_data='first_half')],
-        [InlineKeyboardButton("Вторая половина семестра", callback_data='second_half')]
+        await context.bot.send_message(chat_id=chat_id, text="Возникла ошибка при разборе файла, проверьте ваш файл и загрузите его снова или обратитесь к разработчику.")
+        return
+    except Exception as e:
+        metrics.increment("render_errors")
+        error_traceback = traceback.format_exc()
+        print(error_traceback)
+        # В случае неизвестной ошибки сообщаем пользователю обратиться к разработчику
+        await context.bot.send_message(chat_id=chat_id, text="Неизвестная ошибка при формировании расписания. Обратитесь к разработчику.")
+        return
+
+    conflicts = result.conflicts
+    # Отправляем сформированный PDF пользователю
+    with metrics.span("upload"):
+        await context.bot.send_document(chat_id=chat_id, document=io.BytesIO(result.pdf), filename=f"timetable_{user_id}.pdf")
+    metrics.increment("uploaded_bytes", len(result.pdf))
+    if len(conflicts) > 0:
+        # Если в расписании есть наложения занятий, сообщаем об этом пользователю
+        await context.bot.send_message(chat_id=chat_id, text="Ваше расписание готово!\nОбратите внимание что в изначальном расписании есть наложения:")
+        # Текст формируется только для отправляемых сообщений
+        messages = list(islice(conflict_messages(conflicts, result.doc_type), MAX_CONFLICT_MESSAGES + 1))
+        if len(messages) > MAX_CONFLICT_MESSAGES:
+            messages = messages[:MAX_CONFLICT_MESSAGES] + [f"... и другие наложения, всего {len(conflicts)}."]
+        for index, text in enumerate(messages):
+            # Клавиатура прикрепляется к последнему сообщению
+            markup = reply_markup if index == len(messages) - 1 else None
+            await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=markup)
+    else:
+        # Если ошибок нет, сообщаем, что расписание готово
+        await context.bot.send_message(chat_id=chat_id, text="Ваше расписание готово!", reply_markup=reply_markup)
+    # Уведомляем админа о завершении формирования расписания
+    if result.doc_type == DocType.PROFESSOR:
+        await notify_admin(context, f"Пользователь {user_name} сформировал расписание для {result.label}.")
+    else:
+        await notify_admin(context, f"Пользователь {user_name} сформировал расписание для группы {result.label}.")
+
+def parse_date_range(text: str):
+    # Преобразование текста 'ДД.ММ-ДД.ММ' в даты начала и конца текущего года
+    current_year = datetime.datetime.now().year
+    start_date, end_date = [
+        datetime.datetime.strptime(f"{current_year}.{date.strip()}", "%Y.%d.%m") for date in text.split('-')
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    query = update.callback_query
-    query.answer()
-    user_id = query.message.chat_id
-    # Обрабатываем ответы на кнопки
-    if query.data == 'all':
+    return start_date, end_date
+
+def preset_range_text(preset: str) -> str:
+    # Диапазон дат кнопки клавиатуры в формате 'ДД.ММ-ДД.ММ'
+    if preset == 'all':
         text="09.02-05.06"
-    elif query.data == 'now':
+    elif preset == 'now':
         current_date = datetime.datetime.now()
         formatted_date = current_date.strftime('%d.%m')
         text=f"{formatted_date}-05.06"
-    elif query.data == 'short':
+    elif preset == 'short':
         current_date = datetime.datetime.now()
         end_date = current_date + datetime.timedelta(days=14)
         formatted_current_date = current_date.strftime('%d.%m')
         formatted_end_date = end_date.strftime('%d.%m')
         text = f"{formatted_current_date}-{formatted_end_date}"
-    elif query.data == 'first_half':
+    elif preset == 'first_half':
         text="09.02-30.03"
-    elif query.data == 'second_half':
+    elif preset == 'second_half':
         text="30.03-05.06"
-    user_name = query.from_user.first_name
+    else:
+        text = None
+    return text
+
+async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # Обработчик текстовых сообщений от пользователя, в основном для дат
+    text = update.message.text
+    user_id = update.message.from_user.id
+    user_name = update.message.from_user.first_name
     try:
         # Преобразуем текст в диапазон дат
-        current_year = datetime.datetime.now().year
-        start_date, end_date = [
-            datetime.datetime.strptime(f"{current_year}.{date.strip()}", "%Y.%d.%m") for date in text.split('-')
-        ]
+        start_date, end_date = parse_date_range(text)
     except:
         # Если не удалось преобразовать текст в диапазон дат, отправляем сообщение об ошибке
-        context.bot.send_message(chat_id=user_id, text="Ошибка в формате даты! Пожалуйста, используйте формат 'ДД.ММ-ДД.ММ'.")
+        await update.message.reply_text("Ошибка в формате даты! Пожалуйста, используйте формат 'ДД.ММ-ДД.ММ'.")
+        return
+    await send_timetable(context, update.message.chat_id, user_id, user_name, start_date, end_date)
+
+async def auto_range(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    user_id = query.message.chat_id
+    # Обрабатываем ответы на кнопки
+    text = preset_range_text(query.data)
+    user_name = query.from_user.first_name
     try:
-        # Читаем данные из файла и подготавливаем их
-        # Проверить тип документа, студент или преподаватель и в зависимости от этого по разному разбирать
-        type = check_type(f'recieved_timetable_{user_id}.xlsx')
-        if type == DocType.PROFESSOR:
-            name, exercises, errors = read_professor(f'recieved_timetable_{user_id}.xlsx')
-            exercises, weekday_time_spans = prepare_data(exercises, start_date, end_date)
-            try:
-                # Создаём расписание в виде SVG и конвертируем его в PDF
-                no_color = False
-                if user_id==MODERATOR_ID:
-                    no_color = True
-                svg_table_former = TableFormer(name, start_date, end_date, exercises, weekday_time_spans, f"timetable_{user_id}.svg", no_color)
-                svg_table_former.draw_timetable()
-                svg_table_former.save()
-                cairosvg.svg2pdf(url=f"timetable_{user_id}.svg", write_to=f"timetable_{user_id}.pdf")
-                processed_file_path = f"timetable_{user_id}.pdf"
-                # Отправляем сформированный PDF пользователю
-                context.bot.send_document(chat_id=user_id, document=open(processed_file_path, 'rb'))
-                if len(errors) > 0:
-                    # Если в процессе обработки возникли ошибки, сообщаем об этом пользователю
-                    context.bot.send_message(chat_id=user_id, text="Ваше расписание готово!\nОбратите внимание что в изначальном расписании есть наложения:")
-                    if len(errors) < 4096:
-                        context.bot.send_message(chat_id=user_id, text=errors, reply_markup=reply_markup)
-                    else:
-                        context.bot.send_message(chat_id=user_id, text=errors[0:4000]+'...', reply_markup=reply_markup)
-                else:
-                    # Если ошибок нет, сообщаем, что расписание готово
-                    context.bot.send_message(chat_id=user_id, text="Ваше расписание готово!", reply_markup=reply_markup)
-                # Уведомляем админа о завершении формирования расписания
-                notify_admin(context, f"Пользователь {user_name} сформировал расписание для {name}.")
-            except:
-                error_traceback = traceback.format_exc()
-                print(error_traceback)
-                # В случае неизвестной ошибки сообщаем пользователю обратиться к разработчику
-                context.bot.send_message(chat_id=user_id, text="Неизвестная ошибка при формировании расписания. Обратитесь к разработчику.")
-        if type == DocType.STUDENT:
-            group, exercises, errors = read_student(f'recieved_timetable_{user_id}.xlsx')
-            exercises, weekday_time_spans = prepare_data(exercises, start_date, end_date)
-            try:
-                # Создаём расписание в виде SVG и конвертируем его в PDF
-                no_color = False
-                if user_id==MODERATOR_ID:
-                    no_color = True
-                svg_table_former = TableFormer(group, start_date, end_date, exercises, weekday_time_spans, f"timetable_{user_id}.svg", no_color)
-                svg_table_former.draw_timetable()
-                svg_table_former.save()
-                cairosvg.svg2pdf(url=f"timetable_{user_id}.svg", write_to=f"timetable_{user_id}.pdf")
-                processed_file_path = f"timetable_{user_id}.pdf"
-                # Отправляем сформированный PDF пользователю
-                context.bot.send_document(chat_id=user_id, document=open(processed_file_path, 'rb'))
-                if len(errors) > 0:
-                    # Если в процессе обработки возникли ошибки, сообщаем об этом пользователю
-                    context.bot.send_message(chat_id=user_id, text="Ваше расписание готово!\nОбратите внимание что в изначальном расписании есть наложения:")
-                    if len(errors) < 4096:
-                        context.bot.send_message(chat_id=user_id, text=errors, reply_markup=reply_markup)
-                    else:
-                        context.bot.send_message(chat_id=user_id, text=errors[0:4000]+'...', reply_markup=reply_markup)
-                else:
-                    # Если ошибок нет, сообщаем, что расписание готово
-                    context.bot.send_message(chat_id=user_id, text="Ваше расписание готово!", reply_markup=reply_markup)
-                # Уведомляем админа о завершении формирования расписания
-                notify_admin(context, f"Пользователь {user_name} сформировал расписание для группы {group}.")
-            except Exception as e:
-                error_traceback = traceback.format_exc()
-                print(error_traceback)
-                # В случае неизвестной ошибки сообщаем пользователю обратиться к разработчику
-                context.bot.send_message(chat_id=user_id, text="Неизвестная ошибка при формировании расписания. Обратитесь к разработчику.")
-    except Exception as e:
-        error_traceback = traceback.format_exc()
-        print(error_traceback)
-        # В случае ошибки при чтении файла отправляем сообщение пользователю
-        context.bot.send_message(chat_id=user_id, text="Возникла ошибка при разборе файла, проверьте ваш файл и загрузите его снова или обратитесь к разработчику.")
+        # Преобразуем текст в диапазон дат
+        start_date, end_date = parse_date_range(text)
+    except:
+        # Если не удалось преобразовать текст в диапазон дат, отправляем сообщение об ошибке
+        await context.bot.send_message(chat_id=user_id, text="Ошибка в формате даты! Пожалуйста, используйте формат 'ДД.ММ-ДД.ММ'.")
+        return
+    await send_timetable(context, user_id, user_id, user_name, start_date, end_date)
+
+def stats_snapshot():
+    # Сводка метрик бота: этапы, счётчики, кеш готовых PDF и пул процессов
+    snapshot = metrics.snapshot()
+    snapshot["pdf_cache"] = pdf_cache.stats()
+    snapshot["render_pool"] = render_pool.stats()
+    return snapshot
+
+def format_stats(snapshot):
+    # Описание сводки метрик для администратора
+    counters = snapshot["counters"]
+    requests = snapshot["stages"].get("request", {}).get("count", 0)
+    pdf_cache_stats = snapshot["pdf_cache"]
+    pool = snapshot["render_pool"]
+    lines = [
+        f"Запросов: {requests}, ошибок разбора: {counters.get('parse_errors', 0)}, "
+        f"ошибок отрисовки: {counters.get('render_errors', 0)}, очередь заполнена: {counters.get('queue_full', 0)}",
+        format_stages(snapshot),
+        f"Кеш PDF: {hit_rate(pdf_cache_stats['hits'], pdf_cache_stats['misses']):.0%} попаданий, "
+        f"{pdf_cache_stats['items']} записей, {pdf_cache_stats['bytes'] / 1024 / 1024:.1f} МБ",
+        f"Кеш разбора: {hit_rate(counters.get('parsed_cache_hits', 0), counters.get('parsed_cache_misses', 0)):.0%} попаданий",
+        f"Кеш раскладки текста: {hit_rate(counters.get('layout_cache_hits', 0), counters.get('layout_cache_misses', 0)):.0%} попаданий",
+        f"Пул: процессов {pool['workers']}, занято {pool['busy']}, в очереди {pool['queued']} "
+        f"(фоновых {pool['background_queued']}), перезапусков {pool['restarts']}, ошибок {pool['failed']} "
+        f"(зависаний {pool['timeouts']})",
+        f"Фоновая отрисовка: {counters.get('speculative_renders', 0)} PDF, использовано "
+        f"{counters.get('speculative_used', 0)}, напрасно {counters.get('speculative_wasted', 0)}, "
+        f"отменено {counters.get('speculative_cancelled', 0)}",
+    ]
+    return "\n".join(lines)
+
+def prometheus_lines():
+    # Метрики бота в формате Prometheus: этапы и счётчики, пул процессов, кеш PDF и память процесса
+    snapshot = stats_snapshot()
+    pool = snapshot["render_pool"]
+    pdf_cache_stats = snapshot["pdf_cache"]
+    lines = format_prometheus(snapshot, "timetable_bot")
+    lines += prometheus_metric("timetable_bot_render_queue_depth", "gauge", "Заданий в очереди пула",
+                               ((None, pool["queued"]),))
+    lines += prometheus_metric("timetable_bot_render_background_queue_depth", "gauge", "Фоновых заданий в очереди пула",
+                               ((None, pool["background_queued"]),))
+    lines += prometheus_metric("timetable_bot_render_workers", "gauge", "Рабочих процессов в пуле",
+                               ((None, pool["workers"]),))
+    lines += prometheus_metric("timetable_bot_render_workers_busy", "gauge", "Процессов, выполняющих задание",
+                               ((None, pool["busy"]),))
+    lines += prometheus_metric("timetable_bot_render_worker_utilization", "gauge", "Доля занятых процессов",
+                               ((None, pool["busy"] / pool["workers"] if pool["workers"] else 0.0),))
+    lines += prometheus_metric("timetable_bot_render_worker_busy_seconds_total", "counter",
+                               "Время работы процесса над заданиями",
+                               (({"pid": pid}, worker["busy_seconds"]) for pid, worker in pool["per_worker"].items()))
+    lines += prometheus_metric("timetable_bot_render_worker_jobs_total", "counter", "Заданий, выполненных процессом",
+                               (({"pid": pid}, worker["jobs"]) for pid, worker in pool["per_worker"].items()))
+    lines += prometheus_metric("timetable_bot_render_pool_restarts_total", "counter", "Перезапусков пула",
+                               ((None, pool["restarts"]),))
+    lines += prometheus_metric("timetable_bot_render_failed_total", "counter", "Заданий, завершившихся ошибкой",
+                               ((None, pool["failed"]),))
+    lines += prometheus_metric("timetable_bot_render_timeouts_total", "counter", "Заданий, прерванных по времени",
+                               ((None, pool["timeouts"]),))
+    lines += prometheus_metric("timetable_bot_pdf_cache_requests_total", "counter", "Обращений к кешу готовых PDF",
+                               (({"result": "hit"}, pdf_cache_stats["hits"]), ({"result": "miss"}, pdf_cache_stats["misses"])))
+    lines += prometheus_metric("timetable_bot_pdf_cache_bytes", "gauge", "Объём кеша готовых PDF",
+                               ((None, pdf_cache_stats["bytes"]),))
+    lines += prometheus_metric("process_resident_memory_bytes", "gauge", "Память процесса бота в ОЗУ (RSS)",
+                               ((None, process_rss_bytes()),))
+    return lines
 
-def handle_unknown_document(update: Update, context: CallbackContext):
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # Обработчик команды /stats: сводка метрик, доступна только администратору
+    if str(update.message.from_user.id) != ADMIN_ID:
+        return
+    await update.message.reply_text(format_stats(stats_snapshot()))
+
+async def handle_unknown_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     # Обработчик для неизвестных документов
-    update.message.reply_text("Расписание принимается только в формате .xlsx")
+    await update.message.reply_text("Расписание принимается только в формате .xlsx")
+
+async def start_metrics_server(application: Application) -> None:
+    # Запуск HTTP сервера метрик в цикле событий бота (если задан METRICS_PORT)
+    global metrics_server
+    if METRICS_PORT:
+        metrics_server = MetricsServer(prometheus_lines, METRICS_HOST, int(METRICS_PORT))
+        await metrics_server.start()
+
+async def stop_background_services(application: Application) -> None:
+    # Остановка сервера метрик и рабочих процессов при завершении бота
+    if metrics_server is not None:
+        await metrics_server.stop()
+    await render_pool.shutdown()
+
+def build_application(token: str, base_url: str = None) -> Application:
+    # Создание приложения бота с обработчиками команд и сообщений.
+    # Обновления обрабатываются параллельно, чтобы пользователи не ждали чужих запросов
+    builder = ApplicationBuilder().token(token).concurrent_updates(True) \
+        .post_init(start_metrics_server).post_shutdown(stop_background_services)
+    if base_url:
+        builder = builder.base_url(f"{base_url}/bot").base_file_url(f"{base_url}/file/bot")
+    application = builder.build()
+
+    # Добавление обработчиков команд и сообщений
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(MessageHandler(filters.Document.MimeType("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"), handle_document))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_unknown_document))
+    application.add_handler(CallbackQueryHandler(auto_range))
+    return application
 
 def main():
     # Главная функция для запуска бота
     # Замените TELEGRAM_TOKEN на ваш токен в .env файлк, который вы получили от BotFather
-    updater = Updater(TELEGRAM_TOKEN)
-
-    dp = updater.dispatcher
-    # Добавление обработчиков команд и сообщений
-    dp.add_handler(CommandHandler("start", start))
-    dp.add_handler(MessageHandler(Filters.document.mime_type("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"), handle_document))
-    dp.add_handler(MessageHandler(Filters.text & ~Filters.command, handle_text))
-    dp.add_handler(MessageHandler(Filters.document, handle_unknown_document))
-    dp.add_handler(CallbackQueryHandler(auto_range))
+    application = build_application(TELEGRAM_TOKEN, TELEGRAM_API_URL)
 
     # Запуск бота
-    updater.start_polling()
-    updater.idle()
+    application.run_polling()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,77 @@
+import functools
+import io
+import json
+import os
+import sys
+
+# Подключаем локально написанные модули из папок scripts и benchmarks
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+sys.path.append(os.path.join(dir_path, '..', 'benchmarks'))
+
+from batch import SUMMARY_NAME, manifest_key, process_workbook, run_batch
+from build_svg import SEM_END, SEM_START
+from parse_xls import DocType
+from synthetic import generate_workbook
+
+
+def test_manifest_key_depends_on_backend():
+    data = b"workbook"
+    keys = {backend_name: manifest_key(data, SEM_START, SEM_END, False, backend_name)
+            for backend_name in ("svg", "svg-compact", "pdf")}
+
+    # PDF, сформированный другим способом отрисовки, не считается неизменившимся
+    assert len(set(keys.values())) == len(keys)
+    assert keys["svg"] == manifest_key(data, SEM_START, SEM_END, False, "svg")
+
+
+# Функция отрисовки без cairo (выполняется в рабочем процессе): вместо PDF сохраняется SVG
+def render_svg(timetable, start_date, end_date, no_color, backend_name):
+    from build_svg import TableFormer, align_to_weeks, prepare_data
+    from draw_backends import SvgBackend
+
+    window_start, window_end = align_to_weeks(start_date, end_date)
+    exercises, weekday_time_spans = prepare_data(timetable.occurrences(window_start, window_end), start_date, end_date)
+    table_former = TableFormer(timetable.label, start_date, end_date, exercises, weekday_time_spans,
+                               no_color=no_color, backend=SvgBackend)
+    table_former.draw_timetable()
+    return table_former.to_bytes()
+
+
+# Функция пакетной обработки каталога в два процесса с отрисовкой render_svg
+def run_batch_without_cairo(inputs, output_dir):
+    return run_batch(inputs, output_dir, SEM_START, SEM_END, workers=2, progress=io.StringIO(),
+                     target=functools.partial(process_workbook, render=render_svg))
+
+
+def test_second_run_rebuilds_only_changed_workbooks(tmp_path):
+    books = tmp_path / "books"
+    output_dir = str(tmp_path / "pdf")
+    books.mkdir()
+    (books / "professor.xlsx").write_bytes(generate_workbook(seed=1))
+    (books / "group.xlsx").write_bytes(generate_workbook(DocType.STUDENT, seed=2))
+    (books / "other.xlsx").write_bytes(generate_workbook(seed=3))
+    (books / "broken.xlsx").write_bytes(b"not a workbook")
+
+    first = run_batch_without_cairo([str(books)], output_dir)
+
+    # Испорченная книга попадает в сводку с трассировкой, остальные обрабатываются
+    assert (first["files"], first["processed"], first["skipped"], first["failed"]) == (4, 3, 0, 1)
+    failure, = first["failures"]
+    assert failure["file"].endswith("broken.xlsx")
+    assert "Traceback" in failure["traceback"]
+    outputs = {name: os.path.join(output_dir, f"{name}.pdf") for name in ("professor", "group", "other")}
+    assert all(os.path.exists(output) for output in outputs.values())
+    modified = {name: os.stat(output).st_mtime_ns for name, output in outputs.items()}
+
+    (books / "group.xlsx").write_bytes(generate_workbook(DocType.STUDENT, seed=4))
+    second = run_batch_without_cairo([str(books)], output_dir)
+
+    # Неизменившиеся книги пропускаются, изменённая формируется заново, испорченная снова в ошибках
+    assert (second["processed"], second["skipped"], second["failed"]) == (1, 2, 1)
+    assert second["failures"][0]["file"].endswith("broken.xlsx")
+    assert os.stat(outputs["professor"]).st_mtime_ns == modified["professor"]
+    assert os.stat(outputs["other"]).st_mtime_ns == modified["other"]
+    assert os.stat(outputs["group"]).st_mtime_ns != modified["group"]
+    with open(os.path.join(output_dir, SUMMARY_NAME), encoding='utf-8') as summary_file:
+        assert json.load(summary_file)["failures"] == second["failures"]
@@ -0,0 +1,175 @@
+import asyncio
+import io
+import math
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+# Подключаем локально написанные модули из папок scripts, src и benchmarks
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+sys.path.append(os.path.join(dir_path, '..', 'src'))
+sys.path.append(os.path.join(dir_path, '..', 'benchmarks'))
+
+import pytest
+from bench_bot_concurrency import ADMIN_ID, EXPECTED_METRICS, TOKEN, run
+from render_pool import RenderResult
+from synthetic import generate_workbook
+
+USERS = 6
+PINGS = 3
+# Наибольшее время ответа на /start, пока рабочие процессы заняты отрисовкой, с.
+# Если бы отрисовка шла в цикле событий бота, ответ ждал бы хотя бы одну отрисовку целиком
+MAX_PING_LATENCY = 1.5
+# Наибольшее время ответа /metrics во время отрисовок, с
+MAX_SCRAPE_LATENCY = 1.0
+# Наименьшее время задания в рабочем процессе, с: примерно столько занимает отрисовка вместе с переводом в PDF
+RENDER_SECONDS = 0.3
+
+# Строки текстового формата Prometheus 0.0.4: комментарии HELP/TYPE и значения метрик
+METRIC_NAME = r'[a-zA-Z_:][a-zA-Z0-9_:]*'
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*"'
+HELP_LINE = re.compile(rf'# HELP ({METRIC_NAME}) .*')
+TYPE_LINE = re.compile(rf'# TYPE ({METRIC_NAME}) (counter|gauge|histogram|summary|untyped)')
+VALUE = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|[+-]?Inf|NaN'
+SAMPLE_LINE = re.compile(rf'({METRIC_NAME})(?:\{{((?:{LABEL})(?:,{LABEL})*)?,?\}})? ({VALUE})(?: -?\d+)?')
+LABEL_PAIR = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+# Суффиксы значений гистограммы
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+
+
+# Функция задания пула бота без cairo (выполняется в рабочем процессе): книга разбирается
+# и расписание рисуется в SVG теми же функциями, что и в боте, а вместо PDF возвращается SVG.
+# Вместо перевода в PDF отрисовка повторяется, пока задание не займёт RENDER_SECONDS,
+# поэтому процессор занят так же, как при настоящей отрисовке
+def render_svg_job(job):
+    from build_svg import TableFormer, align_to_weeks, prepare_data
+    from draw_backends import SvgBackend
+    from parse_xls import load_timetable
+
+    started = time.perf_counter()
+    timetable = load_timetable(io.BytesIO(job.data))
+    stages = {"parse": time.perf_counter() - started}
+    window_start, window_end = align_to_weeks(job.start_date, job.end_date)
+    exercises, weekday_time_spans = prepare_data(timetable.occurrences(window_start, window_end),
+                                                 job.start_date, job.end_date)
+    while True:
+        table_former = TableFormer(timetable.label, job.start_date, job.end_date, exercises, weekday_time_spans,
+                                   no_color=job.no_color, backend=SvgBackend)
+        table_former.draw_timetable()
+        svg = table_former.to_bytes()
+        if time.perf_counter() - started >= RENDER_SECONDS:
+            break
+    stages["draw"] = time.perf_counter() - started - stages["parse"]
+    return RenderResult(timetable.doc_type, timetable.label, timetable.conflicts, svg,
+                        os.getpid(), time.perf_counter() - started, stages, {})
+
+
+# Функция подготовки рабочего процесса без cairo
+def warm_up_without_cairo(*args):
+    import font_metrics
+    font_metrics.preload()
+
+
+# Прогон бота против локального Bot API: USERS пользователей присылают книгу одновременно,
+# ещё PINGS пользователей отправляют /start во время отрисовки. Рабочие процессы пула
+# выполняют render_svg_job, поэтому тест не зависит от cairo. Бот запускается один раз на модуль
+@pytest.fixture(scope="module")
+def load_result(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        # Бот сохраняет кеш в текущем каталоге и читает настройки из окружения при импорте
+        monkeypatch.chdir(tmp_path_factory.mktemp("bot"))
+        monkeypatch.setenv("TELEGRAM_TOKEN", TOKEN)
+        monkeypatch.setenv("ADMIN_ID", str(ADMIN_ID))
+        monkeypatch.setenv("MODERATOR_ID", "0")
+        monkeypatch.setenv("METRICS_PORT", "0")
+        return asyncio.run(run(generate_workbook(), USERS, PINGS,
+                               target=render_svg_job, initializer=warm_up_without_cairo))
+
+
+def test_all_users_receive_pdf(load_result):
+    assert len(load_result.done_at) == USERS
+    assert load_result.pool_stats["failed"] == 0
+
+
+# Ответ на /stats приходит от работающего бота и учитывает все запросы пользователей
+def test_stats_command_reports_requests(load_result):
+    text = load_result.stats_text
+    assert text.startswith(f"Запросов: {USERS}, ошибок разбора: 0, ошибок отрисовки: 0")
+    assert "(зависаний 0)" in text
+
+
+def test_event_loop_answers_during_rendering(load_result):
+    assert len(load_result.ping_latency) == PINGS
+    assert max(load_result.ping_latency) < MAX_PING_LATENCY
+    # Ответы на /start пришли, пока пользователи ещё ждали PDF
+    assert max(load_result.ping_done_at) < max(load_result.done_at.values())
+
+
+# Функция для разбора ответа /metrics. Возвращает типы метрик и значения: (имя, метки, значение).
+# Строка, которая не соответствует формату, вызывает ошибку проверки
+def parse_exposition(text):
+    types = {}
+    samples = []
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            assert HELP_LINE.fullmatch(line), line
+        elif line.startswith('# TYPE '):
+            match = TYPE_LINE.fullmatch(line)
+            assert match, line
+            assert match.group(1) not in types, f"повторный TYPE: {line}"
+            types[match.group(1)] = match.group(2)
+        elif line and not line.startswith('#'):
+            match = SAMPLE_LINE.fullmatch(line)
+            assert match, line
+            labels = dict(LABEL_PAIR.findall(match.group(2) or ''))
+            samples.append((match.group(1), labels, float(match.group(3))))
+    return types, samples
+
+
+# Функция для получения названия метрики по имени значения (у гистограмм - без суффикса)
+def family_name(name, types):
+    for suffix in HISTOGRAM_SUFFIXES:
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and types.get(base) == 'histogram':
+            return base
+    return name
+
+
+def test_metrics_endpoint_responds_during_rendering(load_result):
+    assert load_result.scrapes
+    for status, content_type, latency in load_result.scrapes:
+        assert status == 200
+        assert content_type.startswith("text/plain; version=0.0.4")
+        assert latency < MAX_SCRAPE_LATENCY
+
+
+def test_metrics_are_valid_exposition_text(load_result):
+    text = load_result.metrics_text
+    assert text.endswith("\n")
+    types, samples = parse_exposition(text)
+    for name in EXPECTED_METRICS:
+        assert name in text
+    for name, _, value in samples:
+        # У каждого значения объявлен тип, счётчики не бывают отрицательными
+        family = family_name(name, types)
+        assert family in types, name
+        if types[family] == 'counter':
+            assert value >= 0 and not math.isnan(value), name
+
+    # Корзины гистограмм накопительные, а корзина +Inf совпадает с количеством наблюдений
+    buckets = defaultdict(list)
+    counts = {}
+    for name, labels, value in samples:
+        series = (family_name(name, types), tuple(sorted((key, label) for key, label in labels.items() if key != 'le')))
+        if name.endswith('_bucket'):
+            buckets[series].append((float(labels['le']), value))
+        elif name.endswith('_count') and types.get(series[0]) == 'histogram':
+            counts[series] = value
+    assert buckets
+    for series, bounds in buckets.items():
+        values = [value for _, value in sorted(bounds)]
+        assert values == sorted(values), series
+        assert sorted(bounds)[-1] == (math.inf, counts[series]), series
@@ -0,0 +1,67 @@
+import os
+import sys
+from datetime import datetime
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+
+from conflicts import find_conflicts
+from parse_xls import Lesson
+
+DATE = datetime(2024, 2, 12)
+NEXT_DATE = datetime(2024, 2, 13)
+
+
+def lesson(subject, time_start, time_end, **kwargs):
+    return Lesson(subject, "ЛК", "305", ("М3О-101Бк-23",), time_start, time_end, **kwargs)
+
+
+# Функция для описания наложений кортежами (дата, начало, конец, предметы)
+def describe(conflicts):
+    return [(conflict.date, conflict.time_start, conflict.time_end,
+             tuple(lesson.subject for lesson in conflict.lessons)) for conflict in conflicts]
+
+
+def test_chained_overlaps_are_reported_pairwise():
+    # A пересекается с B, B с C, но A и C не пересекаются
+    a, b, c = lesson("A", "09:00", "10:30"), lesson("B", "10:00", "11:30"), lesson("C", "11:00", "12:30")
+    conflicts = find_conflicts([(DATE, c), (DATE, a), (DATE, b)])
+
+    assert describe(conflicts) == [
+        (DATE, "10:00", "10:30", ("A", "B")),
+        (DATE, "11:00", "11:30", ("B", "C")),
+    ]
+
+
+def test_lessons_in_same_slot_conflict_together():
+    a, b, c = lesson("A", "09:00", "10:30"), lesson("B", "09:00", "10:30"), lesson("C", "09:00", "10:30")
+    conflicts = find_conflicts([(DATE, a), (DATE, b), (DATE, c), (NEXT_DATE, a)])
+
+    assert describe(conflicts) == [(DATE, "09:00", "10:30", ("A", "B", "C"))]
+
+
+def test_interval_inside_another():
+    # Длинное занятие накладывается на оба коротких, а короткие друг на друга - нет
+    long = lesson("Длинное", "09:00", "13:00")
+    first, second = lesson("Первое", "09:30", "10:30"), lesson("Второе", "11:00", "12:00")
+    conflicts = find_conflicts([(DATE, long), (DATE, first), (DATE, second)])
+
+    assert describe(conflicts) == [
+        (DATE, "09:30", "10:30", ("Длинное", "Первое")),
+        (DATE, "11:00", "12:00", ("Длинное", "Второе")),
+    ]
+
+
+def test_joined_lesson_spans_both_slots():
+    joined = lesson("Пара", "09:00", "10:30", joined=True, time_start_s="10:45", time_end_s="12:15")
+    second_slot = lesson("Вторая", "10:45", "12:15")
+    conflicts = find_conflicts([(DATE, joined), (DATE, second_slot)])
+
+    assert describe(conflicts) == [(DATE, "10:45", "12:15", ("Пара", "Вторая"))]
+
+
+def test_adjacent_and_repeated_lessons_do_not_conflict():
+    first, second = lesson("Первое", "09:00", "10:30"), lesson("Второе", "10:30", "12:00")
+    # Одно и то же занятие из пересекающихся диапазонов дат не накладывается само на себя
+    assert find_conflicts([(DATE, first), (DATE, second), (DATE, first)]) == []
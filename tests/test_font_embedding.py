@@ -0,0 +1,63 @@
+import ctypes.util
+import io
+import os
+import subprocess
+import sys
+
+# Подключаем локально написанные модули из папок scripts и benchmarks
+dir_path = os.path.dirname(os.path.realpath(__file__))
+scripts_path = os.path.join(dir_path, '..', 'scripts')
+benchmarks_path = os.path.join(dir_path, '..', 'benchmarks')
+sys.path.append(scripts_path)
+
+import pytest
+from font_embedding import FONT_FAMILY, font_subset, glyph_set
+from font_metrics import get_font_metrics
+
+# Программа для отдельного процесса: регистрирует шрифт и выводит путь к настройкам
+# и файл, который fontconfig выбирает для FONT_FAMILY
+REGISTER_SCRIPT = """
+import sys
+sys.path[:0] = sys.argv[1:3]
+from bench_fonts import matched_font_file
+from font_embedding import FONT_FAMILY, register_font
+print(register_font())
+print(matched_font_file(FONT_FAMILY))
+"""
+
+
+# Функция для регистрации шрифта в отдельном процессе (настройки fontconfig общие для процесса).
+# Возвращает путь к файлу настроек и файл шрифта, выбранный fontconfig
+def register_in_subprocess():
+    env = {key: value for key, value in os.environ.items() if key != 'FONTCONFIG_FILE'}
+    output = subprocess.run([sys.executable, "-c", REGISTER_SCRIPT, scripts_path, benchmarks_path],
+                            env=env, check=True, capture_output=True, text=True).stdout
+    config_path, matched = output.splitlines()
+    return config_path, matched
+
+
+def test_register_font_writes_config_and_cleans_up():
+    config_path, _ = register_in_subprocess()
+
+    # Каталог с настройками удаляется при завершении процесса
+    assert os.path.basename(config_path) == "timetable-fonts.conf"
+    assert not os.path.exists(os.path.dirname(config_path))
+
+
+@pytest.mark.skipif(ctypes.util.find_library('fontconfig') is None, reason="нет библиотеки fontconfig")
+def test_registered_family_matches_metrics_font():
+    _, matched = register_in_subprocess()
+
+    assert os.path.realpath(matched) == os.path.realpath(get_font_metrics().font_path)
+
+
+def test_subset_keeps_kerning():
+    from fontTools.ttLib import TTFont
+
+    if 'GPOS' not in TTFont(get_font_metrics().font_path):
+        pytest.skip("в шрифте раскладки нет таблицы GPOS")
+    font = TTFont(io.BytesIO(font_subset(glyph_set("Иванов Иван AVAT"))))
+    features = {record.FeatureTag for record in font['GPOS'].table.FeatureList.FeatureRecord}
+
+    assert features == {'kern'}
+    assert FONT_FAMILY in font['name'].getDebugName(1)
@@ -0,0 +1,57 @@
+import itertools
+import os
+import sys
+
+# Подключаем локально написанные модули из папок scripts и benchmarks
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+sys.path.append(os.path.join(dir_path, '..', 'benchmarks'))
+
+from build_svg import MAX_FONT_SIZE, MIN_FONT_SIZE, fit_lines, form_elements, form_text, get_text_width
+from parse_xls import shorten_group
+from synthetic import ROOMS, SUBJECTS, TYPES, synthetic_group
+
+# Размеры ячеек: от одной пары на всю строку дня до нескольких пар в строке, узкие и широкие столбцы
+CELL_HEIGHTS = (12, 25, 40, 60, 90, 130, 200)
+CELL_WIDTHS = (30, 45, 60, 90, 140, 250)
+# Количество групп в занятии: строка групп до 12 символов, длиннее 18 и длиннее 26 символов
+GROUP_COUNTS = (1, 2, 3, 5, 8)
+# Строка групп длиной от 13 до 18 символов (отдельная ветка сокращения в form_elements)
+LONG_GROUP = "М1О-100Бки-23с"
+
+
+# Прежний подбор размера шрифта: перебор всех размеров от наибольшего к наименьшему
+def linear_form_text(subject, exercise_type, groups, room, height, width):
+    elements = form_elements(subject, exercise_type, groups, room)
+    for font_size in range(MAX_FONT_SIZE, MIN_FONT_SIZE - 1, -1):
+        lines = fit_lines(elements, font_size, height, width)
+        if lines is not None:
+            return lines, font_size
+    return None, None
+
+
+# Занятия для проверки: все предметы, типы занятий и аудитории синтетических расписаний
+def lesson_corpus():
+    group_strings = [shorten_group(tuple(synthetic_group(number * 7) for number in range(count)))
+                     for count in GROUP_COUNTS] + [LONG_GROUP]
+    for subject, exercise_type, room, groups in itertools.product(SUBJECTS, TYPES, ROOMS, group_strings):
+        yield subject, exercise_type, groups, room
+
+
+def test_text_width_grows_with_font_size():
+    # На этом основан бинарный поиск в form_text
+    for lesson in lesson_corpus():
+        elements = form_elements(*lesson)
+        # Все строки, которые может составить fit_lines: по i соседних элементов через запятую
+        lines = {', '.join(elements[j:j + i]) for i in range(1, len(elements) + 1)
+                 for j in range(0, len(elements), i)}
+        for line in lines:
+            widths = [get_text_width(line, font_size) for font_size in range(MIN_FONT_SIZE, MAX_FONT_SIZE + 1)]
+            assert widths == sorted(widths), line
+
+
+def test_bisection_matches_linear_scan():
+    for lesson in lesson_corpus():
+        for height, width in itertools.product(CELL_HEIGHTS, CELL_WIDTHS):
+            assert form_text.__wrapped__(*lesson, height, width) == linear_form_text(*lesson, height, width), \
+                (lesson, height, width)
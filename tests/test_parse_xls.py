@@ -0,0 +1,212 @@
+import io
+import os
+import sys
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+
+# Подключаем локально написанные модули из папок scripts и benchmarks
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+sys.path.append(os.path.join(dir_path, '..', 'benchmarks'))
+
+import openpyxl
+import parse_xls
+import pytest
+from build_svg import SEM_END, SEM_START, get_color
+from openpyxl.worksheet.cell_range import CellRange
+from parse_xls import (FIRST_COLUMN, FIRST_ROW, LAST_ROW, TITLE_COLUMN, TITLE_ROW, DocType, ScheduleRowsSource,
+                       UnsupportedWorkbook, build_merge_index, load_timetable, merge_height, read_sheet,
+                       read_sheet_openpyxl, read_sheet_xml)
+from synthetic import PROFESSORS, generate_workbook, synthetic_entry
+
+TITLES = {
+    DocType.PROFESSOR: "Расписание преподавателя Иванов Иван Иванович",
+    DocType.STUDENT: "Расписание группы М3О-101Бк-23",
+}
+DATE_RANGE = f"{SEM_START:%d.%m}-{SEM_END:%d.%m}"
+SHEET_PATH = "xl/worksheets/sheet1.xml"
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+LESSON = synthetic_entry(DocType.PROFESSOR, "Физика", DATE_RANGE)
+STUDENT_LESSON = synthetic_entry(DocType.STUDENT, "Физика", DATE_RANGE)
+
+# Листы, которые openpyxl не записывает сам, но которые встречаются в книгах других программ.
+# Префикс пространства имён у всех элементов
+PREFIXED_SHEET = f'''<x:worksheet xmlns:x="{MAIN_NS}"><x:sheetData>
+<x:row r="2"><x:c r="C2" t="inlineStr"><x:is><x:t>{TITLES[DocType.PROFESSOR]}</x:t></x:is></x:c></x:row>
+<x:row r="3"><x:c r="E3"><x:v>12</x:v></x:c></x:row>
+<x:row r="5"><x:c r="B5" t="inlineStr"><x:is><x:t>{LESSON}</x:t></x:is></x:c></x:row>
+</x:sheetData><x:mergeCells count="1"><x:mergeCell ref="B5:C5"/></x:mergeCells></x:worksheet>'''
+# Строки и ячейки без номеров (атрибута r): номер следует за предыдущим
+UNNUMBERED_SHEET = f'''<worksheet xmlns="{MAIN_NS}"><sheetData>
+<row/><row><c/><c/><c t="inlineStr"><is><t>{TITLES[DocType.PROFESSOR]}</t></is></c></row>
+<row><c r="D3"><v>2.5</v></c><c t="b"><v>1</v></c></row>
+<row r="5"><c/><c t="inlineStr"><is><t>{LESSON}</t></is></c></row>
+</sheetData></worksheet>'''
+# Строка из нескольких фрагментов с оформлением
+RICH_TEXT_SHEET = f'''<worksheet xmlns="{MAIN_NS}"><sheetData>
+<row r="2"><c r="C2" t="inlineStr"><is><r><rPr><b/></rPr><t>Расписание группы </t></r><r><t>М3О-101Бк-23</t></r></is></c></row>
+<row r="5"><c r="H5" t="inlineStr"><is><t xml:space="preserve">{STUDENT_LESSON}</t></is></c></row>
+</sheetData></worksheet>'''
+
+
+# Функция для формирования книги с тремя занятиями в понедельник (xlsx в байтах):
+# в ячейке, объединённой по горизонтали (одна строка, два столбца), объединённой по вертикали
+# (две строки) и в необъединённой ячейке
+def merged_cells_workbook(doc_type):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.cell(TITLE_ROW, TITLE_COLUMN).value = TITLES[doc_type]
+    sheet.cell(FIRST_ROW, FIRST_COLUMN).value = synthetic_entry(doc_type, "Физика", DATE_RANGE)
+    sheet.merge_cells(start_row=FIRST_ROW, start_column=FIRST_COLUMN, end_row=FIRST_ROW, end_column=FIRST_COLUMN + 1)
+    sheet.cell(FIRST_ROW, FIRST_COLUMN + 3).value = synthetic_entry(doc_type, "Программирование", DATE_RANGE)
+    sheet.merge_cells(start_row=FIRST_ROW, start_column=FIRST_COLUMN + 3,
+                      end_row=FIRST_ROW + 1, end_column=FIRST_COLUMN + 3)
+    sheet.cell(FIRST_ROW, FIRST_COLUMN + 5).value = synthetic_entry(doc_type, "Иностранный язык", DATE_RANGE)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("fast", [True, False])
+@pytest.mark.parametrize("doc_type", [DocType.PROFESSOR, DocType.STUDENT])
+def test_any_merged_cell_is_every_week(doc_type, fast):
+    timetable = load_timetable(io.BytesIO(merged_cells_workbook(doc_type)), fast=fast)
+    steps = {scheduled.lesson.subject: scheduled.recurrence.step for scheduled in timetable.schedule}
+    assert steps == {"Физика": 7, "Программирование": 7, "Иностранный язык": 14}
+
+
+# Индекс хранит высоту объединения: занятие в объединении выше двух строк проводится каждую неделю без отдельной проверки
+def test_merge_index_keeps_height():
+    merge_index = build_merge_index([CellRange("B5:C5"), CellRange("D5:D8")])
+    assert {coordinate: merged.height for coordinate, merged in merge_index.items()} == {
+        (5, 2): 1, (5, 3): 1, (5, 4): 4, (6, 4): 4, (7, 4): 4, (8, 4): 4}
+    assert merge_height(merge_index, 6, 2) == 0
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.cell(TITLE_ROW, TITLE_COLUMN).value = TITLES[DocType.PROFESSOR]
+    sheet.cell(FIRST_ROW, FIRST_COLUMN + 2).value = LESSON
+    sheet.merge_cells("D5:D8")
+    output = io.BytesIO()
+    workbook.save(output)
+    for fast in (True, False):
+        timetable = load_timetable(io.BytesIO(output.getvalue()), fast=fast)
+        assert [scheduled.recurrence.step for scheduled in timetable.schedule] == [7]
+
+
+# В расписании группы у всех занятий (и через неделю) указан преподаватель из записи,
+# а цвет ячейки зависит от ФИО преподавателя целиком, а не от первой буквы
+def test_student_lessons_name_the_professor():
+    data = merged_cells_workbook(DocType.STUDENT)
+    cells = read_sheet(io.BytesIO(data)).cells
+    timetable = load_timetable(io.BytesIO(data))
+
+    for lesson, recurrence in timetable.schedule:
+        entry = next(value for value in cells.values() if value and lesson.subject in value)
+        assert lesson.participants in PROFESSORS and lesson.participants in entry
+    assert {recurrence.step for _, recurrence in timetable.schedule} == {7, 14}
+    assert get_color("Физика", "ЛК", "Иванов И.И.") != get_color("Физика", "ЛК", "Ильин А.А.")
+
+
+# Функция для замены XML листа в книге, сохранённой openpyxl
+def with_sheet_xml(data, sheet_xml):
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(output, 'w') as target:
+        for item in source.infolist():
+            content = sheet_xml.encode('utf-8') if item.filename == SHEET_PATH else source.read(item)
+            target.writestr(item, content)
+    return output.getvalue()
+
+
+# Функция для сравнения результатов чтения листа: непустые ячейки и объединения
+# (openpyxl не возвращает строки ниже последней заполненной)
+def sheet_contents(sheet_data):
+    cells = {coordinate: value for coordinate, value in sheet_data.cells.items() if value is not None}
+    merges = {coordinate: (merged.cell_range.coord, merged.height) for coordinate, merged in sheet_data.merge_index.items()}
+    return sheet_data.title, cells, merges
+
+
+@pytest.mark.parametrize("data", [
+    generate_workbook(DocType.PROFESSOR),
+    generate_workbook(DocType.STUDENT, lessons=84, text_length=60),
+    generate_workbook(styled=True, extra_rows=300),
+    merged_cells_workbook(DocType.STUDENT),
+], ids=["professor", "student", "styled_export", "merged_cells"])
+def test_xml_reader_matches_openpyxl(data):
+    assert sheet_contents(read_sheet_xml(io.BytesIO(data))) == sheet_contents(read_sheet_openpyxl(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("sheet_xml, lesson", [
+    (PREFIXED_SHEET, LESSON),
+    (UNNUMBERED_SHEET, LESSON),
+    (RICH_TEXT_SHEET, STUDENT_LESSON),
+], ids=["prefixed", "unnumbered", "rich_text"])
+def test_xml_reader_handles_other_writers(sheet_xml, lesson):
+    data = with_sheet_xml(merged_cells_workbook(DocType.PROFESSOR), sheet_xml)
+    sheet_data = read_sheet_xml(io.BytesIO(data))
+
+    assert sheet_contents(sheet_data) == sheet_contents(read_sheet_openpyxl(io.BytesIO(data)))
+    assert lesson in sheet_data.cells.values()
+    assert load_timetable(io.BytesIO(data)).schedule
+
+
+# Число с форматом даты можно прочитать только вместе со стилями книги: такую книгу читает openpyxl
+def test_styled_number_falls_back_to_openpyxl():
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.cell(TITLE_ROW, TITLE_COLUMN).value = TITLES[DocType.PROFESSOR]
+    sheet.cell(FIRST_ROW, FIRST_COLUMN).value = LESSON
+    sheet.cell(FIRST_ROW, FIRST_COLUMN + 1).value = datetime(2026, 2, 9)
+    output = io.BytesIO()
+    workbook.save(output)
+    data = output.getvalue()
+
+    with pytest.raises(UnsupportedWorkbook):
+        read_sheet_xml(io.BytesIO(data))
+    sheet_data = read_sheet(io.BytesIO(data))
+    assert sheet_contents(sheet_data) == sheet_contents(read_sheet_openpyxl(io.BytesIO(data)))
+    assert sheet_data.cells[(FIRST_ROW, FIRST_COLUMN + 1)] == datetime(2026, 2, 9)
+
+
+# Функция для переименования частей книги (имя в архиве и ссылки на него в других частях)
+def with_renamed_parts(data, renames):
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(output, 'w') as target:
+        for item in source.infolist():
+            content = source.read(item)
+            for old, new in renames.items():
+                content = content.replace(old.encode(), new.encode())
+            target.writestr(renames.get(item.filename, item.filename), content)
+    return output.getvalue()
+
+
+# Книга с другим именем части workbook.xml: read_sheet_xml её не находит, а openpyxl открывает
+# по ссылкам пакета, и разбор через openpyxl не обращается к XML напрямую
+def test_renamed_workbook_part_is_read_by_openpyxl():
+    original = merged_cells_workbook(DocType.PROFESSOR)
+    data = with_renamed_parts(original, {
+        "xl/workbook.xml": "xl/book.xml", "xl/_rels/workbook.xml.rels": "xl/_rels/book.xml.rels"})
+
+    with pytest.raises(KeyError):
+        read_sheet_xml(io.BytesIO(data))
+    assert sheet_contents(read_sheet(io.BytesIO(data))) == sheet_contents(read_sheet_xml(io.BytesIO(original)))
+    assert len(load_timetable(io.BytesIO(data)).schedule) == 3
+
+
+# Строки ниже области расписания не доходят до разборщика при любом размере блоков,
+# в том числе когда тег строки или закрывающий тег sheetData попадает на границу блоков
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 64 * 1024])
+def test_rows_below_schedule_are_skipped(monkeypatch, chunk_size):
+    monkeypatch.setattr(parse_xls, "SHEET_CHUNK_SIZE", chunk_size)
+    data = generate_workbook(styled=True, extra_rows=50)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        sheet_xml = archive.read(SHEET_PATH)
+    source = ScheduleRowsSource(io.BytesIO(sheet_xml), LAST_ROW)
+    skipped = b"".join(iter(lambda: source.read(chunk_size), b""))
+
+    root = ElementTree.fromstring(skipped)
+    rows = [int(row.get('r')) for row in root.iter(f"{{{MAIN_NS}}}row")]
+    assert rows and max(rows) == LAST_ROW
+    assert len(root.findall(f"{{{MAIN_NS}}}mergeCells/{{{MAIN_NS}}}mergeCell")) > 0
+    assert sheet_contents(read_sheet_xml(io.BytesIO(data))) == sheet_contents(read_sheet_openpyxl(io.BytesIO(data)))
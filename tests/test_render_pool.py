@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+# Подключаем локально написанные модули из папки scripts
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+
+import pytest
+from render_pool import MAX_ATTEMPTS, RenderPool, RenderResult
+
+# Время выполнения обычного задания и предельное время задания в пуле, с
+JOB_SECONDS = 0.5
+TIMEOUT = 5
+
+
+# Функция задания для проверки пула (выполняется в рабочем процессе): job - (действие, название).
+# "sleep" выполняется JOB_SECONDS, "hang" зависает, "crash" аварийно завершает процесс
+def fake_job(job):
+    action, name = job
+    started = time.perf_counter()
+    if action == "hang":
+        time.sleep(3600)
+    elif action == "crash":
+        time.sleep(JOB_SECONDS / 2)  # Процесс завершается, пока остальные задания выполняются
+        os._exit(1)
+    else:
+        time.sleep(JOB_SECONDS)
+    return RenderResult(None, name, [], b"", os.getpid(), time.perf_counter() - started, {}, {})
+
+
+def no_warm_up():
+    pass
+
+
+# Функция для выполнения заданий в пуле. Возвращает результаты (или ошибки) заданий и статистику пула
+async def run_jobs(jobs, workers=3):
+    pool = RenderPool(workers, queue_size=len(jobs), timeout=TIMEOUT, target=fake_job, initializer=no_warm_up)
+    try:
+        futures = [pool.submit(job)[0] for job in jobs]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        return results, pool.stats()
+    finally:
+        await pool.shutdown()
+
+
+def test_hung_job_times_out_and_others_complete():
+    jobs = [("hang", "зависшее"), ("sleep", "первое"), ("sleep", "второе"), ("sleep", "третье")]
+    started = time.perf_counter()
+    results, stats = asyncio.run(run_jobs(jobs))
+    elapsed = time.perf_counter() - started
+
+    assert isinstance(results[0], asyncio.TimeoutError)
+    assert [result.label for result in results[1:]] == ["первое", "второе", "третье"]
+    assert stats["timeouts"] == 1
+    assert stats["failed"] == 1
+    # Зависшее задание не задерживает пул дольше предельного времени
+    assert elapsed < TIMEOUT * 3
+    # Зависший процесс завершён: иначе он работал бы ещё час после остановки пула
+    deadline = time.perf_counter() + TIMEOUT
+    while multiprocessing.active_children() and time.perf_counter() < deadline:
+        time.sleep(0.1)
+    assert not multiprocessing.active_children()
+
+
+def test_crash_does_not_use_up_attempts_of_other_jobs():
+    # Задание аварийно завершает процесс при каждом запуске, остальные задания прерываются вместе с ним
+    jobs = [("crash", "аварийное"), ("sleep", "первое"), ("sleep", "второе")]
+    results, stats = asyncio.run(run_jobs(jobs))
+
+    assert isinstance(results[0], Exception)
+    assert [result.label for result in results[1:]] == ["первое", "второе"]
+    assert stats["failed"] == 1
+    # Первый запуск вместе с остальными заданиями и MAX_ATTEMPTS запусков в одиночку
+    assert stats["restarts"] == 1 + MAX_ATTEMPTS
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_jobs_complete_without_errors(workers):
+    jobs = [("sleep", str(index)) for index in range(5)]
+    results, stats = asyncio.run(run_jobs(jobs, workers))
+
+    assert [result.label for result in results] == [str(index) for index in range(5)]
+    assert stats["failed"] == stats["restarts"] == stats["timeouts"] == 0
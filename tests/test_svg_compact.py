@@ -0,0 +1,85 @@
+import math
+import os
+import re
+import sys
+from datetime import timedelta
+from xml.etree import ElementTree
+
+# Подключаем локально написанные модули из папок scripts и benchmarks
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+sys.path.append(os.path.join(dir_path, '..', 'benchmarks'))
+
+import pytest
+from build_svg import SEM_END, SEM_START, TableFormer, prepare_data
+from draw_backends import COMPACT_PRECISION, CompactSvgBackend, SvgBackend
+from synthetic import synthetic_semester
+
+SVG_NS = "{http://www.w3.org/2000/svg}"
+# Правило CSS блока <style>: селектор (имя элемента или .класс) и объявления
+CSS_RULE = re.compile(r'([.\w-]+)\{([^{}]*)\}')
+# Наибольшее расхождение координат после округления в компактном SVG
+TOLERANCE = 0.5 * 10 ** -COMPACT_PRECISION + 1e-9
+# Значения свойств по умолчанию (как в SVG, если свойство не задано)
+DEFAULT_STYLE = {'fill': 'black', 'fill-opacity': '1', 'stroke': None, 'text-anchor': 'start', 'font-family': None}
+
+
+# Функция для отрисовки расписания в SVG заданным способом
+def render_svg(backend, exercises, start_date, end_date, no_color):
+    data, weekday_time_spans = prepare_data(exercises, start_date, end_date)
+    table_former = TableFormer("Иванов Иван Иванович", start_date, end_date, data, weekday_time_spans,
+                               no_color=no_color, backend=backend)
+    table_former.draw_timetable()
+    return table_former.to_bytes()
+
+
+# Функция для получения списка прямоугольников и надписей SVG с вычисленным стилем.
+# Стиль складывается из атрибутов элемента, правил CSS для имени элемента и его класса
+# и наследуется от групп <g> (так же, как его вычисляет cairosvg)
+def resolved_elements(svg):
+    root = ElementTree.fromstring(svg)
+    rules = {}
+    for style in root.iter(f"{SVG_NS}style"):
+        for selector, declarations in CSS_RULE.findall(style.text):
+            rules[selector] = dict(declaration.split(':', 1) for declaration in declarations.split(';'))
+    elements = []
+
+    def visit(element, inherited):
+        tag = element.tag[len(SVG_NS):]
+        style = dict(inherited)
+        style.update((name, value) for name, value in element.attrib.items() if name in DEFAULT_STYLE or name == 'font-size')
+        style.update(rules.get(tag, {}))
+        if element.get('class'):
+            style.update(rules[f".{element.get('class')}"])
+        if tag == 'rect':
+            geometry = tuple(float(element.get(name, 0)) for name in ('x', 'y', 'width', 'height', 'rx', 'ry'))
+            elements.append(('rect', geometry, (style.get('fill'), float(style.get('fill-opacity')), style.get('stroke')), None))
+        elif tag == 'text':
+            geometry = (float(element.get('x')), float(element.get('y')))
+            font_size = float(style['font-size'].replace('px', ''))
+            elements.append(('text', geometry, (font_size, style.get('text-anchor'), style.get('font-family')), element.text))
+        for child in element:
+            visit(child, style)
+
+    visit(root, DEFAULT_STYLE)
+    return elements
+
+
+def document_cases():
+    exercises = synthetic_semester(lessons_per_day=5)
+    two_weeks = (SEM_START + timedelta(days=28), SEM_START + timedelta(days=41))
+    for start_date, end_date in ((SEM_START, SEM_END), two_weeks):
+        for no_color in (False, True):
+            yield exercises, start_date, end_date, no_color
+
+
+@pytest.mark.parametrize("exercises, start_date, end_date, no_color", list(document_cases()),
+                         ids=["semester", "semester_no_color", "two_weeks", "two_weeks_no_color"])
+def test_compact_svg_matches_plain_svg(exercises, start_date, end_date, no_color):
+    plain = resolved_elements(render_svg(SvgBackend, exercises, start_date, end_date, no_color))
+    compact = resolved_elements(render_svg(CompactSvgBackend, exercises, start_date, end_date, no_color))
+
+    assert len(compact) == len(plain)
+    for (tag, geometry, style, text), (expected_tag, expected_geometry, expected_style, expected_text) in zip(compact, plain):
+        assert (tag, style, text) == (expected_tag, expected_style, expected_text)
+        assert all(math.isclose(value, expected, abs_tol=TOLERANCE) for value, expected in zip(geometry, expected_geometry))
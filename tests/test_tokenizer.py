@@ -0,0 +1,40 @@
+import os
+import sys
+
+# Подключаем локально написанные модули из папок scripts и benchmarks
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '..', 'scripts'))
+sys.path.append(os.path.join(dir_path, '..', 'benchmarks'))
+
+import pytest
+from bench_tokenizer import (EDGE_CASES, fuzz_lessons, legacy_extract_single_lesson_info,
+                             legacy_extract_single_students_lesson_info, workbook_lessons)
+from parse_xls import DocType, extract_single_lesson_info, extract_single_students_lesson_info
+
+# Разбор записи за один проход и прежний раздельный поиск полей для каждого вида расписания
+EXTRACTORS = {
+    DocType.PROFESSOR: (extract_single_lesson_info, legacy_extract_single_lesson_info),
+    DocType.STUDENT: (extract_single_students_lesson_info, legacy_extract_single_students_lesson_info),
+}
+
+
+# Записи из синтетических книг, записи с пересекающимися полями и случайно собранные записи
+@pytest.fixture(scope="module", params=list(EXTRACTORS), ids=lambda doc_type: doc_type.name.lower())
+def corpus(request):
+    return request.param, workbook_lessons(request.param) + EDGE_CASES + fuzz_lessons()
+
+
+def test_tokenizer_matches_legacy_extraction(corpus):
+    doc_type, lessons = corpus
+    extract, legacy_extract = EXTRACTORS[doc_type]
+    mismatches = [(lesson, extract(lesson), legacy_extract(lesson)) for lesson in lessons
+                  if extract(lesson) != legacy_extract(lesson)]
+
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("lesson", EDGE_CASES)
+@pytest.mark.parametrize("doc_type", list(EXTRACTORS), ids=lambda doc_type: doc_type.name.lower())
+def test_edge_case(doc_type, lesson):
+    extract, legacy_extract = EXTRACTORS[doc_type]
+    assert extract(lesson) == legacy_extract(lesson)